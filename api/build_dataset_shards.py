@@ -0,0 +1,110 @@
+"""
+Offline job: convert the Oxford-IIIT Pet dataset into preprocessed uint8 memmap shards
+Decodes and resizes every image (and, for segmentation, its trimap) once, exactly as the training
+transforms do, and writes contiguous .npy shards plus an index.json read by utils.dataset_shards
+"""
+
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+from torchvision import transforms
+
+from pet_classifier import CLASS_NAMES, IMAGE_SIZE, logger
+from pet_segmentation import SEGMENTATION_SIZE
+from utils.dataset_shards import DEFAULT_SHARD_SIZE, ShardWriter
+from utils.image_catalog import extract_breed_from_filename, load_breed_mapping
+
+TASKS = ('classification', 'segmentation')
+
+
+def classification_samples(data_dir: str):
+    """(image path, metadata) for every image whose breed maps to a classifier output"""
+    images_dir = os.path.join(data_dir, 'images')
+    filename_to_breed = load_breed_mapping()[0]
+    class_index = {name: i for i, name in enumerate(CLASS_NAMES)}
+
+    samples = []
+    for filename in sorted(os.listdir(images_dir)):
+        if not filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+            continue
+        label = class_index.get(extract_breed_from_filename(filename, filename_to_breed))
+        if label is None:
+            logger.warning(f"Skipping {filename}: unknown breed")
+            continue
+        samples.append((os.path.join(images_dir, filename), {'name': filename, 'label': label}))
+    return samples
+
+
+def segmentation_samples(data_dir: str):
+    """(image path, metadata) for every JPEG with a trimap, as OxfordIIITDataset selects them"""
+    images_dir = os.path.join(data_dir, 'images')
+    masks_dir = os.path.join(data_dir, 'annotations', 'trimaps')
+    return [
+        (os.path.join(images_dir, filename), {'name': filename})
+        for filename in sorted(os.listdir(images_dir))
+        if filename.endswith('.jpg') and os.path.exists(os.path.join(masks_dir, filename.replace('.jpg', '.png')))
+    ]
+
+
+def build_shards(data_dir: str, output_dir: str, task: str, shard_size: int = DEFAULT_SHARD_SIZE,
+                 workers: int = 8):
+    """
+    Write the shards for one task
+
+    Args:
+        data_dir: Oxford-IIIT root with images/ (and annotations/trimaps/)
+        output_dir: Directory for the shards and index
+        task: "classification" (224x224 images + labels) or "segmentation" (256x256 images + trimaps)
+        shard_size: Samples per shard
+        workers: Threads decoding and resizing images
+    """
+    size = IMAGE_SIZE if task == 'classification' else SEGMENTATION_SIZE
+    # Same PIL resize as the training transforms, so shard samples match the decode path
+    resize = transforms.Resize(size)
+    masks_dir = os.path.join(data_dir, 'annotations', 'trimaps')
+
+    def load(sample):
+        path, metadata = sample
+        arrays = {'image': np.asarray(resize(Image.open(path).convert('RGB')))}
+        if task == 'segmentation':
+            mask_path = os.path.join(masks_dir, metadata['name'].replace('.jpg', '.png'))
+            arrays['mask'] = np.asarray(resize(Image.open(mask_path).convert('L')))
+        return arrays, metadata
+
+    samples = classification_samples(data_dir) if task == 'classification' else segmentation_samples(data_dir)
+    if not samples:
+        raise SystemExit(f"No {task} samples found in {data_dir}")
+
+    fields = {'image': (*size, 3)}
+    if task == 'segmentation':
+        fields['mask'] = size
+    writer = ShardWriter(output_dir, fields, shard_size)
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # map() keeps the sorted sample order while decoding in parallel
+        for count, (arrays, metadata) in enumerate(executor.map(load, samples), 1):
+            writer.add(arrays, **metadata)
+            if count % 1000 == 0:
+                logger.info(f"{count}/{len(samples)} samples written")
+    writer.close(task=task, size=list(size), class_names=CLASS_NAMES if task == 'classification' else None)
+
+    logger.info(f"Wrote {len(samples)} {task} samples in {len(writer.shards)} shard(s) to {output_dir} "
+                f"in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert the Oxford-IIIT Pet dataset into uint8 memmap shards')
+    parser.add_argument('--data-dir', default='oxford-iiit-pet')
+    parser.add_argument('--output-dir', help='Default: <data-dir>/shards/<task>')
+    parser.add_argument('--task', choices=TASKS, default='segmentation')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    build_shards(args.data_dir, args.output_dir or os.path.join(args.data_dir, 'shards', args.task),
+                 args.task, args.shard_size, args.workers)
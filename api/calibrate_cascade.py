@@ -0,0 +1,173 @@
+"""
+Offline job: calibrate the MobileNet -> ResNet classifier cascade
+Runs both checkpoints over a labelled validation sample and picks the lowest MobileNet top-1
+probability threshold whose cascade accuracy still meets the target, written for the API to load
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+from datetime import datetime
+
+import numpy as np
+import torch
+
+from pet_classifier import PetClassifier, logger
+from precompute_game_predictions import IMAGE_EXTENSIONS
+from quantize_models import load_batches
+from utils.cascade import DEFAULT_THRESHOLDS_PATH, PROJECT_ROOT
+from utils.image_catalog import extract_breed_from_filename, load_breed_mapping
+
+# Above any softmax probability, so the first stage answers nothing and every image escalates
+ALWAYS_ESCALATE_THRESHOLD = float(np.nextafter(1.0, 2.0))
+
+
+def score(classifier: PetClassifier, batches):
+    """
+    Top-1 probabilities and predictions of a classifier, plus its batched latency
+
+    Returns:
+        Tuple of (top-1 probability array, top-1 class array, ms per image)
+    """
+    model = classifier.model
+    probabilities, predictions = [], []
+    with torch.inference_mode():
+        model(batches[0].to(classifier.device))  # warm-up
+        start = time.perf_counter()
+        for batch in batches:
+            top_probs, top_classes = torch.softmax(model(batch.to(classifier.device)), dim=1).max(dim=1)
+            probabilities.append(top_probs.cpu().numpy())
+            predictions.append(top_classes.cpu().numpy())
+        seconds = time.perf_counter() - start
+
+    probabilities, predictions = np.concatenate(probabilities), np.concatenate(predictions)
+    return probabilities, predictions, seconds * 1000 / len(predictions)
+
+
+def choose_threshold(confidences: np.ndarray, fast_correct: np.ndarray, accurate_correct: np.ndarray,
+                     target_accuracy: float):
+    """
+    Lowest first-stage threshold whose cascade accuracy meets the target
+
+    Images at or above the threshold are answered by the first stage and the rest
+    by the second, so accepting the k most confident images gives an accuracy of
+    (first-stage hits among them + second-stage hits among the rest) / n.
+
+    Returns:
+        Tuple of (threshold, cascade accuracy, share answered by the first stage),
+        or None if even always escalating misses the target
+    """
+    order = np.argsort(-confidences, kind='stable')
+    confidences = confidences[order]
+    fast_hits = np.concatenate([[0], np.cumsum(fast_correct[order])])
+    accurate_hits = np.concatenate([[0], np.cumsum(accurate_correct[order])])
+    count = len(confidences)
+    # accuracy[k]: the k most confident images answered by the first stage
+    accuracy = (fast_hits + accurate_hits[-1] - accurate_hits) / count
+
+    # A threshold can only split the sample between two distinct confidences;
+    # k=0 (accept nothing, always escalate) is valid too
+    candidates = [k for k in range(count + 1) if k in (0, count) or confidences[k] < confidences[k - 1]]
+    accepted = [k for k in candidates if accuracy[k] >= target_accuracy]
+    if not accepted:
+        return None
+    best = max(accepted)
+    threshold = float(confidences[best - 1]) if best else ALWAYS_ESCALATE_THRESHOLD
+    return threshold, float(accuracy[best]), best / count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Calibrate the MobileNet -> ResNet cascade thresholds')
+    parser.add_argument('--images-dir', default=os.path.join(PROJECT_ROOT, 'images'))
+    parser.add_argument('--fast-checkpoint',
+                        default=os.path.join(PROJECT_ROOT, 'models', 'mobilenet_model.safetensors'))
+    parser.add_argument('--accurate-checkpoint',
+                        default=os.path.join(PROJECT_ROOT, 'models', 'resnet_model_improved.safetensors'))
+    parser.add_argument('--target-accuracy', type=float,
+                        help='Cascade accuracy to reach (default: ResNet accuracy minus --max-accuracy-drop)')
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.01)
+    parser.add_argument('--val-size', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--output', default=DEFAULT_THRESHOLDS_PATH)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for path in (args.fast_checkpoint, args.accurate_checkpoint):
+        if not os.path.exists(path):
+            raise SystemExit(f"Checkpoint not found: {path}")
+
+    fast = PetClassifier(model_type='mobilenet', model_path=args.fast_checkpoint)
+    accurate = PetClassifier(model_type='resnet', model_path=args.accurate_checkpoint)
+
+    # Only images whose breed is known can be scored
+    filename_to_breed = load_breed_mapping()[0]
+    class_index = {name: i for i, name in enumerate(fast.class_names)}
+    filenames = sorted(f for f in os.listdir(args.images_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    random.Random(args.seed).shuffle(filenames)
+    labelled = [(name, class_index.get(extract_breed_from_filename(name, filename_to_breed))) for name in filenames]
+    labelled = [(name, label) for name, label in labelled if label is not None][:args.val_size]
+    if not labelled:
+        raise SystemExit(f"No labelled images found in {args.images_dir}")
+    labels = np.array([label for _, label in labelled])
+
+    # Both classifiers preprocess identically, so decode the sample once
+    batches = load_batches(fast, args.images_dir, [name for name, _ in labelled], args.batch_size)
+    fast_confidence, fast_predictions, fast_ms = score(fast, batches)
+    _, accurate_predictions, accurate_ms = score(accurate, batches)
+    fast_correct = fast_predictions == labels
+    accurate_correct = accurate_predictions == labels
+
+    target_accuracy = args.target_accuracy
+    if target_accuracy is None:
+        target_accuracy = float(accurate_correct.mean()) - args.max_accuracy_drop
+
+    result = choose_threshold(fast_confidence, fast_correct, accurate_correct, target_accuracy)
+    if result is None:
+        raise SystemExit(f"Target accuracy {target_accuracy:.4f} is above what the cascade reaches on this "
+                         f"sample (ResNet alone: {accurate_correct.mean():.4f}); lower --target-accuracy")
+    threshold, cascade_accuracy, coverage = result
+    escalation_rate = 1 - coverage
+    accepted = fast_confidence >= threshold
+
+    calibration = {
+        'created': datetime.utcnow().isoformat(),
+        'target_accuracy': round(target_accuracy, 4),
+        'stages': [
+            {
+                'model_type': 'mobilenet',
+                'checkpoint': os.path.relpath(os.path.abspath(args.fast_checkpoint), PROJECT_ROOT),
+                'threshold': threshold,
+                'accuracy': round(float(fast_correct.mean()), 4),
+                'accuracy_when_accepted': round(float(fast_correct[accepted].mean()), 4) if accepted.any() else None,
+                'ms_per_image': round(fast_ms, 2)
+            },
+            {
+                'model_type': 'resnet',
+                'checkpoint': os.path.relpath(os.path.abspath(args.accurate_checkpoint), PROJECT_ROOT),
+                'threshold': None,
+                'accuracy': round(float(accurate_correct.mean()), 4),
+                'ms_per_image': round(accurate_ms, 2)
+            }
+        ],
+        'validation': {
+            'images': len(labels),
+            'seed': args.seed,
+            'cascade_accuracy': round(cascade_accuracy, 4),
+            'escalation_rate': round(escalation_rate, 4),
+            'expected_ms_per_image': round(fast_ms + escalation_rate * accurate_ms, 2),
+            'torch_threads': torch.get_num_threads()
+        }
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(calibration, f, indent=2)
+
+    print(f"\n{len(labels)} validation images, target accuracy {target_accuracy:.4f}")
+    print(f"{'model':<12}{'accuracy':>10}{'ms/img':>9}")
+    print(f"{'mobilenet':<12}{fast_correct.mean():>10.4f}{fast_ms:>9.2f}")
+    print(f"{'resnet':<12}{accurate_correct.mean():>10.4f}{accurate_ms:>9.2f}")
+    print(f"{'cascade':<12}{cascade_accuracy:>10.4f}{fast_ms + escalation_rate * accurate_ms:>9.2f}")
+    print(f"\nThreshold {threshold:.4f}: MobileNet answers {coverage:.1%}, {escalation_rate:.1%} escalate to ResNet")
+    logger.info(f"Saved cascade thresholds to {args.output}")
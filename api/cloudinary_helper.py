@@ -1,4 +1,5 @@
-from typing import Dict, Optional
+import random
+from typing import Any, Dict, List, Optional
 
 class CloudinaryHelper:
     """Helper class for managing Cloudinary image URLs in Python backend"""
@@ -8,7 +9,8 @@ class CloudinaryHelper:
     VERSION = 'v1756482370'
     
     def __init__(self):
-        pass
+        # filename -> {'publicId': ...}; empty until a mapping source is configured
+        self.mappings: Dict[str, Dict[str, str]] = {}
     
     def get_image_url(self, filename: str, width: int = 800, height: int = 600, 
                      crop: str = 'fill', quality: str = 'auto') -> str:
@@ -0,0 +1,78 @@
+"""
+Offline job: export every classifier checkpoint to TorchScript and ONNX
+Checks each exported graph against the eager model's outputs and compares single-image latency
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import torch
+
+from pet_classifier import PetClassifier, IMAGE_SIZE
+from precompute_game_predictions import find_checkpoints
+from utils.game_predictions import PROJECT_ROOT
+from utils.inference_backends import BACKEND_EAGER, BACKEND_TORCHSCRIPT, BACKEND_ONNX, check_parity
+
+EXPORT_BACKENDS = (BACKEND_TORCHSCRIPT, BACKEND_ONNX)
+
+
+def measure_latency(model, batch: torch.Tensor, runs: int, warmup: int = 5):
+    """p50 and p90 latency of one forward pass in milliseconds"""
+    timings = []
+    with torch.no_grad():
+        for i in range(warmup + runs):
+            start = time.perf_counter()
+            model(batch)
+            if i >= warmup:
+                timings.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(timings, 50)), float(np.percentile(timings, 90))
+
+
+def export_checkpoint(model_type: str, model_path: str, runs: int, parity_batches: int, atol: float) -> bool:
+    """Export one checkpoint, check parity of every backend and print a latency table"""
+    eager = PetClassifier(model_type=model_type, model_path=model_path)
+    paths = eager.export(formats=EXPORT_BACKENDS)
+
+    generator = torch.Generator().manual_seed(0)
+    batches = [torch.randn(size, 3, *IMAGE_SIZE, generator=generator) for size in (1, 4, 8)][:parity_batches]
+    single = batches[0][:1]
+
+    print(f"\n{os.path.basename(model_path)}")
+    print(f"{'backend':<13}{'p50 ms':>9}{'p90 ms':>9}{'max |dp|':>12}{'top-1':>8}  parity")
+    p50, p90 = measure_latency(eager.model, single, runs)
+    print(f"{BACKEND_EAGER:<13}{p50:>9.2f}{p90:>9.2f}{'-':>12}{'-':>8}  -")
+
+    all_passed = True
+    for backend in EXPORT_BACKENDS:
+        # Load the exported file the same way the API does
+        served = PetClassifier(model_type=model_type, model_path=model_path, backend=backend)
+        parity = check_parity(eager.model, served.model, batches, atol)
+        p50, p90 = measure_latency(served.model, single, runs)
+        all_passed &= parity['passed']
+        print(f"{backend:<13}{p50:>9.2f}{p90:>9.2f}{parity['max_probability_diff']:>12.2e}"
+              f"{parity['top1_agreement']:>8.3f}  {'ok' if parity['passed'] else 'FAILED'}"
+              f"  ({os.path.relpath(paths[backend], PROJECT_ROOT)})")
+    return all_passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export classifiers to TorchScript and ONNX and check parity')
+    parser.add_argument('--models-dir', default=os.path.join(PROJECT_ROOT, 'models'))
+    parser.add_argument('--runs', type=int, default=50, help='Timed forward passes per backend')
+    parser.add_argument('--parity-batches', type=int, default=3)
+    parser.add_argument('--atol', type=float, default=1e-4, help='Max softmax probability difference')
+    args = parser.parse_args()
+
+    checkpoints = find_checkpoints(args.models_dir)
+    if not checkpoints:
+        raise SystemExit(f"No classifier checkpoints found in {args.models_dir}")
+
+    results = [export_checkpoint(model_type, model_path, args.runs, args.parity_batches, args.atol)
+               for model_type, model_path in checkpoints]
+    if not all(results):
+        print("\nParity check failed for at least one exported model")
+        sys.exit(1)
+    print("\nAll exported models match eager outputs")
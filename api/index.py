@@ -1,20 +1,31 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 import os
 import json
+import hashlib
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from werkzeug.utils import secure_filename
-import hashlib
 from dotenv import load_dotenv
 
 # Load environment variables from .env.local
 load_dotenv('../.env.local')
 
-from pet_classifier import PetClassifier
+from pet_classifier import PetClassifier, MultiHeadClassifier, IMAGE_SIZE, generate_game_question, model_id_for
+from pet_segmentation import PetSegmentation, DEFAULT_SEGMENTATION_MODEL_PATH, SEGMENTATION_SIZE
 from utils.model_manager import ModelManager
 from utils.model_metadata import get_all_models, get_model_metadata, get_model_stats, update_model_usage
 from utils.validation import APIValidator, ValidationError as ValidatorError
+from utils.batch_scheduler import BatchScheduler
+from utils.uploads import InMemoryRequest, read_upload_bytes, iter_multipart_files, iter_tar_files
+from utils.classifier_pool import ClassifierPool
+from utils.prediction_cache import PredictionCache, hash_image_bytes
+from utils.question_pool import QuestionPool
+from utils.cpu_optimization import DEFAULT_CPU_OPTIMIZED
+from utils.cascade import ClassifierCascade, CASCADE_MODEL_TYPE
+from utils.multi_head import find_head_checkpoints, resolve_checkpoint
+from utils.preprocessing import resize_pyramid
+from utils.mask_encoding import DEFAULT_MASK_FORMAT, DEFAULT_CUTOUT_FORMAT, DEFAULT_CUTOUT_QUALITY
 from utils.error_handler import (
     error_handler, validate_content_type, validate_json_size, require_fields,
     register_error_handlers, log_model_usage, APIError, ValidationError,
@@ -22,6 +33,7 @@ from utils.error_handler import (
 )
 
 app = Flask(__name__)
+app.request_class = InMemoryRequest
 
 # Configure CORS
 CORS(app, resources={
@@ -29,7 +41,7 @@ CORS(app, resources={
         "origins": ["http://localhost:3000", "http://localhost:5000"],
         "methods": ["GET", "POST", "OPTIONS"],
         "allow_headers": ["Content-Type", "X-CSRF-Token", "X-Requested-With"],
-        "expose_headers": ["Content-Type"],
+        "expose_headers": ["Content-Type", "X-Prediction-Cache", "X-Cascade-Stage"],
         "supports_credentials": True,
         "max_age": 3600
     }
@@ -44,23 +56,72 @@ model_manager = ModelManager()
 # Initialize API validator
 validator = APIValidator()
 
-# Dictionary to store loaded classifiers
-classifiers = {}
+# LRU pool of loaded classifiers, bounded by CLASSIFIER_POOL_MAX_MB of parameters
+classifiers = ClassifierPool()
+DEFAULT_MODEL_KEY = 'resnet'
+# The trained checkpoint, or its best training snapshot when only snapshots are checked in
+DEFAULT_MODEL_PATH = resolve_checkpoint(os.path.join('..', 'models', 'resnet_model_improved.safetensors'))
+
+# Default inference precision; int8 variants are built by quantize_models.py
+DEFAULT_PRECISION = os.environ.get('INFERENCE_PRECISION', 'fp32')
+
+# Execution backend for fp32 models: eager, torchscript or onnx (exports written by export_models.py)
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'eager')
+
+# Fold BatchNorm and run fp32 models in channels_last layout (CPU_OPTIMIZED=true)
+CPU_OPTIMIZED = DEFAULT_CPU_OPTIMIZED
+
+# Memory-map checkpoint weights so gunicorn workers share one page-cache copy
+MMAP_WEIGHTS = os.environ.get('MMAP_WEIGHTS', 'true').lower() in ('1', 'true', 'yes')
+
+# Micro-batching scheduler shared by all prediction requests
+inference_scheduler = BatchScheduler()
+PREDICTION_TIMEOUT = float(os.environ.get('PREDICTION_TIMEOUT', 30))
+
+# Prediction results keyed by image content and model file (PREDICTION_CACHE_DB adds a disk tier)
+prediction_cache = PredictionCache()
+
+# Bulk prediction: images per forward pass and threads decoding each batch
+BATCH_PREDICT_SIZE = int(os.environ.get('BATCH_PREDICT_SIZE', 16))
+batch_decode_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('BATCH_DECODE_WORKERS', 4)), thread_name_prefix='batch-decode'
+)
+TAR_CONTENT_TYPES = ('application/x-tar', 'application/gzip', 'application/x-gzip', 'application/x-gtar')
+
+# MobileNet -> ResNet cascade for model_type=cascade, calibrated by calibrate_cascade.py
+classifier_cascade = ClassifierCascade()
+
+# ResNet checkpoints served by /api/predict/heads, grouped by shared backbone
+MULTI_HEAD_MODELS_DIR = os.environ.get('MULTI_HEAD_MODELS_DIR', os.path.join('..', 'models'))
+
+# UNet served by /api/segment through the classifier pool and the micro-batching scheduler
+SEGMENTATION_MODEL_KEY = 'segmentation'
+SEGMENTATION_MODEL_PATH = os.environ.get('SEGMENTATION_MODEL_PATH', DEFAULT_SEGMENTATION_MODEL_PATH)
+
+# /api/analyze runs classification on these threads while the request thread segments
+analyze_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('ANALYZE_WORKERS', 4)), thread_name_prefix='analyze'
+)
+
+# Ready-made game questions per (model, game mode), refilled by a background thread
+question_pool = QuestionPool()
 
 # Initialize default classifier with error handling
 try:
     # Try to load the improved safetensors model
-    improved_model_path = os.path.join('..', 'models', 'resnet_model_improved.safetensors')
-    if os.path.exists(improved_model_path):
-        classifiers['resnet'] = PetClassifier(model_type='resnet', model_path=improved_model_path)
+    if os.path.exists(DEFAULT_MODEL_PATH):
+        classifiers.put(DEFAULT_MODEL_KEY, PetClassifier(model_type='resnet', model_path=DEFAULT_MODEL_PATH,
+                                                         mmap_weights=MMAP_WEIGHTS, backend=INFERENCE_BACKEND,
+                                                         cpu_optimized=CPU_OPTIMIZED),
+                        pin=True)
         print("Loaded improved ResNet model from safetensors")
     else:
         # Fall back to basic model
-        classifiers['resnet'] = PetClassifier(model_type='resnet')
+        classifiers.put(DEFAULT_MODEL_KEY, PetClassifier(model_type='resnet'), pin=True)
         print("Loaded default ResNet model")
 except Exception as e:
     print(f"Warning: Could not initialize default classifier: {e}")
-    classifiers['resnet'] = PetClassifier(model_type='resnet')
+    classifiers.put(DEFAULT_MODEL_KEY, PetClassifier(model_type='resnet'), pin=True)
 
 def scan_models_directory():
     """Scan the models directory for available models with secure validation"""
@@ -137,93 +198,547 @@ def health_check():
             'error': str(e)
         }), 500
 
+def get_classifier(model_type: str, model_name: str = None, precision: str = 'fp32'):
+    """
+    Get a pooled classifier for a prediction request, loading it on first use
+    
+    Returns:
+        Tuple of (pool key, classifier)
+    """
+    model_key = f"{model_type}_{model_name}" if model_name else model_type
+    model_path = None
+    if model_name:
+        model_path = os.path.join('models', model_name)
+        if not os.path.exists(model_path):
+            raise ValidationError(f'Model not found: {model_name}')
+    
+    if precision != 'fp32' and model_path is None and model_type == DEFAULT_MODEL_KEY:
+        model_path = DEFAULT_MODEL_PATH
+    return _get_pooled_classifier(model_key, model_type, model_path, precision, model_name or model_type)
+
+def get_cascade_classifier(stage: dict, precision: str = 'fp32'):
+    """
+    Get the pooled classifier for one cascade stage
+    
+    Returns:
+        Tuple of (pool key, classifier)
+    """
+    model_type, model_path = stage['model_type'], stage['model_path']
+    if model_path is None:
+        model_key = model_type
+    elif model_type == DEFAULT_MODEL_KEY and os.path.abspath(model_path) == os.path.abspath(DEFAULT_MODEL_PATH):
+        # Share the pinned default classifier instead of loading the same checkpoint twice
+        model_key = DEFAULT_MODEL_KEY
+    else:
+        model_key = f"{model_type}_{os.path.basename(model_path)}"
+    
+    if model_path is not None and not os.path.exists(model_path):
+        raise APIError(f'Cascade checkpoint not found: {os.path.basename(model_path)}')
+    return _get_pooled_classifier(model_key, model_type, model_path, precision, model_type)
+
+def _get_pooled_classifier(model_key: str, model_type: str, model_path: str, precision: str, label: str):
+    """Get or load a classifier under its pool key, suffixed with the precision for int8 variants"""
+    if precision != 'fp32':
+        model_key = f"{model_key}@{precision}"
+    
+    try:
+        classifier = classifiers.get_or_create(
+            model_key,
+            lambda: PetClassifier(model_type=model_type, model_path=model_path, mmap_weights=MMAP_WEIGHTS,
+                                  precision=precision, backend=INFERENCE_BACKEND if precision == 'fp32' else 'eager',
+                                  cpu_optimized=CPU_OPTIMIZED)
+        )
+    except FileNotFoundError:
+        raise ValidationError(f'No {precision} variant available for {label}', 'precision')
+    return model_key, classifier
+
+def _run_prediction(model_key, classifier, image_bytes, image_hash, image=None):
+    """
+    Answer one image from the prediction cache, or decode it and batch the forward pass
+    with concurrent requests
+    
+    Args:
+        image: Already decoded image to reuse, if any
+        
+    Returns:
+        Tuple of (predictions, cache status, decoded image or None)
+    """
+    model_identity = prediction_cache.model_identity(classifier)
+    predictions = prediction_cache.get(model_identity, image_hash)
+    if predictions is not None:
+        return predictions, 'hit', image
+    
+    if image is None:
+        try:
+            image = classifier.decode_image(image_bytes)
+        except (OSError, SyntaxError):
+            raise ValidationError('Invalid image file')
+    predictions = inference_scheduler.run(
+        model_key, image, classifier.predict_batch, timeout=PREDICTION_TIMEOUT
+    )
+    
+    # Validate prediction results
+    if not predictions or not isinstance(predictions, dict):
+        raise APIError('Invalid prediction results')
+    
+    prediction_cache.put(model_identity, image_hash, predictions)
+    return predictions, 'miss', image
+
+def _predict_cascade(image_bytes, image_hash, precision):
+    """
+    Run the cascade stages in order until one is confident enough
+    
+    Returns:
+        Tuple of (predictions, cache status, model type of the stage that answered)
+    """
+    stages = classifier_cascade.stages()
+    if stages is None:
+        raise ValidationError('Cascade is not calibrated. Run calibrate_cascade.py first.', 'model_type')
+    
+    image = None
+    for stage in stages:
+        model_key, classifier = get_cascade_classifier(stage, precision)
+        predictions, cache_status, image = _run_prediction(model_key, classifier, image_bytes, image_hash, image)
+        if classifier_cascade.accepts(stage, predictions):
+            break
+    
+    classifier_cascade.record(stage['model_type'])
+    return predictions, cache_status, stage['model_type']
+
 @app.route('/api/predict', methods=['POST'])
 @error_handler
 def predict():
     """Predict pet breed from uploaded image with comprehensive validation"""
-    temp_path = None
+    # Check if image is in request
+    if 'image' not in request.files:
+        # Check for image URL in JSON body
+        data = request.get_json(silent=True)
+        if data and 'image_url' in data:
+            return jsonify({'error': 'URL-based prediction not supported in this version'}), 400
+        raise ValidationError('No image provided')
+    
+    file = request.files['image']
+    
+    # Validate file
+    if file.filename == '':
+        raise ValidationError('No file selected')
+    
+    # Read the upload into memory and validate its content by magic number
+    image_bytes = read_upload_bytes(file)
     try:
-        # Check if image is in request
-        if 'image' not in request.files:
-            # Check for image URL in JSON body
-            data = request.get_json()
-            if data and 'image_url' in data:
-                return jsonify({'error': 'URL-based prediction not supported in this version'}), 400
-            raise ValidationError('No image provided')
-        
-        file = request.files['image']
-        
-        # Validate file
-        if file.filename == '':
-            raise ValidationError('No file selected')
-        
-        # Security: Validate file extension and content
-        if not APIValidator.validate_file_extension(file.filename, validator.ALLOWED_EXTENSIONS):
-            raise ValidationError(f'Invalid file type. Allowed: {", ".join(validator.ALLOWED_EXTENSIONS)}')
-        
-        # Generate secure temporary filename
-        timestamp = int(time.time() * 1000)
-        file_hash = hashlib.md5(file.filename.encode()).hexdigest()[:8]
-        filename = secure_filename(file.filename)
-        temp_path = f'temp_{timestamp}_{file_hash}_{filename}'
-        
-        # Save and validate file size
-        file.save(temp_path)
-        file_size = os.path.getsize(temp_path)
-        
-        if file_size > validator.MAX_FILE_SIZE:
-            os.remove(temp_path)
-            raise ValidationError(f'File too large. Maximum size: {validator.MAX_FILE_SIZE // (1024*1024)}MB')
-        
-        # Validate it's actually an image
-        if not APIValidator.validate_image_file(temp_path):
-            os.remove(temp_path)
-            raise ValidationError('Invalid image file')
-        
-        # Get model parameters with validation
-        model_type = APIValidator.validate_model_type(
-            request.form.get('model_type', 'resnet')
+        APIValidator.validate_image_bytes(image_bytes, file.filename)
+    except ValidatorError as e:
+        raise ValidationError(e.message, e.field)
+    
+    # Get model parameters with validation
+    model_type = request.form.get('model_type', 'resnet')
+    if model_type.lower().strip() == CASCADE_MODEL_TYPE:
+        model_type = CASCADE_MODEL_TYPE
+    else:
+        model_type = APIValidator.validate_model_type(model_type)
+    
+    model_name = None
+    if 'model_name' in request.form:
+        model_name = APIValidator.sanitize_string(
+            request.form.get('model_name'),
+            max_length=100
         )
-        
-        model_name = None
-        if 'model_name' in request.form:
-            model_name = APIValidator.sanitize_string(
-                request.form.get('model_name'),
-                max_length=100
-            )
-        
-        # Get or create classifier
-        model_key = f"{model_type}_{model_name}" if model_name else model_type
-        if model_key not in classifiers:
-            model_path = None
-            if model_name:
-                model_path = os.path.join('models', model_name)
-                if not os.path.exists(model_path):
-                    raise ValidationError(f'Model not found: {model_name}')
-            classifiers[model_key] = PetClassifier(model_type=model_type, model_path=model_path)
-        
-        classifier = classifiers[model_key]
-        
-        # Make prediction with timeout
-        predictions = classifier.predict(temp_path)
-        
-        # Log model usage
+    
+    try:
+        precision = APIValidator.validate_precision(request.form.get('precision', DEFAULT_PRECISION))
+    except ValidatorError as e:
+        raise ValidationError(e.message, 'precision')
+    
+    # Repeat images are answered from the content-addressed cache
+    image_hash = hash_image_bytes(image_bytes)
+    
+    if model_type == CASCADE_MODEL_TYPE:
+        if model_name:
+            raise ValidationError('model_name cannot be used with the cascade', 'model_name')
+        predictions, cache_status, stage = _predict_cascade(image_bytes, image_hash, precision)
+        log_model_usage(stage, None, 'cascade_prediction')
+        logger.info(f"Successful prediction: cascade answered by {stage} model")
+    else:
+        model_key, classifier = get_classifier(model_type, model_name, precision)
+        predictions, cache_status, _ = _run_prediction(model_key, classifier, image_bytes, image_hash)
         log_model_usage(model_type, model_name, 'prediction')
-        
-        # Validate prediction results
-        if not predictions or not isinstance(predictions, dict):
-            raise APIError('Invalid prediction results')
-        
         logger.info(f"Successful prediction: {model_type} model")
-        return jsonify(predictions)
-        
-    finally:
-        # Always clean up temporary file
-        if temp_path and os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-            except Exception as e:
-                logger.warning(f"Failed to clean up temporary file {temp_path}: {e}")
+    
+    response = jsonify(predictions)
+    response.headers['X-Prediction-Cache'] = cache_status
+    if model_type == CASCADE_MODEL_TYPE:
+        response.headers['X-Cascade-Stage'] = stage
+    return response
+
+def _decode_batch_item(classifier, model_identity, item):
+    """Validate, cache-check and decode one image of a bulk upload"""
+    if item.error:
+        return {'error': item.error}
+    try:
+        APIValidator.validate_image_bytes(item.data, item.filename)
+    except ValidatorError as e:
+        return {'error': e.message}
+
+    image_hash = hash_image_bytes(item.data)
+    predictions = prediction_cache.get(model_identity, image_hash)
+    if predictions is not None:
+        return {'predictions': predictions}
+
+    try:
+        return {'image': classifier.decode_image(item.data), 'hash': image_hash}
+    except (OSError, SyntaxError):
+        return {'error': 'Invalid image file'}
+
+def _predict_upload_batch(classifier, batch):
+    """Decode a batch of uploads in parallel and classify the decodable ones in one forward pass"""
+    model_identity = prediction_cache.model_identity(classifier)
+    results = list(batch_decode_executor.map(
+        lambda item: _decode_batch_item(classifier, model_identity, item), batch
+    ))
+
+    pending = [result for result in results if 'image' in result]
+    if pending:
+        for result, predictions in zip(pending, classifier.predict_batch([r['image'] for r in pending])):
+            prediction_cache.put(model_identity, result.pop('hash'), predictions)
+            result.pop('image')
+            result['predictions'] = predictions
+    return results
+
+@app.route('/api/predict/batch', methods=['POST'])
+@error_handler
+def predict_batch():
+    """
+    Predict pet breeds for many images sent as one multipart or tar upload
+
+    The body is parsed incrementally and classified in fixed-size batches. One
+    NDJSON line is streamed per image as soon as its batch finishes, followed by
+    a summary line, so memory use is bounded by the batch size rather than the
+    upload size.
+    """
+    model_type = APIValidator.validate_model_type(request.args.get('model_type', 'resnet'))
+
+    model_name = None
+    if 'model_name' in request.args:
+        model_name = APIValidator.sanitize_string(request.args.get('model_name'), max_length=100)
+
+    try:
+        precision = APIValidator.validate_precision(request.args.get('precision', DEFAULT_PRECISION))
+    except ValidatorError as e:
+        raise ValidationError(e.message, 'precision')
+
+    batch_size = request.args.get('batch_size', BATCH_PREDICT_SIZE, type=int)
+    if not 1 <= batch_size <= BATCH_PREDICT_SIZE * 4:
+        raise ValidationError(f'batch_size must be between 1 and {BATCH_PREDICT_SIZE * 4}', 'batch_size')
+
+    # Read the raw body stream; touching request.files would buffer the whole upload
+    if request.mimetype == 'multipart/form-data':
+        boundary = request.mimetype_params.get('boundary')
+        if not boundary:
+            raise ValidationError('Missing multipart boundary')
+        items = iter_multipart_files(request.stream, boundary)
+    elif request.mimetype in TAR_CONTENT_TYPES:
+        items = iter_tar_files(request.stream)
+    else:
+        raise ValidationError('Content-Type must be multipart/form-data or a tar archive')
+
+    _, classifier = get_classifier(model_type, model_name, precision)
+    log_model_usage(model_type, model_name, 'batch_prediction')
+
+    def generate():
+        count, errors, batch = 0, 0, []
+
+        def flush():
+            nonlocal count, errors
+            for item, result in zip(batch, _predict_upload_batch(classifier, batch)):
+                errors += 'error' in result
+                yield json.dumps({'index': count, 'filename': item.filename, **result}) + '\n'
+                count += 1
+            batch.clear()
+
+        try:
+            for item in items:
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    yield from flush()
+            if batch:
+                yield from flush()
+        except APIError as e:
+            # Headers are already sent, so a malformed body is reported in-stream
+            errors += 1
+            yield json.dumps({'error': e.message}) + '\n'
+        except Exception as e:
+            logger.error(f"Batch prediction failed: {e}")
+            errors += 1
+            yield json.dumps({'error': 'Batch prediction failed'}) + '\n'
+        logger.info(f"Batch prediction: {count} images, {errors} errors, {model_type} model")
+        yield json.dumps({'summary': {'images': count, 'errors': errors}}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def get_multi_head_classifier():
+    """
+    Get the pooled multi-head classifier over every ResNet checkpoint, reloading it
+    when checkpoints are added, replaced or removed
+    
+    Returns:
+        Tuple of (pool key, classifier)
+    """
+    model_paths = find_head_checkpoints(MULTI_HEAD_MODELS_DIR)
+    if not model_paths:
+        raise ValidationError('No ResNet checkpoints available for multi-head serving')
+    
+    signature = '|'.join(f"{os.path.basename(path)}:{os.path.getmtime(path)}" for path in model_paths)
+    model_key = f"resnet@heads:{hashlib.blake2b(signature.encode(), digest_size=6).hexdigest()}"
+    classifier = classifiers.get_or_create(
+        model_key, lambda: MultiHeadClassifier(model_paths, mmap_weights=MMAP_WEIGHTS, cpu_optimized=CPU_OPTIMIZED)
+    )
+    return model_key, classifier
+
+@app.route('/api/predict/heads', methods=['POST'])
+@error_handler
+def predict_heads():
+    """
+    Predict with every ResNet checkpoint at once and return each head's predictions
+    plus their ensemble
+    
+    Checkpoints sharing a backbone run it once, so comparing or ensembling them
+    costs little more than a single prediction.
+    """
+    if 'image' not in request.files:
+        raise ValidationError('No image provided')
+    
+    file = request.files['image']
+    if file.filename == '':
+        raise ValidationError('No file selected')
+    
+    image_bytes = read_upload_bytes(file)
+    try:
+        APIValidator.validate_image_bytes(image_bytes, file.filename)
+    except ValidatorError as e:
+        raise ValidationError(e.message, e.field)
+    
+    model_key, classifier = get_multi_head_classifier()
+    try:
+        image = PetClassifier.decode_image(image_bytes)
+    except (OSError, SyntaxError):
+        raise ValidationError('Invalid image file')
+    result = inference_scheduler.run(model_key, image, classifier.predict_batch, timeout=PREDICTION_TIMEOUT)
+    
+    log_model_usage('resnet', None, 'multi_head_prediction')
+    return jsonify({**result, 'backbones': classifier.groups})
+
+def get_segmentation():
+    """Get the pooled segmentation model, loading it on first use"""
+    model_path = SEGMENTATION_MODEL_PATH if os.path.exists(SEGMENTATION_MODEL_PATH) else None
+    return classifiers.get_or_create(
+        SEGMENTATION_MODEL_KEY, lambda: PetSegmentation(model_path, cpu_optimized=CPU_OPTIMIZED)
+    )
+
+def _segmentation_options():
+    """Validate the segmentation mode and encoding form fields"""
+    try:
+        return {
+            'mode': APIValidator.validate_segmentation_mode(request.form.get('mode', 'resize')),
+            'mask_format': APIValidator.validate_mask_format(request.form.get('mask_format', DEFAULT_MASK_FORMAT)),
+            'cutout_format': APIValidator.validate_cutout_format(
+                request.form.get('cutout_format', DEFAULT_CUTOUT_FORMAT)
+            ),
+            'quality': APIValidator.validate_quality(request.form.get('quality', DEFAULT_CUTOUT_QUALITY))
+        }
+    except ValidatorError as e:
+        raise ValidationError(e.message, e.field)
+
+def _predict_mask(segmentation, image, mode):
+    """
+    Run the UNet on one decoded image through the micro-batching scheduler
+    
+    Outside tiled mode the image is shrunk to the UNet input here, on the request
+    thread, so the scheduler's single worker thread only runs forward passes.
+    """
+    if mode == 'tiled':
+        # Tiles of concurrent requests share forward passes of tile_batch_size tiles
+        return inference_scheduler.run(
+            f"{SEGMENTATION_MODEL_KEY}@tiled", image, segmentation.predict_masks_tiled, timeout=PREDICTION_TIMEOUT
+        )
+    return inference_scheduler.run(
+        SEGMENTATION_MODEL_KEY, segmentation.model_input(image), segmentation.predict_masks, timeout=PREDICTION_TIMEOUT
+    )
+
+@app.route('/api/segment', methods=['POST'])
+@error_handler
+def segment():
+    """
+    Segment the pet in an uploaded image
+    
+    The upload is shrunk to the 256x256 UNet input in the request thread, and the
+    UNet passes of concurrent requests are stacked into one batch by the inference
+    scheduler; masks are upscaled and applied in the request thread.
+    Optional form fields select the encodings: mask_format (png1, png, rle,
+    polygon), cutout_format (jpeg, webp, png, none) and quality (1-100). With
+    mode=tiled the UNet runs on overlapping tiles of the image (up to
+    SEGMENTATION_TILED_MAX_SIDE pixels) for sharper masks on large photos.
+    """
+    start_time = time.time()
+    if 'image' not in request.files:
+        raise ValidationError('No image provided')
+    
+    file = request.files['image']
+    if file.filename == '':
+        raise ValidationError('No file selected')
+    
+    image_bytes = read_upload_bytes(file)
+    try:
+        APIValidator.validate_image_bytes(image_bytes, file.filename)
+    except ValidatorError as e:
+        raise ValidationError(e.message, e.field)
+    
+    options = _segmentation_options()
+    segmentation = get_segmentation()
+    try:
+        image = PetSegmentation.decode_image(image_bytes)
+    except (OSError, SyntaxError):
+        raise ValidationError('Invalid image file')
+    mask = _predict_mask(segmentation, image, options['mode'])
+    result = segmentation.compose_result(image, mask, start_time, with_cutout=options['cutout_format'] != 'none')
+    result = segmentation.encode_result(result, options['mask_format'], options['cutout_format'], options['quality'])
+    
+    log_model_usage('unet', None, 'tiled_segmentation' if options['mode'] == 'tiled' else 'segmentation')
+    return jsonify(result)
+
+@app.route('/api/analyze', methods=['POST'])
+@error_handler
+def analyze():
+    """
+    Classify the breed and segment the pet of one uploaded image
+    
+    The model inputs come from a draft decode at the smallest JPEG scale covering
+    the 256x256 UNet input, resized once into the UNet input, from which the
+    224x224 classifier input is derived. Classification runs on the analyze thread
+    pool while the request thread decodes the upload at full size (only when the
+    draft was reduced) and segments, both through the micro-batching scheduler.
+    The mask and cutout are composed against the full-size image (tiled mode also
+    cuts its tiles from it), so the segmentation matches /api/segment. With
+    classify_cutout=true the classifier instead sees the masked cutout (pet over
+    black), after segmentation; images where no pet pixels are found fall back to
+    the whole image.
+    
+    The classifier input is not built the way /api/predict builds it, so
+    predictions are cached under their own key, which includes the draft size,
+    and never shared with /api/predict.
+    
+    Accepts the /api/predict fields (model_type, model_name, precision) and the
+    /api/segment fields (mode, mask_format, cutout_format, quality).
+    """
+    start_time = time.time()
+    if 'image' not in request.files:
+        raise ValidationError('No image provided')
+    
+    file = request.files['image']
+    if file.filename == '':
+        raise ValidationError('No file selected')
+    
+    image_bytes = read_upload_bytes(file)
+    try:
+        APIValidator.validate_image_bytes(image_bytes, file.filename)
+        model_type = APIValidator.validate_model_type(request.form.get('model_type', 'resnet'))
+        precision = APIValidator.validate_precision(request.form.get('precision', DEFAULT_PRECISION))
+    except ValidatorError as e:
+        raise ValidationError(e.message, e.field)
+    
+    model_name = None
+    if 'model_name' in request.form:
+        model_name = APIValidator.sanitize_string(request.form.get('model_name'), max_length=100)
+    options = _segmentation_options()
+    classify_cutout = request.form.get('classify_cutout', 'false').lower().strip() in ('1', 'true', 'yes')
+    
+    model_key, classifier = get_classifier(model_type, model_name, precision)
+    segmentation = get_segmentation()
+    draft_size = SEGMENTATION_SIZE[::-1]
+    try:
+        model_image = PetSegmentation.decode_image(image_bytes, draft_size)
+    except (OSError, SyntaxError):
+        raise ValidationError('Invalid image file')
+    levels = resize_pyramid(model_image, [SEGMENTATION_SIZE, IMAGE_SIZE])
+    # Namespaced so pyramid-derived predictions never answer /api/predict (or vice versa)
+    image_hash = f"analyze@{draft_size[0]}x{draft_size[1]}:{hash_image_bytes(image_bytes)}"
+    
+    classification = None
+    if not classify_cutout:
+        classification = analyze_executor.submit(
+            _run_prediction, model_key, classifier, image_bytes, image_hash, levels[IMAGE_SIZE]
+        )
+    
+    # The mask is applied at full size, as /api/segment does; non-JPEGs are never drafted
+    image = model_image
+    if model_image.size != PetSegmentation.image_size(image_bytes):
+        image = PetSegmentation.decode_image(image_bytes)
+    
+    # Tiled mode cuts its tiles from the full-size image
+    mask = _predict_mask(segmentation, image if options['mode'] == 'tiled' else levels[SEGMENTATION_SIZE],
+                         options['mode'])
+    result = segmentation.compose_result(image, mask, start_time, with_cutout=options['cutout_format'] != 'none')
+    
+    classified_input = 'image'
+    if classify_cutout:
+        if result['confidence'] > 0:
+            classified_input = 'cutout'
+            cutout = PetSegmentation.cut_out(levels[IMAGE_SIZE], result['model_mask'])
+            classification = analyze_executor.submit(
+                lambda: (inference_scheduler.run(model_key, cutout, classifier.predict_batch,
+                                                 timeout=PREDICTION_TIMEOUT), 'bypass', None)
+            )
+        else:
+            classification = analyze_executor.submit(
+                _run_prediction, model_key, classifier, image_bytes, image_hash, levels[IMAGE_SIZE]
+            )
+    
+    # Encode the segmentation while the classification finishes
+    encoded = segmentation.encode_result(result, options['mask_format'], options['cutout_format'], options['quality'])
+    predictions, cache_status, _ = classification.result()
+    if not predictions or not isinstance(predictions, dict):
+        raise APIError('Invalid prediction results')
+    
+    log_model_usage(model_type, model_name, 'analyze')
+    response = jsonify({
+        'predictions': predictions,
+        'classifiedInput': classified_input,
+        'segmentation': encoded,
+        'processingTime': time.time() - start_time
+    })
+    response.headers['X-Prediction-Cache'] = cache_status
+    return response
+
+@app.route('/api/inference/stats', methods=['GET'])
+def get_inference_stats():
+    """Get micro-batching queue depth and batch size statistics"""
+    try:
+        return jsonify(inference_scheduler.get_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/inference/pool', methods=['GET'])
+def get_classifier_pool_stats():
+    """Get classifier pool occupancy and hit/miss/eviction counters"""
+    try:
+        return jsonify(classifiers.get_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/inference/cache', methods=['GET'])
+def get_prediction_cache_stats():
+    """Get prediction cache hit/miss counters"""
+    try:
+        return jsonify(prediction_cache.get_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/inference/cascade', methods=['GET'])
+def get_cascade_stats():
+    """Get cascade thresholds and the share of requests each stage answered"""
+    try:
+        return jsonify(classifier_cascade.get_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/game/start', methods=['POST'])
 @error_handler
@@ -244,24 +759,20 @@ def start_game():
         if data.get('model_name'):
             model_name = APIValidator.sanitize_string(data.get('model_name'), max_length=100)
         
-        # Get or create classifier with default safetensors model
-        model_key = f"{model_type}_{model_name}" if model_name else model_type
-        if model_key not in classifiers:
-            model_path = None
-            if model_name:
-                model_path = os.path.join('models', model_name)
-            else:
-                # Use the existing safetensors model by default
-                default_model_path = os.path.join('..', 'models', 'resnet_model.safetensors')
-                if os.path.exists(default_model_path):
-                    model_path = default_model_path
-            
-            classifiers[model_key] = PetClassifier(model_type=model_type, model_path=model_path)
-        
-        classifier = classifiers[model_key]
-        
-        # Generate game question
-        game_data = classifier.generate_game_question(game_mode=game_mode)
+        # Resolve the checkpoint only to name its precomputed predictions; questions
+        # need no loaded model, so the pool never keeps a classifier alive
+        if model_name:
+            model_path = os.path.join('models', model_name)
+        else:
+            # The checkpoint get_classifier serves by default, so the id matches its precomputed row
+            model_path = DEFAULT_MODEL_PATH if model_type == DEFAULT_MODEL_KEY else None
+        model_id = model_id_for(model_type, model_path)
+        
+        # Serve a pre-generated question; the pool refills in the background
+        game_data = question_pool.pop(
+            (model_id, game_mode),
+            lambda: generate_game_question(model_id, game_mode)
+        )
         
         # Add caching headers for game data
         response = jsonify(game_data)
@@ -274,6 +785,14 @@ def start_game():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/game/pool', methods=['GET'])
+def get_question_pool_stats():
+    """Get question pool levels and underrun counters"""
+    try:
+        return jsonify(question_pool.get_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/game/check', methods=['POST'])
 @error_handler
 @validate_content_type(['application/json'])
@@ -10,9 +10,25 @@ import numpy as np
 from typing import List, Tuple, Dict
 import requests
 import io
-import json
 import logging
 
+from utils.mmap_weights import load_safetensors_mmap
+from utils.quantization import (
+    PRECISIONS, PRECISION_FP32, PRECISION_INT8_DYNAMIC, PRECISION_INT8_STATIC,
+    quantized_model_path, quantize_dynamic_model, load_quantized_model
+)
+from utils.inference_backends import (
+    BACKENDS, BACKEND_EAGER, BACKEND_TORCHSCRIPT, BACKEND_ONNX,
+    exported_model_path, export_torchscript, export_onnx, load_backend_model
+)
+from utils.cpu_optimization import optimize_for_cpu
+from utils.multi_head import MultiHeadResNet, StackedHeads, group_by_backbone
+from utils.feature_cache import FeatureCache, get_head
+from utils.dataset_index import PetDatasetIndex
+from utils.preprocessing import BatchPreprocessor, decode_rgb_image
+from utils.game_predictions import lookup_game_prediction
+from utils.image_catalog import ImageCatalog, extract_breed_from_filename, get_image_catalog
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -24,7 +40,37 @@ IMAGE_NORMALIZATION_MEAN = [0.485, 0.456, 0.406]
 IMAGE_NORMALIZATION_STD = [0.229, 0.224, 0.225]
 MINIMUM_QUIZ_BREEDS = 4
 OPTION_COUNTS = {'easy': 2, 'medium': 3, 'hard': 3}
-DEFAULT_CONFIDENCE = 0.85
+
+# Oxford-IIIT Pet Dataset classes, in model output order
+CLASS_NAMES = [
+    'Abyssinian', 'American Bulldog', 'American Pit Bull Terrier', 'Basset Hound',
+    'Beagle', 'Bengal', 'Birman', 'Bombay', 'Boxer', 'British Shorthair',
+    'Chihuahua', 'Egyptian Mau', 'English Cocker Spaniel', 'English Setter',
+    'German Shorthaired', 'Great Pyrenees', 'Havanese', 'Japanese Chin',
+    'Keeshond', 'Leonberger', 'Maine Coon', 'Miniature Pinscher', 'Newfoundland',
+    'Persian', 'Pomeranian', 'Pug', 'Ragdoll', 'Russian Blue', 'Saint Bernard',
+    'Samoyed', 'Scottish Terrier', 'Shih-Tzu', 'Siamese', 'Sphynx',
+    'Staffordshire Bull Terrier', 'Wheaten Terrier', 'Yorkshire Terrier'
+]
+
+# Sample images used when the images folder is empty
+FALLBACK_GAME_IMAGES = {
+    'Abyssinian': ['/api/images/Abyssinian_1.jpg'],
+    'Beagle': ['/api/images/beagle_1.jpg'],
+    'Bengal': ['/api/images/Bengal_1.jpg'],
+    'Birman': ['/api/images/Birman_1.jpg'],
+    'Boxer': ['/api/images/boxer_1.jpg'],
+    'British Shorthair': ['/api/images/British_1.jpg'],
+    'Chihuahua': ['/api/images/chihuahua_1.jpg'],
+    'Egyptian Mau': ['/api/images/Egyptian_1.jpg'],
+    'German Shorthaired': ['/api/images/german_1.jpg'],
+    'Maine Coon': ['/api/images/Maine_1.jpg'],
+    'Persian': ['/api/images/Persian_1.jpg'],
+    'Pug': ['/api/images/pug_1.jpg'],
+    'Ragdoll': ['/api/images/Ragdoll_1.jpg'],
+    'Siamese': ['/api/images/Siamese_1.jpg'],
+    'Yorkshire Terrier': ['/api/images/yorkshire_terrier_1.jpg']
+}
 
 # Import SafeTensors support
 try:
@@ -34,8 +80,123 @@ except ImportError:
     SAFETENSORS_AVAILABLE = False
     logger.warning("SafeTensors not available. Install with: pip install safetensors")
 
+def top_predictions(probabilities: torch.Tensor, class_names: List[str], k: int = 5) -> List[Dict[str, float]]:
+    """
+    Top-k class probabilities of each row of a softmax output
+    
+    Args:
+        probabilities: Tensor of shape [N, num_classes]
+        class_names: Class name per output index
+        k: Number of classes to keep per row
+        
+    Returns:
+        One dictionary of class name to probability per row, most likely first
+    """
+    top_probs, top_indices = torch.topk(probabilities, k)
+    top_probs = top_probs.cpu().tolist()
+    top_indices = top_indices.cpu().tolist()
+    
+    results = []
+    for probs, indices in zip(top_probs, top_indices):
+        predictions = {}
+        for probability, class_idx in zip(probs, indices):
+            predictions[class_names[class_idx]] = probability
+        results.append(predictions)
+    
+    return results
+
+
+def model_id_for(model_type: str, model_path: str = None) -> str:
+    """Identifier of a classifier's weights: checkpoint file name, or model type if none"""
+    return os.path.basename(model_path) if model_path and os.path.exists(model_path) else model_type
+
+
+def generate_game_question(model_id: str, game_mode: str = 'medium') -> dict:
+    """
+    Generate a game question using server-side image URLs for optimal performance
+    
+    Needs no loaded model: the AI answer comes from the precomputed prediction
+    table, so the question pool can generate questions without keeping a
+    classifier alive.
+    
+    Args:
+        model_id: Identifier of the weights whose predictions to show (see model_id_for)
+        game_mode: Difficulty level ('easy', 'medium', 'hard')
+        
+    Returns:
+        Dictionary containing game question data with server-side image URLs;
+        ai_prediction and ai_confidence are None (ai_precomputed False) when the
+        image has no precomputed prediction for this model
+    """
+    import random
+    
+    # Cached breed -> image index, refreshed only when the images directory changes
+    catalog = get_image_catalog()
+    
+    picked = catalog.random_breed_image()
+    if picked:
+        available_breeds, correct_answer, image_filename = picked
+        correct_image_path = catalog.image_url(image_filename)
+        same_type_breeds = catalog.same_type_breeds(correct_answer)
+    else:
+        # If no images found in the folder, use fallback sample images
+        logger.warning("No images found in images folder. Using fallback images.")
+        available_breeds = list(FALLBACK_GAME_IMAGES.keys())
+        correct_answer = random.choice(available_breeds)
+        correct_image_path = random.choice(FALLBACK_GAME_IMAGES[correct_answer])
+        image_filename = os.path.basename(correct_image_path)
+        breed_type = catalog.breed_type_set(correct_answer)
+        same_type_breeds = [b for b in available_breeds if b in breed_type] if breed_type else available_breeds
+    
+    if not available_breeds:
+        return {
+            'error': 'No pet images available for the game'
+        }
+    
+    # Ensure we have enough different breeds for the quiz
+    if len(available_breeds) < MINIMUM_QUIZ_BREEDS:
+        return {
+            'error': f'Not enough different pet breeds available. Need at least {MINIMUM_QUIZ_BREEDS}, found {len(available_breeds)}'
+        }
+    
+    # Prefer distractors of the same type (cat or dog); fall back to all breeds
+    # if fewer than 3 same-type alternatives exist
+    candidate_breeds = same_type_breeds if len(same_type_breeds) - 1 >= 3 else available_breeds
+    
+    # Generate wrong options based on difficulty - ensure all are different breeds
+    num_wrong = min(OPTION_COUNTS.get(game_mode, 3), len(candidate_breeds) - 1)
+    wrong_options = ImageCatalog.sample_excluding(candidate_breeds, correct_answer, num_wrong)
+    
+    # Verify all options are different breeds
+    all_options = [correct_answer] + wrong_options
+    if len(set(all_options)) != len(all_options):
+        return {
+            'error': 'Failed to generate unique breed options for the quiz'
+        }
+    
+    # Create options list with correct answer
+    options = [correct_answer] + wrong_options
+    random.shuffle(options)
+    
+    # Look up the precomputed AI prediction (see precompute_game_predictions.py).
+    # Without one the question carries no AI answer rather than a made-up one.
+    precomputed = lookup_game_prediction(model_id, image_filename)
+    ai_prediction, ai_confidence = precomputed if precomputed else (None, None)
+    
+    return {
+        'image': correct_image_path,
+        'options': options,
+        'correct_answer': correct_answer,
+        'ai_prediction': ai_prediction,
+        'ai_confidence': round(ai_confidence, 2) if precomputed else None,
+        'ai_precomputed': precomputed is not None
+    }
+
+
 class PetClassifier:
-    def __init__(self, num_classes: int = DEFAULT_NUM_CLASSES, model_path: str = None, model_type: str = "resnet"):
+    def __init__(self, num_classes: int = DEFAULT_NUM_CLASSES, model_path: str = None, model_type: str = "resnet",
+                 mmap_weights: bool = False, precision: str = PRECISION_FP32, backend: str = BACKEND_EAGER,
+                 cpu_optimized: bool = False):
         """
         Initialize the pet classifier with transfer learning
         
@@ -43,10 +204,32 @@ class PetClassifier:
             num_classes: Number of pet classes (default 37 for Oxford-IIIT dataset)
             model_path: Path to pre-trained model weights
             model_type: Type of model to use ("resnet", "alexnet", "mobilenet")
+            mmap_weights: Serve weights as views over a memory mapping of the checkpoint
+                so processes loading the same file share one copy (CPU only)
+            precision: "fp32", or an int8 variant ("int8_dynamic", "int8_static") loaded
+                from the artifact written next to the checkpoint by quantize_models.py
+            backend: "eager", or an exported CPU backend ("torchscript", "onnx") loaded
+                from the artifact written next to the checkpoint by export_models.py
+            cpu_optimized: Fold BatchNorm into conv weights and run in channels_last layout
+                (fp32 only; int8 variants are already fused)
         """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unsupported precision: {precision}. Supported: {', '.join(PRECISIONS)}")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unsupported backend: {backend}. Supported backends: {', '.join(BACKENDS)}")
+        if backend != BACKEND_EAGER and precision != PRECISION_FP32:
+            raise ValueError("Exported backends serve fp32 models; int8 variants already run as TorchScript")
+        
         self.num_classes = num_classes
         self.model_type = model_type
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.model_path = model_path if model_path and os.path.exists(model_path) else None
+        self.mmap_weights = mmap_weights
+        self.precision = precision
+        self.backend = backend
+        self.cpu_optimized = cpu_optimized and precision == PRECISION_FP32
+        # Quantized kernels and exported backends only run on CPU
+        use_cuda = torch.cuda.is_available() and precision == PRECISION_FP32 and backend == BACKEND_EAGER
+        self.device = torch.device("cuda" if use_cuda else "cpu")
         
         # Define image transformations
         self.transform = transforms.Compose([
@@ -56,32 +239,69 @@ class PetClassifier:
                                std=IMAGE_NORMALIZATION_STD)
         ])
         
-        # Load pre-trained model
-        self.model = self._create_model()
-        
-        if model_path and os.path.exists(model_path):
-            self.load_model(model_path)
+        # Same preprocessing for inference, applied to a whole batch into reused buffers
+        self.preprocessor = BatchPreprocessor(
+            IMAGE_SIZE, IMAGE_NORMALIZATION_MEAN, IMAGE_NORMALIZATION_STD, channels_last=self.cpu_optimized
+        )
+        
+        quantized_path = None
+        if precision != PRECISION_FP32 and self.model_path:
+            quantized_path = quantized_model_path(self.model_path, precision)
+        
+        if quantized_path and os.path.exists(quantized_path):
+            logger.info(f"Loading {precision} quantized model from: {quantized_path}")
+            self.model = load_quantized_model(quantized_path)
+            self.model_path = quantized_path
+        elif precision == PRECISION_INT8_STATIC:
+            raise FileNotFoundError(
+                f"No calibrated {precision} model for {model_path}. Run quantize_models.py first."
+            )
+        else:
+            # Load pre-trained model. When a checkpoint will overwrite every weight, build
+            # the architecture on the meta device and materialize it from the checkpoint
+            # instead of downloading and loading ImageNet weights first.
+            if model_path and os.path.exists(model_path):
+                with torch.device('meta'):
+                    self.model = self._create_model(pretrained=False)
+                self.load_model(model_path)
+            else:
+                self.model = self._create_model()
+            
+            if precision == PRECISION_INT8_DYNAMIC:
+                # Dynamic quantization needs no calibration, so it can be applied at load time.
+                # These weights have no file of their own and are kept out of the prediction cache.
+                logger.info(f"Quantizing {model_type} Linear layers to int8 at load time")
+                self.model = quantize_dynamic_model(self.model.eval())
+                self.model_path = None
         
         self.model.to(self.device)
         self.model.eval()
         
+        if self.cpu_optimized:
+            self.model = optimize_for_cpu(self.model)
+        
+        if backend != BACKEND_EAGER:
+            self.model = load_backend_model(backend, self.model, self._example_input(), self.model_path)
+        
         # Oxford-IIIT Pet Dataset classes
-        self.class_names = [
-            'Abyssinian', 'American Bulldog', 'American Pit Bull Terrier', 'Basset Hound',
-            'Beagle', 'Bengal', 'Birman', 'Bombay', 'Boxer', 'British Shorthair',
-            'Chihuahua', 'Egyptian Mau', 'English Cocker Spaniel', 'English Setter',
-            'German Shorthaired', 'Great Pyrenees', 'Havanese', 'Japanese Chin',
-            'Keeshond', 'Leonberger', 'Maine Coon', 'Miniature Pinscher', 'Newfoundland',
-            'Persian', 'Pomeranian', 'Pug', 'Ragdoll', 'Russian Blue', 'Saint Bernard',
-            'Samoyed', 'Scottish Terrier', 'Shih-Tzu', 'Siamese', 'Sphynx',
-            'Staffordshire Bull Terrier', 'Wheaten Terrier', 'Yorkshire Terrier'
-        ]
+        self.class_names = list(CLASS_NAMES)
     
-    def _create_model(self) -> nn.Module:
-        """Create model with transfer learning based on model type"""
+    @property
+    def model_id(self) -> str:
+        """Identifier of the loaded weights: checkpoint file name, or model type if none"""
+        return model_id_for(self.model_type, self.model_path)
+    
+    def _create_model(self, pretrained: bool = True) -> nn.Module:
+        """
+        Create model with transfer learning based on model type
+        
+        Args:
+            pretrained: Initialize the backbone with ImageNet weights. Disable when
+                a checkpoint will replace all weights anyway.
+        """
         if self.model_type == "resnet":
             # Load pre-trained ResNet-50
-            model = models.resnet50(weights=models.ResNet50_Weights.DEFAULT)
+            model = models.resnet50(weights=models.ResNet50_Weights.DEFAULT if pretrained else None)
             
             # Freeze all layers except the final layer
             for param in model.parameters():
@@ -99,7 +319,7 @@ class PetClassifier:
             
         elif self.model_type == "alexnet":
             # Load pre-trained AlexNet
-            model = models.alexnet(weights=models.AlexNet_Weights.DEFAULT)
+            model = models.alexnet(weights=models.AlexNet_Weights.DEFAULT if pretrained else None)
             
             # Freeze all layers except the final layer
             for param in model.parameters():
@@ -117,7 +337,7 @@ class PetClassifier:
             
         elif self.model_type == "mobilenet":
             # Load pre-trained MobileNet V2
-            model = models.mobilenet_v2(weights=models.MobileNet_V2_Weights.DEFAULT)
+            model = models.mobilenet_v2(weights=models.MobileNet_V2_Weights.DEFAULT if pretrained else None)
             
             # Freeze all layers except the final layer
             for param in model.parameters():
@@ -138,6 +358,72 @@ class PetClassifier:
         
         return model
     
+    def _example_input(self, batch_size: int = 1) -> torch.Tensor:
+        """Dummy preprocessed batch used to trace the model"""
+        return torch.zeros(batch_size, 3, *IMAGE_SIZE, device=self.device)
+    
+    def export(self, output_dir: str = None, formats: Tuple[str, ...] = (BACKEND_TORCHSCRIPT, BACKEND_ONNX)) -> Dict[str, str]:
+        """
+        Export the model as a frozen TorchScript module and/or an ONNX graph
+        
+        Args:
+            output_dir: Directory for the exported files (default: next to the checkpoint)
+            formats: Backends to export for ("torchscript", "onnx")
+            
+        Returns:
+            Dictionary of backend name to exported file path
+        """
+        if self.backend != BACKEND_EAGER or self.precision != PRECISION_FP32:
+            raise ValueError("Only eager fp32 models can be exported")
+        
+        base_path = self.model_path or f"{self.model_type}_model"
+        if output_dir:
+            base_path = os.path.join(output_dir, os.path.basename(base_path))
+        
+        model = self.model.cpu().eval()
+        example_input = self._example_input().cpu()
+        paths = {}
+        for backend in formats:
+            path = exported_model_path(base_path, backend)
+            if backend == BACKEND_TORCHSCRIPT:
+                export_torchscript(model, example_input, path)
+            elif backend == BACKEND_ONNX:
+                export_onnx(model, example_input, path)
+            else:
+                raise ValueError(f"Unsupported export format: {backend}. Supported formats: 'torchscript', 'onnx'")
+            paths[backend] = path
+        
+        self.model.to(self.device)
+        return paths
+    
+    def load_image(self, image_path: str) -> Image.Image:
+        """
+        Load an image from a local path or URL as RGB
+        
+        Args:
+            image_path: Path to image file or URL
+            
+        Returns:
+            RGB PIL image (JPEGs are decoded at the smallest DCT scale covering IMAGE_SIZE)
+        """
+        if image_path.startswith('http'):
+            response = requests.get(image_path)
+            return self.decode_image(response.content)
+        return decode_rgb_image(Image.open(image_path), IMAGE_SIZE)
+    
+    @staticmethod
+    def decode_image(data: bytes) -> Image.Image:
+        """
+        Decode an in-memory image buffer as RGB
+        
+        Args:
+            data: Encoded image bytes (JPEG, PNG, ...)
+            
+        Returns:
+            RGB PIL image (JPEGs are decoded at the smallest DCT scale covering IMAGE_SIZE)
+        """
+        return decode_rgb_image(Image.open(io.BytesIO(data)), IMAGE_SIZE)
+    
     def predict(self, image_path: str) -> Dict[str, float]:
         """
         Predict pet class from image
@@ -148,31 +434,51 @@ class PetClassifier:
         Returns:
             Dictionary with class predictions and probabilities
         """
-        # Load and preprocess image
-        if image_path.startswith('http'):
-            response = requests.get(image_path)
-            image = Image.open(io.BytesIO(response.content)).convert('RGB')
-        else:
-            image = Image.open(image_path).convert('RGB')
+        return self.predict_image(self.load_image(image_path))
+    
+    def predict_bytes(self, data: bytes) -> Dict[str, float]:
+        """
+        Predict pet class from encoded image bytes without touching the filesystem
+        
+        Args:
+            data: Encoded image bytes
+            
+        Returns:
+            Dictionary with class predictions and probabilities
+        """
+        return self.predict_image(self.decode_image(data))
+    
+    def predict_image(self, image: Image.Image) -> Dict[str, float]:
+        """
+        Predict pet class from a decoded image
+        
+        Args:
+            image: PIL image
+            
+        Returns:
+            Dictionary with class predictions and probabilities
+        """
+        return self.predict_batch([image.convert('RGB')])[0]
+    
+    def predict_batch(self, images: List[Image.Image]) -> List[Dict[str, float]]:
+        """
+        Predict pet classes for several images in a single forward pass
         
-        # Apply transformations
-        image_tensor = self.transform(image).unsqueeze(0).to(self.device)
+        Args:
+            images: RGB PIL images
+            
+        Returns:
+            One dictionary of top 5 class predictions and probabilities per image
+        """
+        # Resize and normalize the whole batch at once
+        batch = self.preprocessor(images).to(self.device)
         
         # Make prediction
         with torch.no_grad():
-            outputs = self.model(image_tensor)
+            outputs = self.model(batch)
             probabilities = torch.softmax(outputs, dim=1)
             
-        # Get top 5 predictions
-        top_probs, top_indices = torch.topk(probabilities, 5)
-        
-        predictions = {}
-        for i in range(5):
-            class_name = self.class_names[top_indices[0][i].item()]
-            probability = top_probs[0][i].item()
-            predictions[class_name] = probability
-        
-        return predictions
+        return top_predictions(probabilities, self.class_names)
     
     def save_model(self, path: str, format: str = "auto"):
         """
@@ -213,24 +519,34 @@ class PetClassifier:
         logger.info(f"Model saved successfully to: {path}")
     
     def load_model(self, path: str):
-        """Load a trained model (supports both .pth and .safetensors formats)"""
+        """Load a trained model (supports both .pth and .safetensors formats, including training snapshots)"""
         if not os.path.exists(path):
             raise FileNotFoundError(f"Model file not found: {path}")
         
-        file_ext = os.path.splitext(path)[1].lower()
+        # Training snapshots keep the format in the name, e.g. resnet_model.safetensors.best
+        filename = os.path.basename(path).lower()
+        file_ext = next((ext for ext in ('.safetensors', '.pth') if ext in filename), os.path.splitext(filename)[1])
+        
+        # A model built on the meta device has no storage; adopt the loaded tensors directly
+        assign = any(tensor.is_meta for tensor in self.model.state_dict().values())
         
         if file_ext == '.safetensors':
             if not SAFETENSORS_AVAILABLE:
                 raise ImportError("SafeTensors not available. Install with: pip install safetensors")
             
-            logger.info(f"Loading SafeTensors model from: {path}")
-            state_dict = load_safetensors(path)
-            self.model.load_state_dict(state_dict)
+            if self.mmap_weights and assign and self.device.type == 'cpu':
+                logger.info(f"Memory-mapping SafeTensors model from: {path}")
+                state_dict = load_safetensors_mmap(path)
+            else:
+                logger.info(f"Loading SafeTensors model from: {path}")
+                state_dict = load_safetensors(path)
+            self.model.load_state_dict(state_dict, assign=assign)
             
         elif file_ext == '.pth':
             logger.info(f"Loading PyTorch model from: {path}")
-            state_dict = torch.load(path, map_location=self.device)
-            self.model.load_state_dict(state_dict)
+            use_mmap = self.mmap_weights and assign and self.device.type == 'cpu'
+            state_dict = torch.load(path, map_location=self.device, mmap=use_mmap)
+            self.model.load_state_dict(state_dict, assign=assign)
             
         else:
             raise ValueError(f"Unsupported model format: {file_ext}. Supported formats: .pth, .safetensors")
@@ -238,7 +554,8 @@ class PetClassifier:
         logger.info(f"Model loaded successfully from: {path}")
     
     def train(self, train_loader: DataLoader, val_loader: DataLoader, 
-              epochs: int = 10, learning_rate: float = 0.001):
+              epochs: int = 10, learning_rate: float = 0.001,
+              feature_cache_dir: str = None, cached_views: int = 1):
         """
         Train the model
         
@@ -247,7 +564,17 @@ class PetClassifier:
             val_loader: Validation data loader
             epochs: Number of training epochs
             learning_rate: Learning rate for optimization
+            feature_cache_dir: Extract the frozen backbone's features once into memory-mapped
+                float16 arrays in this directory and train only the head on them
+            cached_views: Passes over train_loader to cache when using the feature cache; with a
+                random augmentation transform each pass is a different view, and epochs cycle
+                through them
         """
+        if feature_cache_dir:
+            return self._train_head_on_cached_features(
+                train_loader, val_loader, epochs, learning_rate, feature_cache_dir, cached_views
+            )
+        
         criterion = nn.CrossEntropyLoss()
         optimizer = optim.Adam(self.model.fc.parameters(), lr=learning_rate)
         
@@ -288,178 +615,69 @@ class PetClassifier:
             print(f'Validation Accuracy: {100*correct/total:.2f}%')
             print('-' * 50)
 
-    def _extract_breed_from_filename(self, filename: str, filename_to_breed: dict) -> str:
-        """Extract and standardize breed name from filename."""
-        parts = filename.split('_')
-        if len(parts) < 2:
-            return filename_to_breed.get(parts[0].lower(), parts[0].replace('_', ' ').title())
-        
-        first_part = parts[0].lower()
-        multi_word_prefixes = {
-            'cats': ['british', 'egyptian', 'maine', 'russian'],
-            'dogs': ['american', 'german', 'yorkshire', 'english', 'great', 'staffordshire']
-        }
-        
-        # Check if it's a multi-word breed
-        if first_part in multi_word_prefixes['cats'] + multi_word_prefixes['dogs']:
-            breed_filename = f"{parts[0]}_{parts[1]}"
-        else:
-            breed_filename = parts[0]
-        
-        return filename_to_breed.get(breed_filename.lower(), breed_filename.replace('_', ' ').title())
-    
-    def generate_game_question(self, game_mode: str = 'medium') -> dict:
-        """
-        Generate a game question using server-side image URLs for optimal performance
+    def _train_head_on_cached_features(self, train_loader: DataLoader, val_loader: DataLoader, epochs: int,
+                                       learning_rate: float, cache_dir: str, cached_views: int):
+        """Train the head for all epochs on backbone features cached in one pass over the data"""
+        train_features = FeatureCache.for_loader(
+            self.model, self.model_type, train_loader, cache_dir, 'train', cached_views, self.device
+        )
+        val_features = FeatureCache.for_loader(
+            self.model, self.model_type, val_loader, cache_dir, 'val', 1, self.device
+        )
+        
+        head = get_head(self.model, self.model_type)
+        criterion = nn.CrossEntropyLoss()
+        optimizer = optim.Adam(head.parameters(), lr=learning_rate)
+        generator = np.random.default_rng()
         
-        Args:
-            game_mode: Difficulty level ('easy', 'medium', 'hard')
+        for epoch in range(epochs):
+            # Training phase
+            head.train()
+            train_loss, train_batches = 0.0, 0
+            for data, target in train_features.batches(train_loader.batch_size, view=epoch, shuffle=True,
+                                                       generator=generator):
+                data, target = data.to(self.device), target.to(self.device)
+                
+                optimizer.zero_grad()
+                loss = criterion(head(data), target)
+                loss.backward()
+                optimizer.step()
+                
+                train_loss += loss.item()
+                train_batches += 1
             
-        Returns:
-            Dictionary containing game question data with server-side image URLs
-        """
-        import random
-        import os
-        
-        # Load breed mapping from JSON file
-        breed_mapping_path = os.path.join(os.path.dirname(__file__), 'breed_mapping.json')
-        try:
-            with open(breed_mapping_path, 'r') as f:
-                breed_data = json.load(f)
-                filename_to_breed = breed_data['filename_to_breed']
-                breed_types = breed_data['breed_types']
-        except FileNotFoundError:
-            logger.warning("breed_mapping.json not found. Using fallback mapping.")
-            filename_to_breed = {}
-            breed_types = {'cats': [], 'dogs': []}
-        
-        # Dynamic image loading from images folder
-        # Get absolute path to images directory
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(current_dir)
-        images_dir = os.path.join(project_root, 'images')
-        available_images = {}
-        
-        # Scan the images directory for available pet images
-        if os.path.exists(images_dir):
-            for filename in os.listdir(images_dir):
-                if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif')):
-                    standardized_breed = self._extract_breed_from_filename(filename, filename_to_breed)
+            # Validation phase
+            head.eval()
+            val_loss, val_batches = 0.0, 0
+            correct = 0
+            total = 0
+            
+            with torch.no_grad():
+                for data, target in val_features.batches(val_loader.batch_size):
+                    data, target = data.to(self.device), target.to(self.device)
+                    output = head(data)
+                    val_loss += criterion(output, target).item()
+                    val_batches += 1
                     
-                    # Use Cloudinary URL instead of local serving
-                    try:
-                        from cloudinary_helper import cloudinary_helper
-                        if cloudinary_helper.is_available():
-                            image_path = cloudinary_helper.get_image_url(filename)
-                        else:
-                            # Fallback to local serving
-                            image_path = f'http://localhost:5328/api/images/{filename}'
-                    except ImportError:
-                        # Fallback if cloudinary_helper not available
-                        image_path = f'http://localhost:5328/api/images/{filename}'
-                        
-                        if standardized_breed not in available_images:
-                            available_images[standardized_breed] = []
-                        available_images[standardized_breed].append(image_path)
-        
-        # If no images found in the folder, use fallback sample images
-        if not available_images:
-            logger.warning("No images found in images folder. Using fallback images.")
-            available_images = {
-                'Abyssinian': ['/api/images/Abyssinian_1.jpg'],
-                'Beagle': ['/api/images/beagle_1.jpg'],
-                'Bengal': ['/api/images/Bengal_1.jpg'],
-                'Birman': ['/api/images/Birman_1.jpg'],
-                'Boxer': ['/api/images/boxer_1.jpg'],
-                'British Shorthair': ['/api/images/British_1.jpg'],
-                'Chihuahua': ['/api/images/chihuahua_1.jpg'],
-                'Egyptian Mau': ['/api/images/Egyptian_1.jpg'],
-                'German Shorthaired': ['/api/images/german_1.jpg'],
-                'Maine Coon': ['/api/images/Maine_1.jpg'],
-                'Persian': ['/api/images/Persian_1.jpg'],
-                'Pug': ['/api/images/pug_1.jpg'],
-                'Ragdoll': ['/api/images/Ragdoll_1.jpg'],
-                'Siamese': ['/api/images/Siamese_1.jpg'],
-                'Yorkshire Terrier': ['/api/images/yorkshire_terrier_1.jpg']
-            }
-        
-        # Select a random correct answer from available breeds
-        available_breeds = list(available_images.keys())
-        if not available_breeds:
-            return {
-                'error': 'No pet images available for the game'
-            }
-        
-        # Ensure we have enough different breeds for the quiz
-        if len(available_breeds) < MINIMUM_QUIZ_BREEDS:
-            return {
-                'error': f'Not enough different pet breeds available. Need at least {MINIMUM_QUIZ_BREEDS}, found {len(available_breeds)}'
-            }
-        
-        correct_answer = random.choice(available_breeds)
-        
-        # Select a random image for the correct breed
-        correct_image_path = random.choice(available_images[correct_answer])
-        
-        # Use breed types from JSON data
-        cat_breeds = set(breed_types.get('cats', []))
-        dog_breeds = set(breed_types.get('dogs', []))
-        
-        # Initialize remaining_breeds at the start - FIXED!
-        remaining_breeds = available_breeds.copy()
-        remaining_breeds.remove(correct_answer)
-        
-        # Determine if correct answer is a cat or dog
-        is_cat_question = correct_answer in cat_breeds
-        is_dog_question = correct_answer in dog_breeds
-        
-        # Filter remaining breeds to same type (cat or dog)
-        if is_cat_question:
-            remaining_breeds = [breed for breed in remaining_breeds if breed in cat_breeds]
-        elif is_dog_question:
-            remaining_breeds = [breed for breed in remaining_breeds if breed in dog_breeds]
-        # For unclear breed types, keep all remaining breeds
-        
-        # Ensure we have enough breeds of the same type
-        if len(remaining_breeds) < 3:
-            # If not enough same-type breeds, fall back to all breeds
-            remaining_breeds = available_breeds.copy()
-            remaining_breeds.remove(correct_answer)
-        
-        # Generate wrong options based on difficulty - ensure all are different breeds
-        num_wrong = min(OPTION_COUNTS.get(game_mode, 3), len(remaining_breeds))
-        
-        # Select wrong options from different breeds of the same type
-        wrong_options = random.sample(remaining_breeds, num_wrong)
-        
-        # Verify all options are different breeds
-        all_options = [correct_answer] + wrong_options
-        if len(set(all_options)) != len(all_options):
-            return {
-                'error': 'Failed to generate unique breed options for the quiz'
-            }
-        
-        # Create options list with correct answer
-        options = [correct_answer] + wrong_options
-        random.shuffle(options)
-        
-        # Get AI prediction for the image
-        try:
-            prediction_results = self.predict(correct_image_path.replace('/api/', '../'))
-            ai_prediction = prediction_results.get('top_breed', correct_answer)
-            ai_confidence = prediction_results.get('confidence', 0.0)
-        except Exception as e:
-            logger.warning(f"Could not get AI prediction for {correct_image_path}: {e}")
-            ai_prediction = correct_answer
-            ai_confidence = DEFAULT_CONFIDENCE
+                    _, predicted = torch.max(output.data, 1)
+                    total += target.size(0)
+                    correct += (predicted == target).sum().item()
+            
+            print(f'Epoch {epoch+1}/{epochs}:')
+            print(f'Training Loss: {train_loss/train_batches:.4f}')
+            print(f'Validation Loss: {val_loss/val_batches:.4f}')
+            print(f'Validation Accuracy: {100*correct/total:.2f}%')
+            print('-' * 50)
         
-        return {
-            'image': correct_image_path,
-            'options': options,
-            'correct_answer': correct_answer,
-            'ai_prediction': ai_prediction,
-            'ai_confidence': round(ai_confidence, 2)
-        }
+        self.model.eval()
+
+    def _extract_breed_from_filename(self, filename: str, filename_to_breed: dict) -> str:
+        """Extract and standardize breed name from filename."""
+        return extract_breed_from_filename(filename, filename_to_breed)
+    
+    def generate_game_question(self, game_mode: str = 'medium') -> dict:
+        """Generate a game question with this classifier's precomputed predictions"""
+        return generate_game_question(self.model_id, game_mode)
 
 
     def get_available_models(self):
@@ -498,19 +716,107 @@ class PetClassifier:
         return available_models
 
 
+class MultiHeadClassifier:
+    """
+    Several ResNet checkpoints served together from shared backbones
+    
+    Checkpoints that differ only in their ``fc`` head (e.g. the ``.best`` and
+    ``.epoch_5`` snapshots of one training run) are grouped by a hash of their
+    backbone tensors. Each group runs its backbone once per batch and all of its
+    heads on the pooled 2048-d features, so every extra head costs two small
+    matrix multiplies instead of a full ResNet-50 forward pass.
+    """
+    
+    def __init__(self, model_paths: List[str], mmap_weights: bool = True, cpu_optimized: bool = False):
+        """
+        Args:
+            model_paths: ResNet checkpoints saved by PetClassifier (any snapshot suffix)
+            mmap_weights: Serve backbone weights as views over a memory mapping of the checkpoint
+            cpu_optimized: Fold BatchNorm into the backbones and run them in channels_last layout
+        """
+        if not model_paths:
+            raise ValueError("At least one checkpoint is required")
+        
+        self.model_type = "resnet"
+        self.model_paths = list(model_paths)
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.class_names = list(CLASS_NAMES)
+        self.preprocessor = BatchPreprocessor(
+            IMAGE_SIZE, IMAGE_NORMALIZATION_MEAN, IMAGE_NORMALIZATION_STD, channels_last=cpu_optimized
+        )
+        
+        self.head_names = []
+        self.groups = []
+        models_by_group = []
+        for fingerprint, members in group_by_backbone(self.model_paths, mmap_weights and self.device.type == 'cpu').items():
+            backbone = self._create_backbone(members[0][1])
+            model = MultiHeadResNet(backbone, StackedHeads([head for _, _, head in members]))
+            model.to(self.device)
+            model.eval()
+            if cpu_optimized:
+                model.backbone = optimize_for_cpu(model.backbone)
+            models_by_group.append(model)
+            
+            names = [os.path.basename(path) for path, _, _ in members]
+            self.head_names.extend(names)
+            self.groups.append({'backbone': fingerprint, 'heads': names})
+        self.model = nn.ModuleList(models_by_group)
+        
+        logger.info(f"Serving {len(self.head_names)} ResNet heads on {len(self.groups)} shared backbone(s)")
+    
+    @staticmethod
+    def _create_backbone(state_dict: Dict[str, torch.Tensor]) -> nn.Module:
+        """ResNet-50 with ``fc`` replaced by Identity, materialized from a backbone state dict"""
+        with torch.device('meta'):
+            backbone = models.resnet50(weights=None)
+        backbone.fc = nn.Identity()
+        backbone.load_state_dict(state_dict, assign=True)
+        return backbone
+    
+    def predict_batch(self, images: List[Image.Image]) -> List[Dict[str, Dict[str, float]]]:
+        """
+        Predict pet classes with every head, plus their ensemble, in one pass per backbone
+        
+        Args:
+            images: RGB PIL images
+            
+        Returns:
+            One dictionary per image with 'heads' (checkpoint name -> top 5 predictions)
+            and 'ensemble' (top 5 of the heads' mean probabilities)
+        """
+        batch = self.preprocessor(images).to(self.device)
+        
+        with torch.no_grad():
+            # [num_heads, N, num_classes]
+            probabilities = torch.cat([torch.softmax(model(batch), dim=2) for model in self.model])
+        
+        per_head = [top_predictions(head_probabilities, self.class_names) for head_probabilities in probabilities]
+        ensemble = top_predictions(probabilities.mean(dim=0), self.class_names)
+        
+        return [
+            {
+                'heads': {name: head[index] for name, head in zip(self.head_names, per_head)},
+                'ensemble': ensemble[index]
+            }
+            for index in range(len(images))
+        ]
+
+
 class PetDataset(Dataset):
     """Custom dataset for pet images"""
     
-    def __init__(self, data_dir: str, transform=None, use_segmentation=False):
+    def __init__(self, data_dir: str, transform=None, use_segmentation=False, index_dir: str = None):
         """
         Args:
             data_dir: Directory with pet images
             transform: Optional transform to be applied on images
             use_segmentation: Whether to load segmentation masks from MAT files
+            index_dir: Where to persist the dataset index and packed masks (default: data_dir)
         """
         self.data_dir = data_dir
         self.transform = transform
         self.use_segmentation = use_segmentation
+        self.index = PetDatasetIndex(data_dir, index_dir)
         self.images = []
         self.labels = []
         self.masks = [] if use_segmentation else None
@@ -519,66 +825,21 @@ class PetDataset(Dataset):
         self._load_data()
     
     def _load_data(self):
-        """Load image paths and corresponding labels for Oxford-IIIT Pet dataset"""
-        # Oxford-IIIT Pet dataset has images named as {breed}_{number}.jpg
-        # We need to extract breed names and create a mapping
-        breed_to_idx = {}
-        idx = 0
-        
-        # Import scipy for MAT files if needed
+        """Load image paths, labels and mask locations from the persisted dataset index"""
+        # Oxford-IIIT Pet dataset has images named as {breed}_{number}.jpg; labels are
+        # assigned per breed. MAT masks are only parsed (with scipy) when the index is built.
+        self.index.load_or_build(self.use_segmentation)
+        self.use_segmentation = self.use_segmentation and self.index.has_masks
+        self.images = [os.path.join(self.data_dir, filename) for filename in self.index.filenames]
+        self.labels = self.index.labels
         if self.use_segmentation:
-            try:
-                import scipy.io
-            except ImportError:
-                logger.warning("scipy not available for MAT file loading. Install with: pip install scipy")
-                self.use_segmentation = False
-        
-        for filename in os.listdir(self.data_dir):
-            if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif')):
-                # Extract breed name from filename
-                breed_name = self._extract_breed_from_filename(filename, {})
-                if '_' in breed_name and breed_name.count('_') > 1:
-                    # Multi-word breed - extract properly
-                    parts = filename.split('_')
-                    first_part = parts[0].lower()
-                    multi_word_prefixes = ['british', 'egyptian', 'maine', 'russian', 'american', 'german', 'yorkshire', 'english', 'great', 'staffordshire']
-                    if first_part in multi_word_prefixes and len(parts) >= 2:
-                        breed_name = f"{parts[0]}_{parts[1]}"
-                    else:
-                        breed_name = parts[0] if len(parts) >= 2 else filename.split('.')[0]
-                
-                if breed_name not in breed_to_idx:
-                    breed_to_idx[breed_name] = idx
-                    idx += 1
-                
-                self.images.append(os.path.join(self.data_dir, filename))
-                self.labels.append(breed_to_idx[breed_name])
-                
-                # Load corresponding MAT file if using segmentation
-                if self.use_segmentation:
-                    mat_filename = filename.replace('.jpg', '.mat').replace('.jpeg', '.mat').replace('.png', '.mat').replace('.gif', '.mat')
-                    mat_path = os.path.join(self.data_dir, mat_filename)
-                    if os.path.exists(mat_path):
-                        try:
-                            import scipy.io
-                            mat_data = scipy.io.loadmat(mat_path)
-                            # Extract segmentation mask (assuming it's in 'binsa' key based on our test)
-                            if 'binsa' in mat_data:
-                                self.masks.append(mat_path)
-                            else:
-                                self.masks.append(None)
-                                logger.warning(f"No 'binsa' key found in {mat_filename}")
-                        except Exception as e:
-                            logger.warning(f"Failed to load MAT file {mat_filename}: {e}")
-                            self.masks.append(None)
-                    else:
-                        self.masks.append(None)
-        
-        logger.info(f"Loaded {len(self.images)} images from {len(breed_to_idx)} breeds")
+            self.masks = self.index.mask_locations
+        
+        logger.info(f"Loaded {len(self.images)} images from {len(self.index.breed_to_idx)} breeds")
         if self.use_segmentation:
             valid_masks = sum(1 for mask in self.masks if mask is not None)
             logger.info(f"Found {valid_masks} valid segmentation masks out of {len(self.images)} images")
-        logger.info(f"Breeds found: {list(breed_to_idx.keys())}")
+        logger.info(f"Breeds found: {list(self.index.breed_to_idx.keys())}")
     
     def __len__(self):
         return len(self.images)
@@ -592,18 +853,8 @@ class PetDataset(Dataset):
         if self.transform:
             image = self.transform(image)
         
-        # Return segmentation mask if available
-        if self.use_segmentation and self.masks and idx < len(self.masks) and self.masks[idx]:
-            try:
-                import scipy.io
-                mat_data = scipy.io.loadmat(self.masks[idx])
-                if 'binsa' in mat_data:
-                    mask = mat_data['binsa'].flatten()  # Flatten to 1D array
-                    return image, label, mask
-                else:
-                    return image, label, None
-            except Exception as e:
-                logger.warning(f"Failed to load mask for index {idx}: {e}")
-                return image, label, None
+        # Return segmentation mask if available, unpacked from the index's bit array
+        if self.use_segmentation and self.masks and self.masks[idx]:
+            return image, label, self.index.mask(idx)
         
         return image, label
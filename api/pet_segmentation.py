@@ -6,9 +6,33 @@ from PIL import Image
 import numpy as np
 import os
 import time
-import base64
 import io
 
+from utils.cpu_optimization import DEFAULT_CPU_OPTIMIZED, optimize_for_cpu
+from utils.mask_encoding import (
+    DEFAULT_MASK_FORMAT, DEFAULT_CUTOUT_FORMAT, DEFAULT_CUTOUT_QUALITY,
+    encode_png, encode_png_1bit, encode_cutout, mask_to_rle, mask_to_polygons
+)
+from utils.preprocessing import BatchPreprocessor, decode_rgb_image, resize_pyramid
+from utils.tiling import blend_window, tile_positions
+
+SEGMENTATION_SIZE = (256, 256)
+NORMALIZATION_MEAN = [0.485, 0.456, 0.406]
+NORMALIZATION_STD = [0.229, 0.224, 0.225]
+DEFAULT_SEGMENTATION_MODEL_PATH = os.path.join('models', 'pet_segmentation_model.pth')
+
+# Tiled inference: tile size (a multiple of 16 for the UNet) and minimum overlap, tiles per forward
+# pass, and the longest image side tiles are cut at. An image needs at most
+# ceil((max_side - overlap) / (tile - overlap)) tiles per axis (4x3 = 12 with the defaults), so
+# latency is bounded by max_side and peak memory by the tile batch size
+DEFAULT_TILE_SIZE = int(os.environ.get('SEGMENTATION_TILE_SIZE', 256))
+DEFAULT_TILE_OVERLAP = int(os.environ.get('SEGMENTATION_TILE_OVERLAP', 32))
+DEFAULT_TILE_BATCH_SIZE = int(os.environ.get('SEGMENTATION_TILE_BATCH_SIZE', 2))
+DEFAULT_TILED_MAX_SIDE = int(os.environ.get('SEGMENTATION_TILED_MAX_SIDE', 768))
+
+# Binarizes an upsampled 0-255 probability map at 0.5
+THRESHOLD_TABLE = [0] * 128 + [255] * 128
+
 class DoubleConv(nn.Module):
     """(convolution => BN => ReLU) * 2"""
     def __init__(self, in_channels, out_channels, mid_channels=None):
@@ -102,9 +126,26 @@ class UNet(nn.Module):
         return logits
 
 class PetSegmentation:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, cpu_optimized=False, tile_size=DEFAULT_TILE_SIZE,
+                 tile_overlap=DEFAULT_TILE_OVERLAP, tile_batch_size=DEFAULT_TILE_BATCH_SIZE,
+                 tiled_max_side=DEFAULT_TILED_MAX_SIDE):
+        # Defaults come from SEGMENTATION_TILE_* environment variables, so reject bad values with their names
+        if tile_size <= 0 or tile_size % 16:
+            raise ValueError(f"SEGMENTATION_TILE_SIZE must be a positive multiple of 16, got {tile_size}")
+        if not 0 <= tile_overlap < tile_size:
+            raise ValueError(f"SEGMENTATION_TILE_OVERLAP must be between 0 and tile size - 1 "
+                             f"({tile_size - 1}), got {tile_overlap}")
+        if tile_batch_size < 1:
+            raise ValueError(f"SEGMENTATION_TILE_BATCH_SIZE must be at least 1, got {tile_batch_size}")
+        if tiled_max_side < 1:
+            raise ValueError(f"SEGMENTATION_TILED_MAX_SIDE must be at least 1, got {tiled_max_side}")
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.tile_batch_size = tile_batch_size
+        self.tiled_max_side = tiled_max_side
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.model = UNet(n_channels=3, n_classes=1, bilinear=True)
+        self.cpu_optimized = cpu_optimized
         
         if model_path and os.path.exists(model_path):
             self.model.load_state_dict(torch.load(model_path, map_location=self.device))
@@ -113,95 +154,238 @@ class PetSegmentation:
         self.model.to(self.device)
         self.model.eval()
         
+        # Folded BatchNorm and channels_last layout for faster CPU inference
+        if cpu_optimized:
+            self.model = optimize_for_cpu(self.model)
+        
         # Image preprocessing
         self.transform = transforms.Compose([
-            transforms.Resize((256, 256)),
+            transforms.Resize(SEGMENTATION_SIZE),
             transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+            transforms.Normalize(mean=NORMALIZATION_MEAN, std=NORMALIZATION_STD)
         ])
         
+        # Same preprocessing for batched inference, applied to a whole batch into reused buffers
+        self.preprocessor = BatchPreprocessor(
+            SEGMENTATION_SIZE, NORMALIZATION_MEAN, NORMALIZATION_STD, channels_last=cpu_optimized
+        )
+        
         # Reverse transform for output
         self.reverse_transform = transforms.Compose([
             transforms.ToPILImage(),
-            transforms.Resize((256, 256))
+            transforms.Resize(SEGMENTATION_SIZE)
         ])
 
-    def preprocess_image(self, image_path):
-        """Preprocess image for segmentation"""
+    def segment_image(self, image_path, tiled=False):
+        """Segment pet from an image path or a caller-owned PIL image, optionally tile by tile"""
+        start_time = time.time()
+        
+        # Decode once at full size: the model input is resized from it and the mask is applied to it
         if isinstance(image_path, str):
-            image = Image.open(image_path).convert('RGB')
+            with Image.open(image_path) as image:
+                image = decode_rgb_image(image)
         else:
-            image = image_path.convert('RGB')
-        
-        # Store original size for resizing back
-        original_size = image.size
+            image = image_path if image_path.mode == 'RGB' else image_path.convert('RGB')
         
-        # Transform image
-        image_tensor = self.transform(image).unsqueeze(0).to(self.device)
+        if tiled:
+            mask = self.predict_masks_tiled([image])[0]
+        else:
+            mask = self.predict_masks([self.model_input(image)])[0]
+        return self.compose_result(image, mask, start_time)
+
+    @staticmethod
+    def decode_image(data, draft_size=None):
+        """
+        Decode an in-memory image buffer as RGB
         
-        return image_tensor, original_size
+        Args:
+            data: Encoded image bytes (JPEG, PNG, ...)
+            draft_size: Smallest (width, height) a JPEG may be decoded at, or None for
+                full resolution (masks are applied at the decoded size)
+        """
+        return decode_rgb_image(Image.open(io.BytesIO(data)), draft_size)
 
-    def segment_image(self, image_path):
-        """Segment pet from image"""
-        start_time = time.time()
+    @staticmethod
+    def image_size(data):
+        """(width, height) of an in-memory image, read from its header without decoding"""
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size
+
+    @staticmethod
+    def model_input(image):
+        """
+        Shrink a decoded image to the 256x256 UNet input with PIL (as transforms.Resize does)
         
-        # Preprocess image
-        image_tensor, original_size = self.preprocess_image(image_path)
+        Callers resize before handing images to predict_masks, so a large photo is
+        never resized on the inference scheduler's worker thread.
+        """
+        return resize_pyramid(image, [SEGMENTATION_SIZE])[SEGMENTATION_SIZE]
+
+    def predict_masks(self, images):
+        """
+        Segment several model-resolution images in a single forward pass
         
-        # Run inference
+        Args:
+            images: RGB PIL images at model resolution (see model_input)
+            
+        Returns:
+            One boolean mask at model resolution (256x256) per image
+        """
+        batch = self.preprocessor(images).to(self.device)
         with torch.no_grad():
-            output = self.model(image_tensor)
-            mask = torch.sigmoid(output)
-            mask = (mask > 0.5).float()
+            masks = torch.sigmoid(self.model(batch)) > 0.5
+        return list(masks[:, 0].cpu().numpy())
+
+    def predict_masks_tiled(self, images):
+        """
+        Segment images with overlapping tiles at up to ``tiled_max_side`` resolution
         
-        # Convert mask to PIL image
-        mask_np = mask.squeeze().cpu().numpy()
-        mask_image = Image.fromarray((mask_np * 255).astype(np.uint8))
-        mask_image = mask_image.resize(original_size, Image.NEAREST)
+        Each image is shrunk (never enlarged) to fit ``tiled_max_side`` and cut into
+        ``tile_size`` tiles overlapping by at least ``tile_overlap`` pixels. Tiles of
+        all images run through the model ``tile_batch_size`` at a time, and their
+        probabilities are blended with a window that fades out across the overlap,
+        so seams do not show. Memory is one normalized image and two float maps per
+        image at working resolution, plus one tile batch.
         
-        # Create segmented image
-        if isinstance(image_path, str):
-            original_image = Image.open(image_path).convert('RGB')
-        else:
-            original_image = image_path.convert('RGB')
+        Args:
+            images: RGB PIL images of any size
+            
+        Returns:
+            One uint8 pet probability map (0-255) at working resolution per image
+        """
+        tile, overlap = self.tile_size, self.tile_overlap
+        window = blend_window(tile, overlap)
+        mean = torch.tensor(NORMALIZATION_MEAN).view(3, 1, 1)
+        std = torch.tensor(NORMALIZATION_STD).view(3, 1, 1)
         
-        # Apply mask to original image
-        mask_array = np.array(mask_image) / 255.0
-        original_array = np.array(original_image)
+        states, tiles = [], []
+        for index, image in enumerate(images):
+            scale = min(1.0, self.tiled_max_side / max(image.size))
+            size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            working = image if size == image.size else image.resize(size, Image.BILINEAR)
+            tensor = torch.from_numpy(np.array(working)).permute(2, 0, 1).float().div_(255).sub_(mean).div_(std)
+            # Images smaller than a tile are padded by edge replication
+            pad_height, pad_width = max(0, tile - size[1]), max(0, tile - size[0])
+            if pad_height or pad_width:
+                tensor = F.pad(tensor.unsqueeze(0), (0, pad_width, 0, pad_height), mode='replicate')[0]
+            height, width = tensor.shape[1:]
+            states.append({
+                'tensor': tensor,
+                'size': size,
+                'probabilities': torch.zeros(height, width),
+                'weights': torch.zeros(height, width)
+            })
+            tiles.extend((index, y, x) for y in tile_positions(height, tile, overlap)
+                         for x in tile_positions(width, tile, overlap))
         
-        # Create segmented image (pet only)
-        segmented_array = original_array * mask_array[:, :, np.newaxis]
-        segmented_image = Image.fromarray(segmented_array.astype(np.uint8))
+        for start in range(0, len(tiles), self.tile_batch_size):
+            chunk = tiles[start:start + self.tile_batch_size]
+            batch = torch.stack([states[index]['tensor'][:, y:y + tile, x:x + tile] for index, y, x in chunk])
+            if self.cpu_optimized:
+                batch = batch.contiguous(memory_format=torch.channels_last)
+            with torch.no_grad():
+                probabilities = torch.sigmoid(self.model(batch.to(self.device)))[:, 0].cpu()
+            for (index, y, x), tile_probabilities in zip(chunk, probabilities):
+                state = states[index]
+                state['probabilities'][y:y + tile, x:x + tile].addcmul_(tile_probabilities, window)
+                state['weights'][y:y + tile, x:x + tile].add_(window)
         
-        # Calculate confidence (percentage of pixels classified as pet)
-        confidence = float(mask_np.mean())
+        masks = []
+        for state in states:
+            width, height = state['size']
+            probabilities = state['probabilities'][:height, :width] / state['weights'][:height, :width]
+            masks.append(probabilities.mul_(255).round_().to(torch.uint8).numpy())
+        return masks
+
+    @staticmethod
+    def cut_out(image, mask):
+        """Pet-only copy of an image (black elsewhere) from a boolean mask of any resolution"""
+        mask_image = Image.fromarray(mask.view(np.uint8) * np.uint8(255))
+        if mask_image.size != image.size:
+            mask_image = mask_image.resize(image.size, Image.NEAREST)
+        cutout = Image.new('RGB', image.size)
+        cutout.paste(image, mask=mask_image)
+        return cutout
+
+    def compose_result(self, image, mask, start_time, with_cutout=True):
+        """
+        Build the segment_image result for a decoded image from its predicted mask
         
-        processing_time = time.time() - start_time
+        Args:
+            image: RGB PIL image the mask was predicted for
+            mask: Boolean mask from predict_masks (upsampled nearest-neighbour), or
+                uint8 probability map from predict_masks_tiled (upsampled bilinearly
+                and thresholded, for smooth edges)
+            start_time: time.time() when processing of this image started
+            with_cutout: Build the segmented image (None otherwise)
+        """
+        # Upsample and apply the mask in uint8: 0/255 mask, pasted over black
+        if mask.dtype == np.uint8:
+            mask_image = Image.fromarray(mask).resize(image.size, Image.BILINEAR).point(THRESHOLD_TABLE)
+            mask = mask >= 128
+        else:
+            mask_image = Image.fromarray(mask.view(np.uint8) * np.uint8(255))
+            mask_image = mask_image.resize(image.size, Image.NEAREST)
+        segmented_image = None
+        if with_cutout:
+            segmented_image = Image.new('RGB', image.size)
+            segmented_image.paste(image, mask=mask_image)
         
         return {
             'mask': mask_image,
+            'model_mask': mask,
             'segmented': segmented_image,
-            'confidence': confidence,
-            'processing_time': processing_time
+            'confidence': float(mask.mean()),
+            'processing_time': time.time() - start_time
         }
 
     def encode_image_to_base64(self, image):
         """Convert PIL image to base64 string"""
-        buffer = io.BytesIO()
-        image.save(buffer, format='PNG')
-        img_str = base64.b64encode(buffer.getvalue()).decode()
-        return f"data:image/png;base64,{img_str}"
+        return encode_png(image)
+
+    def segment_and_encode(self, image_path, tiled=False, **formats):
+        """Segment image and return encoded results (see encode_result for the formats)"""
+        return self.encode_result(self.segment_image(image_path, tiled), **formats)
 
-    def segment_and_encode(self, image_path):
-        """Segment image and return base64 encoded results"""
-        result = self.segment_image(image_path)
+    def encode_result(self, result, mask_format=DEFAULT_MASK_FORMAT, cutout_format=DEFAULT_CUTOUT_FORMAT,
+                      quality=DEFAULT_CUTOUT_QUALITY):
+        """
+        Encode a segment_image result for the API
         
-        return {
-            'maskImage': self.encode_image_to_base64(result['mask']),
-            'segmentedImage': self.encode_image_to_base64(result['segmented']),
+        Args:
+            result: Result of segment_image or compose_result
+            mask_format: 'png1' (1-bit PNG) or 'png' (8-bit PNG) as maskImage, 'rle' (COCO RLE)
+                as maskRle, or 'polygon' (simplified contours) as maskPolygons
+            cutout_format: 'jpeg', 'webp' or 'png' as segmentedImage, or 'none' to omit it
+            quality: JPEG/WebP cutout quality, 1-100
+        """
+        mask_image = result['mask']
+        encoded = {
+            'maskFormat': mask_format,
+            'cutoutFormat': cutout_format,
+            'imageSize': list(mask_image.size),
             'confidence': float(result['confidence']),  # Convert numpy float32 to Python float
             'processingTime': float(result['processing_time'])  # Ensure it's a Python float
         }
+        
+        if mask_format == 'png1':
+            encoded['maskImage'] = encode_png_1bit(mask_image)
+        elif mask_format == 'png':
+            encoded['maskImage'] = encode_png(mask_image)
+        elif mask_format == 'rle':
+            encoded['maskRle'] = mask_to_rle(mask_image)
+        elif mask_format == 'polygon':
+            # Traced on the predicted mask and scaled up, far cheaper than tracing the full-size mask
+            encoded['maskPolygons'] = mask_to_polygons(result['model_mask'], mask_image.size)
+        else:
+            raise ValueError(f"Unknown mask format: {mask_format}")
+        
+        if cutout_format != 'none':
+            segmented = result['segmented']
+            if segmented is None:
+                raise ValueError("Result was composed without a cutout")
+            encoded['segmentedImage'] = encode_cutout(segmented, cutout_format, quality)
+        return encoded
 
 # Initialize global segmentation model
 segmentation_model = None
@@ -211,6 +395,7 @@ def get_segmentation_model():
     global segmentation_model
     if segmentation_model is None:
         # Try to load pre-trained model if available
-        model_path = os.path.join('models', 'pet_segmentation_model.pth')
-        segmentation_model = PetSegmentation(model_path if os.path.exists(model_path) else None)
+        model_path = DEFAULT_SEGMENTATION_MODEL_PATH
+        segmentation_model = PetSegmentation(model_path if os.path.exists(model_path) else None,
+                                             cpu_optimized=DEFAULT_CPU_OPTIMIZED)
     return segmentation_model
@@ -0,0 +1,91 @@
+"""
+Offline batch job: run every classifier checkpoint over every game image and store the
+top-1 prediction and confidence in the game prediction table used by generate_game_question
+"""
+
+import os
+import time
+import argparse
+
+import numpy as np
+
+from pet_classifier import PetClassifier, logger
+from utils.game_predictions import GamePredictionTable, DEFAULT_TABLE_PATH, PROJECT_ROOT
+from utils.multi_head import find_head_checkpoints
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+MODEL_TYPES = ('resnet', 'alexnet', 'mobilenet')
+
+
+def find_checkpoints(models_dir: str):
+    """
+    List (model_type, path) for every checkpoint whose type can be inferred from its name
+
+    Training snapshots such as ``resnet_model_improved.safetensors.best`` are included,
+    so the default classifier's checkpoint always gets a row.
+    """
+    return [(model_type, path) for model_type in MODEL_TYPES
+            for path in find_head_checkpoints(models_dir, model_type)]
+
+
+def predict_all(classifier: PetClassifier, images_dir: str, filenames, class_index, batch_size: int):
+    """Top-1 class codes and confidences for every image, computed in batches"""
+    predictions = np.zeros(len(filenames), dtype=np.uint8)
+    confidences = np.zeros(len(filenames), dtype=np.float16)
+
+    for start in range(0, len(filenames), batch_size):
+        names = filenames[start:start + batch_size]
+        images = [classifier.load_image(os.path.join(images_dir, name)) for name in names]
+        for offset, result in enumerate(classifier.predict_batch(images)):
+            breed, probability = max(result.items(), key=lambda item: item[1])
+            predictions[start + offset] = class_index[breed]
+            confidences[start + offset] = probability
+
+    return predictions, confidences
+
+
+def build_table(images_dir: str, models_dir: str, batch_size: int = 32) -> GamePredictionTable:
+    """Run every checkpoint over every image and assemble the lookup table"""
+    filenames = sorted(f for f in os.listdir(images_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    checkpoints = find_checkpoints(models_dir)
+    if not filenames:
+        raise ValueError(f"No images found in {images_dir}")
+    if not checkpoints:
+        raise ValueError(f"No classifier checkpoints found in {models_dir}")
+
+    model_ids, all_predictions, all_confidences = [], [], []
+    class_names = None
+
+    for model_type, model_path in checkpoints:
+        start_time = time.time()
+        classifier = PetClassifier(model_type=model_type, model_path=model_path)
+        if class_names is None:
+            class_names = classifier.class_names
+        class_index = {name: i for i, name in enumerate(class_names)}
+
+        predictions, confidences = predict_all(classifier, images_dir, filenames, class_index, batch_size)
+        model_ids.append(classifier.model_id)
+        all_predictions.append(predictions)
+        all_confidences.append(confidences)
+        print(f"{classifier.model_id}: {len(filenames)} images in {time.time() - start_time:.1f}s")
+
+    return GamePredictionTable(
+        filenames=filenames,
+        model_ids=model_ids,
+        class_names=class_names,
+        predictions=np.stack(all_predictions),
+        confidences=np.stack(all_confidences)
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Precompute AI predictions for game images')
+    parser.add_argument('--images-dir', default=os.path.join(PROJECT_ROOT, 'images'))
+    parser.add_argument('--models-dir', default=os.path.join(PROJECT_ROOT, 'models'))
+    parser.add_argument('--output', default=DEFAULT_TABLE_PATH)
+    parser.add_argument('--batch-size', type=int, default=32)
+    args = parser.parse_args()
+
+    table = build_table(args.images_dir, args.models_dir, args.batch_size)
+    table.save(args.output)
+    print(f"Saved predictions for {len(table.model_ids)} models x {len(table)} images to {args.output}")
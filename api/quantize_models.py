@@ -0,0 +1,166 @@
+"""
+Offline job: build int8 variants of every classifier checkpoint and report accuracy vs latency
+Calibrates static quantization on a sample of game images, saves the dynamic and static artifacts
+next to each checkpoint, and compares them against the fp32 model on a held-out sample
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+
+import torch
+
+from pet_classifier import PetClassifier, logger
+from precompute_game_predictions import find_checkpoints, IMAGE_EXTENSIONS
+from utils.game_predictions import PROJECT_ROOT
+from utils.image_catalog import extract_breed_from_filename, load_breed_mapping
+from utils.quantization import (
+    PRECISION_FP32, PRECISION_INT8_DYNAMIC, PRECISION_INT8_STATIC,
+    quantized_model_path, quantize_dynamic_model, quantize_static_model, save_quantized_model
+)
+
+DEFAULT_REPORT_PATH = os.path.join(PROJECT_ROOT, 'models', 'quantization_report.json')
+SINGLE_IMAGE_RUNS = 20
+
+
+def load_batches(classifier: PetClassifier, images_dir: str, filenames, batch_size: int):
+    """Preprocess images into batches exactly as the classifier does at inference time"""
+    batches = []
+    for start in range(0, len(filenames), batch_size):
+        names = filenames[start:start + batch_size]
+        images = [classifier.load_image(os.path.join(images_dir, name)) for name in names]
+        # The preprocessor reuses its output buffer, so keep a copy of each batch
+        batches.append(classifier.preprocessor(images).clone())
+    return batches
+
+
+def evaluate(model, batches, labels, reference=None):
+    """
+    Top-1 accuracy, agreement with a reference model and latency of a model
+
+    Args:
+        model: Model to evaluate
+        batches: Preprocessed image batches
+        labels: Class index per image, or None where the breed is unknown
+        reference: Top-1 predictions of the fp32 model to compare against
+
+    Returns:
+        Tuple of (metrics dict, top-1 predictions)
+    """
+    with torch.inference_mode():
+        model(batches[0])  # warm-up
+
+        predictions = []
+        start = time.perf_counter()
+        for batch in batches:
+            predictions.extend(model(batch).argmax(dim=1).tolist())
+        batch_seconds = time.perf_counter() - start
+
+        single = batches[0][:1]
+        start = time.perf_counter()
+        for _ in range(SINGLE_IMAGE_RUNS):
+            model(single)
+        single_seconds = (time.perf_counter() - start) / SINGLE_IMAGE_RUNS
+
+    labelled = [(p, l) for p, l in zip(predictions, labels) if l is not None]
+    metrics = {
+        'accuracy': round(sum(p == l for p, l in labelled) / len(labelled), 4) if labelled else None,
+        'ms_per_image_batched': round(batch_seconds * 1000 / len(predictions), 2),
+        'ms_single_image': round(single_seconds * 1000, 2)
+    }
+    if reference is not None:
+        metrics['agreement_with_fp32'] = round(
+            sum(p == r for p, r in zip(predictions, reference)) / len(predictions), 4
+        )
+    return metrics, predictions
+
+
+def quantize_checkpoint(model_type: str, model_path: str, images_dir: str, calibration_files, eval_files,
+                        batch_size: int):
+    """Write both int8 artifacts for one checkpoint and measure them against fp32"""
+    classifier = PetClassifier(model_type=model_type, model_path=model_path)
+    fp32_model = classifier.model.cpu().eval()
+
+    filename_to_breed = load_breed_mapping()[0]
+    class_index = {name: i for i, name in enumerate(classifier.class_names)}
+    labels = [class_index.get(extract_breed_from_filename(name, filename_to_breed)) for name in eval_files]
+
+    calibration_batches = load_batches(classifier, images_dir, calibration_files, batch_size)
+    eval_batches = load_batches(classifier, images_dir, eval_files, batch_size)
+    example_input = eval_batches[0][:1]
+
+    start = time.time()
+    variants = {
+        PRECISION_INT8_DYNAMIC: quantize_dynamic_model(fp32_model),
+        PRECISION_INT8_STATIC: quantize_static_model(fp32_model, model_type, calibration_batches)
+    }
+    logger.info(f"Quantized {os.path.basename(model_path)} in {time.time() - start:.1f}s")
+
+    report = {}
+    report[PRECISION_FP32], reference = evaluate(fp32_model, eval_batches, labels)
+    report[PRECISION_FP32]['size_mb'] = round(os.path.getsize(model_path) / (1024 * 1024), 2)
+
+    for precision, model in variants.items():
+        path = quantized_model_path(model_path, precision)
+        save_quantized_model(model, path, example_input)
+
+        # Measure the artifact exactly as the API will load it
+        served = PetClassifier(model_type=model_type, model_path=model_path, precision=precision).model
+        report[precision], _ = evaluate(served, eval_batches, labels, reference)
+        report[precision]['size_mb'] = round(os.path.getsize(path) / (1024 * 1024), 2)
+        report[precision]['path'] = os.path.relpath(path, PROJECT_ROOT)
+
+    return report
+
+
+def print_report(model_id: str, report: dict):
+    """Print one checkpoint's accuracy/latency comparison as a table"""
+    print(f"\n{model_id}")
+    print(f"{'precision':<14}{'accuracy':>10}{'agree':>8}{'ms/img@batch':>14}{'ms@1':>8}{'MB':>8}")
+    for precision, metrics in report.items():
+        accuracy = metrics['accuracy']
+        print(f"{precision:<14}"
+              f"{accuracy if accuracy is not None else '-':>10}"
+              f"{metrics.get('agreement_with_fp32', 1.0):>8}"
+              f"{metrics['ms_per_image_batched']:>14}"
+              f"{metrics['ms_single_image']:>8}"
+              f"{metrics['size_mb']:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build int8 classifier variants and compare them with fp32')
+    parser.add_argument('--images-dir', default=os.path.join(PROJECT_ROOT, 'images'))
+    parser.add_argument('--models-dir', default=os.path.join(PROJECT_ROOT, 'models'))
+    parser.add_argument('--calibration-size', type=int, default=256)
+    parser.add_argument('--eval-size', type=int, default=512)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--report', default=DEFAULT_REPORT_PATH)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    filenames = sorted(f for f in os.listdir(args.images_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    if not filenames:
+        raise SystemExit(f"No images found in {args.images_dir}")
+
+    # Disjoint calibration and evaluation samples
+    random.Random(args.seed).shuffle(filenames)
+    calibration_files = filenames[:args.calibration_size]
+    eval_files = filenames[args.calibration_size:args.calibration_size + args.eval_size] or calibration_files
+
+    results = {}
+    for model_type, model_path in find_checkpoints(args.models_dir):
+        model_id = os.path.basename(model_path)
+        results[model_id] = quantize_checkpoint(model_type, model_path, args.images_dir,
+                                                calibration_files, eval_files, args.batch_size)
+        print_report(model_id, results[model_id])
+
+    with open(args.report, 'w') as f:
+        json.dump({
+            'calibration_images': len(calibration_files),
+            'eval_images': len(eval_files),
+            'torch_threads': torch.get_num_threads(),
+            'models': results
+        }, f, indent=2)
+    print(f"\nSaved report to {args.report}")
@@ -11,6 +11,7 @@ import time
 from tqdm import tqdm
 import matplotlib.pyplot as plt
 from pet_segmentation import UNet
+from utils.dataset_shards import ShardedSegmentationDataset
 
 class OxfordIIITDataset(Dataset):
     """Oxford-IIIT Pet Dataset for segmentation training"""
@@ -75,8 +76,19 @@ def dice_loss(pred, target, smooth=1e-6):
     dice = (2. * intersection + smooth) / (pred_flat.sum() + target_flat.sum() + smooth)
     return 1 - dice
 
-def train_segmentation_model(data_dir, model_save_path, epochs=50, batch_size=8, learning_rate=1e-4):
-    """Train segmentation model on Oxford-IIIT dataset"""
+def sharded_datasets(shards_dir):
+    """Seeded random 80/20 train/val split of the preprocessed shards written by build_dataset_shards.py"""
+    train_indices, val_indices = ShardedSegmentationDataset(shards_dir).split_indices(0.8)
+    return ShardedSegmentationDataset(shards_dir, train_indices), ShardedSegmentationDataset(shards_dir, val_indices)
+
+def train_segmentation_model(data_dir, model_save_path, epochs=50, batch_size=8, learning_rate=1e-4,
+                             shards_dir=None):
+    """
+    Train segmentation model on Oxford-IIIT dataset
+    
+    With shards_dir, samples are read from preprocessed uint8 shards instead of
+    decoding and resizing every JPEG and trimap each epoch.
+    """
     
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     print(f"Using device: {device}")
@@ -94,8 +106,11 @@ def train_segmentation_model(data_dir, model_save_path, epochs=50, batch_size=8,
     ])
     
     # Create datasets
-    train_dataset = OxfordIIITDataset(data_dir, 'train', transform, target_transform)
-    val_dataset = OxfordIIITDataset(data_dir, 'val', transform, target_transform)
+    if shards_dir:
+        train_dataset, val_dataset = sharded_datasets(shards_dir)
+    else:
+        train_dataset = OxfordIIITDataset(data_dir, 'train', transform, target_transform)
+        val_dataset = OxfordIIITDataset(data_dir, 'val', transform, target_transform)
     
     # Create data loaders
     train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True, num_workers=4)
@@ -183,7 +198,7 @@ def train_segmentation_model(data_dir, model_save_path, epochs=50, batch_size=8,
     print(f"Training completed! Best validation loss: {best_val_loss:.4f}")
     return model
 
-def evaluate_model(model, data_dir, batch_size=8):
+def evaluate_model(model, data_dir, batch_size=8, shards_dir=None):
     """Evaluate trained model on test set"""
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     model.to(device)
@@ -202,7 +217,10 @@ def evaluate_model(model, data_dir, batch_size=8):
     ])
     
     # Create test dataset
-    test_dataset = OxfordIIITDataset(data_dir, 'val', transform, target_transform)
+    if shards_dir:
+        _, test_dataset = sharded_datasets(shards_dir)
+    else:
+        test_dataset = OxfordIIITDataset(data_dir, 'val', transform, target_transform)
     test_loader = DataLoader(test_dataset, batch_size=batch_size, shuffle=False)
     
     total_dice = 0.0
@@ -234,6 +252,9 @@ if __name__ == "__main__":
     # Configuration
     DATA_DIR = "oxford-iiit-pet"  # Path to Oxford-IIIT dataset
     MODEL_SAVE_PATH = "models/pet_segmentation_model.pth"
+    # Written by build_dataset_shards.py; used instead of decoding JPEGs when present
+    SHARDS_DIR = os.path.join(DATA_DIR, "shards", "segmentation")
+    shards_dir = SHARDS_DIR if os.path.exists(os.path.join(SHARDS_DIR, "index.json")) else None
     
     # Create models directory if it doesn't exist
     os.makedirs("models", exist_ok=True)
@@ -252,12 +273,13 @@ if __name__ == "__main__":
         model_save_path=MODEL_SAVE_PATH,
         epochs=50,
         batch_size=8,
-        learning_rate=1e-4
+        learning_rate=1e-4,
+        shards_dir=shards_dir
     )
     
     # Evaluate model
     print("Evaluating trained model...")
-    dice_score = evaluate_model(model, DATA_DIR)
+    dice_score = evaluate_model(model, DATA_DIR, shards_dir=shards_dir)
     
     print(f"Training completed successfully!")
     print(f"Model saved to: {MODEL_SAVE_PATH}")
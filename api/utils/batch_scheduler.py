@@ -0,0 +1,177 @@
+"""
+Dynamic micro-batching scheduler for model inference
+Collects concurrent requests for the same model key and runs them as one stacked batch
+"""
+
+import os
+import time
+import threading
+import logging
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Defaults (overridable through the environment)
+DEFAULT_MAX_BATCH_SIZE = int(os.getenv('BATCH_MAX_SIZE', '16'))
+DEFAULT_MAX_WAIT_MS = float(os.getenv('BATCH_MAX_WAIT_MS', '5'))
+DEFAULT_IDLE_TIMEOUT = 60.0  # Seconds before an idle worker thread exits
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+
+BatchFunction = Callable[[List[Any]], List[Any]]
+
+
+class _KeyQueue:
+    """Pending requests and statistics for a single model key"""
+
+    def __init__(self):
+        self.pending: Deque[Tuple[Any, BatchFunction, Future, float]] = deque()
+        self.condition = threading.Condition()
+        self.worker: Optional[threading.Thread] = None
+        self.max_depth = 0
+        self.total_requests = 0
+        self.total_batches = 0
+        self.total_wait_seconds = 0.0
+        self.batch_size_histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+
+
+class BatchScheduler:
+    """
+    Group inference requests that arrive within a short window into one batch
+
+    Each model key gets its own queue and worker thread. A worker waits for the
+    first request, then keeps collecting until either ``max_batch_size`` requests
+    are queued or ``max_wait_ms`` has elapsed since that first request, and runs
+    the whole batch through a single call of the batch function.
+    """
+
+    def __init__(self, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        """
+        Args:
+            max_batch_size: Maximum number of requests per forward pass
+            max_wait_ms: Maximum time to hold the first request while a batch fills
+            idle_timeout: Seconds a worker thread stays alive without requests
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(max_wait_ms, 0.0) / 1000.0
+        self.idle_timeout = idle_timeout
+        self._queues: Dict[str, _KeyQueue] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, item: Any, batch_fn: BatchFunction) -> Future:
+        """
+        Queue a single item for batched execution
+
+        Args:
+            key: Batching key; only items with the same key share a batch
+            item: Input passed to ``batch_fn`` as one element of its list argument
+            batch_fn: Callable taking a list of items and returning one result per item
+
+        Returns:
+            Future resolved with this item's result
+        """
+        future = Future()
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = _KeyQueue()
+
+        with queue.condition:
+            queue.pending.append((item, batch_fn, future, time.monotonic()))
+            queue.total_requests += 1
+            queue.max_depth = max(queue.max_depth, len(queue.pending))
+            if queue.worker is None or not queue.worker.is_alive():
+                queue.worker = threading.Thread(
+                    target=self._worker_loop, args=(key, queue),
+                    name=f"batch-worker-{key}", daemon=True
+                )
+                queue.worker.start()
+            queue.condition.notify()
+
+        return future
+
+    def run(self, key: str, item: Any, batch_fn: BatchFunction, timeout: Optional[float] = None) -> Any:
+        """Submit an item and block until its result is available"""
+        return self.submit(key, item, batch_fn).result(timeout=timeout)
+
+    def _collect_batch(self, queue: _KeyQueue) -> List[Tuple[Any, BatchFunction, Future, float]]:
+        """Wait for a full batch or for the batching window to close (condition held)"""
+        deadline = queue.pending[0][3] + self.max_wait
+        while len(queue.pending) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            queue.condition.wait(remaining)
+
+        batch = []
+        while queue.pending and len(batch) < self.max_batch_size:
+            batch.append(queue.pending.popleft())
+        return batch
+
+    def _worker_loop(self, key: str, queue: _KeyQueue):
+        """Drain the queue for one key in batches until it stays idle"""
+        while True:
+            with queue.condition:
+                if not queue.pending:
+                    queue.condition.wait(self.idle_timeout)
+                    if not queue.pending:
+                        queue.worker = None
+                        return
+                batch = self._collect_batch(queue)
+
+            self._execute(key, queue, batch)
+
+    def _execute(self, key: str, queue: _KeyQueue, batch: List[Tuple[Any, BatchFunction, Future, float]]):
+        """Run one batch and distribute results to the waiting callers"""
+        started = time.monotonic()
+        items = [entry[0] for entry in batch]
+        # All entries share the key; the most recent callable wins if the model was reloaded
+        batch_fn = batch[-1][1]
+
+        try:
+            results = batch_fn(items)
+            if len(results) != len(items):
+                raise RuntimeError(f"Batch function returned {len(results)} results for {len(items)} inputs")
+        except Exception as e:
+            logger.error(f"Batch of {len(items)} failed for {key}: {e}")
+            for _, _, future, _ in batch:
+                future.set_exception(e)
+        else:
+            for (_, _, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+        with queue.condition:
+            queue.total_batches += 1
+            queue.total_wait_seconds += sum(started - entry[3] for entry in batch)
+            bucket = next((b for b in BATCH_SIZE_BUCKETS if len(batch) <= b), BATCH_SIZE_BUCKETS[-1])
+            queue.batch_size_histogram[bucket] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth and batch size statistics for every key"""
+        with self._lock:
+            queues = dict(self._queues)
+
+        per_key = {}
+        for key, queue in queues.items():
+            with queue.condition:
+                batched = queue.total_requests - len(queue.pending)
+                per_key[key] = {
+                    'queue_depth': len(queue.pending),
+                    'max_queue_depth': queue.max_depth,
+                    'total_requests': queue.total_requests,
+                    'total_batches': queue.total_batches,
+                    'avg_batch_size': round(batched / queue.total_batches, 2) if queue.total_batches else 0.0,
+                    'avg_wait_ms': round(1000 * queue.total_wait_seconds / batched, 3) if batched else 0.0,
+                    'batch_size_histogram': {f"<={b}": n for b, n in queue.batch_size_histogram.items()}
+                }
+
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'models': per_key
+        }
@@ -0,0 +1,134 @@
+"""
+Confidence-gated classifier cascade
+A cheap classifier answers first and the request only escalates to the next, larger model when
+the top-1 probability is below the threshold calibrated offline by calibrate_cascade.py
+"""
+
+import os
+import json
+import threading
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_THRESHOLDS_PATH = os.getenv(
+    'CASCADE_THRESHOLDS_PATH', os.path.join(PROJECT_ROOT, 'models', 'cascade_thresholds.json')
+)
+CASCADE_MODEL_TYPE = 'cascade'
+DEFAULT_CASCADE_STAGES = ('mobilenet', 'resnet')
+
+
+def top1_probability(predictions: Dict[str, float]) -> float:
+    """Top-1 softmax probability of a prediction dictionary"""
+    return max(predictions.values()) if predictions else 0.0
+
+
+class ClassifierCascade:
+    """
+    Stage list and hit-rate counters of the classifier cascade
+
+    Stages come from the thresholds file written by calibrate_cascade.py: each has
+    a model type, the checkpoint it was calibrated with (relative to the project
+    root) and a top-1 probability threshold. The last stage has no threshold and
+    always answers. The file is re-read when its mtime changes, so recalibrating
+    does not need a restart.
+    """
+
+    def __init__(self, thresholds_path: str = DEFAULT_THRESHOLDS_PATH):
+        """
+        Args:
+            thresholds_path: JSON file written by calibrate_cascade.py
+        """
+        self.thresholds_path = thresholds_path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._config = None
+        self.requests = 0
+        self.answered = {}
+
+    def _load(self) -> Optional[Dict[str, Any]]:
+        """Current calibration, re-read if the file changed (caller holds the lock)"""
+        try:
+            mtime = os.path.getmtime(self.thresholds_path)
+        except OSError:
+            self._mtime, self._config = None, None
+            return None
+
+        if mtime != self._mtime:
+            try:
+                with open(self.thresholds_path) as f:
+                    config = json.load(f)
+                if len(config.get('stages', [])) < 2:
+                    raise ValueError('a cascade needs at least two stages')
+                self._config = config
+                logger.info(f"Loaded cascade thresholds from {self.thresholds_path}")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring invalid cascade thresholds file {self.thresholds_path}: {e}")
+                self._config = None
+            self._mtime = mtime
+        return self._config
+
+    def stages(self) -> Optional[List[Dict[str, Any]]]:
+        """
+        Calibrated stages in the order they run
+
+        Returns:
+            List of dicts with 'model_type', 'model_path' (absolute, or None for the
+            default weights) and 'threshold' (None for the last stage), or None if
+            the cascade has not been calibrated
+        """
+        with self._lock:
+            config = self._load()
+        if config is None:
+            return None
+
+        stages = []
+        for index, stage in enumerate(config['stages']):
+            checkpoint = stage.get('checkpoint')
+            stages.append({
+                'model_type': stage['model_type'],
+                'model_path': os.path.join(PROJECT_ROOT, checkpoint) if checkpoint else None,
+                'threshold': stage.get('threshold') if index < len(config['stages']) - 1 else None
+            })
+        return stages
+
+    @staticmethod
+    def accepts(stage: Dict[str, Any], predictions: Dict[str, float]) -> bool:
+        """Whether a stage's prediction is confident enough to return without escalating"""
+        return stage['threshold'] is None or top1_probability(predictions) >= stage['threshold']
+
+    def record(self, model_type: str):
+        """Count a request answered by the stage of the given model type"""
+        with self._lock:
+            self.requests += 1
+            self.answered[model_type] = self.answered.get(model_type, 0) + 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-stage hit rates and the calibration in use"""
+        stages = self.stages()
+        with self._lock:
+            requests = self.requests
+            answered = dict(self.answered)
+            config = self._config
+
+        stage_stats = []
+        for stage in stages or []:
+            count = answered.get(stage['model_type'], 0)
+            stage_stats.append({
+                'model_type': stage['model_type'],
+                'threshold': stage['threshold'],
+                'answered': count,
+                'hit_rate': round(count / requests, 4) if requests else 0.0
+            })
+
+        first_stage = answered.get(stages[0]['model_type'], 0) if stages else 0
+        return {
+            'calibrated': stages is not None,
+            'thresholds_path': self.thresholds_path,
+            'target_accuracy': config.get('target_accuracy') if config else None,
+            'requests': requests,
+            'escalation_rate': round(1 - first_stage / requests, 4) if requests else 0.0,
+            'stages': stage_stats
+        }
@@ -0,0 +1,182 @@
+"""
+Bounded LRU pool of loaded models
+Keeps the total parameter memory of cached classifiers under a byte budget
+"""
+
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = int(float(os.getenv('CLASSIFIER_POOL_MAX_MB', '1024')) * 1024 * 1024)
+
+
+def estimate_model_bytes(obj: Any) -> int:
+    """
+    Estimate the memory held by a model from its parameter and buffer sizes
+
+    Args:
+        obj: An nn.Module or a wrapper exposing one as ``.model``
+
+    Returns:
+        Size in bytes
+    """
+    module = getattr(obj, 'model', obj)
+    tensors = list(module.parameters()) + list(module.buffers())
+    size = sum(t.numel() * t.element_size() for t in tensors)
+    if getattr(obj, 'precision', 'fp32') != 'fp32' or getattr(obj, 'backend', 'eager') != 'eager':
+        # Packed int8 weights and exported graphs keep their weights outside parameters();
+        # fall back to the serialized size
+        from utils.quantization import model_size_bytes
+        size = model_size_bytes(module) or size
+    return size
+
+
+class ClassifierPool:
+    """
+    Thread-safe LRU cache of loaded classifiers with a memory budget
+
+    Entries are evicted least-recently-used first until the summed parameter
+    size fits ``max_bytes``. Pinned entries (e.g. the default model) are never
+    evicted and still count against the budget.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES,
+                 size_fn: Callable[[Any], int] = estimate_model_bytes):
+        """
+        Args:
+            max_bytes: Budget for the summed parameter size of all pooled models
+            size_fn: Callable returning the size in bytes of a pooled object
+        """
+        self.max_bytes = max_bytes
+        self.size_fn = size_fn
+        self._entries: 'OrderedDict[str, Any]' = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._pinned = set()
+        self._lock = threading.RLock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def keys(self) -> List[str]:
+        """Keys in LRU order, least recently used first"""
+        with self._lock:
+            return list(self._entries.keys())
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a pooled object and mark it most recently used"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def get_or_create(self, key: str, factory: Callable[[], Any], pin: bool = False) -> Any:
+        """
+        Get a pooled object, building it with ``factory`` on a miss
+
+        Concurrent misses for the same key build the object only once.
+        """
+        classifier = self.get(key)
+        if classifier is not None:
+            return classifier
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    return self._entries[key]
+            classifier = factory()
+            self.put(key, classifier, pin=pin)
+
+        with self._lock:
+            self._load_locks.pop(key, None)
+        return classifier
+
+    def put(self, key: str, classifier: Any, pin: bool = False):
+        """Add or replace a pooled object, evicting others to stay within budget"""
+        size = self.size_fn(classifier)
+        with self._lock:
+            self._entries[key] = classifier
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            if pin:
+                self._pinned.add(key)
+            self._evict(keep=key)
+
+            if self.total_bytes > self.max_bytes:
+                logger.warning(f"Classifier pool over budget: {self.total_bytes} bytes used, "
+                               f"{self.max_bytes} allowed (pinned: {sorted(self._pinned)})")
+
+    def pin(self, key: str):
+        """Protect an entry from eviction"""
+        with self._lock:
+            if key not in self._entries:
+                raise KeyError(key)
+            self._pinned.add(key)
+
+    def unpin(self, key: str):
+        """Allow an entry to be evicted again"""
+        with self._lock:
+            self._pinned.discard(key)
+            self._evict()
+
+    def remove(self, key: str) -> bool:
+        """Drop an entry regardless of pinning"""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            del self._entries[key]
+            del self._sizes[key]
+            self._pinned.discard(key)
+            return True
+
+    def _evict(self, keep: Optional[str] = None):
+        """Evict least recently used unpinned entries until the pool fits its budget (lock held)"""
+        for key in list(self._entries.keys()):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key in self._pinned or key == keep:
+                continue
+            del self._entries[key]
+            size = self._sizes.pop(key)
+            self.evictions += 1
+            logger.info(f"Evicted classifier {key} ({size / (1024 * 1024):.1f}MB) from pool")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool occupancy and hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': list(self._entries.keys()),
+                'pinned': sorted(self._pinned),
+                'size_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
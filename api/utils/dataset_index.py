@@ -0,0 +1,198 @@
+"""
+Persisted PetDataset index with bit-packed segmentation masks
+Labels and MAT masks are parsed once per directory state; later constructions load a small JSON
+index and memory-map the packed masks, so neither startup nor __getitem__ needs scipy
+"""
+
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.image_catalog import IMAGE_EXTENSIONS, extract_breed_from_filename
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+INDEX_FILENAME = '.pet_dataset_index.json'
+MASKS_FILENAME = '.pet_dataset_masks.npy'
+MASK_KEY = 'binsa'
+
+
+def mat_path_for(image_path: str) -> str:
+    """MAT file holding the segmentation mask of an image"""
+    return f"{os.path.splitext(image_path)[0]}.mat"
+
+
+def directory_signature(filenames: List[str]) -> str:
+    """Hash of the image and MAT filenames in a directory listing"""
+    digest = hashlib.blake2b(digest_size=16)
+    for filename in sorted(filenames):
+        if filename.lower().endswith(IMAGE_EXTENSIONS + ('.mat',)):
+            digest.update(filename.encode() + b'\0')
+    return digest.hexdigest()
+
+
+def read_mat_mask(mat_path: str) -> Optional[np.ndarray]:
+    """The 'binsa' mask of a MAT file, or None if the file or key is missing or unreadable"""
+    import scipy.io
+    try:
+        mat_data = scipy.io.loadmat(mat_path)
+    except Exception as e:
+        logger.warning(f"Failed to load MAT file {os.path.basename(mat_path)}: {e}")
+        return None
+    if MASK_KEY not in mat_data:
+        logger.warning(f"No '{MASK_KEY}' key found in {os.path.basename(mat_path)}")
+        return None
+    return mat_data[MASK_KEY]
+
+
+class PetDatasetIndex:
+    """
+    Filename, label and mask location of every image in a dataset directory
+
+    The index is rebuilt only when the set of image and MAT filenames differs
+    from the one recorded (a directory listing, no file is opened), or when
+    masks are requested from an index built without them. Each mask is stored
+    as ``np.packbits`` of its binary pixels at a byte offset in one flat uint8
+    array; ``mask()`` unpacks just that slice.
+    """
+
+    def __init__(self, data_dir: str, index_dir: Optional[str] = None):
+        """
+        Args:
+            data_dir: Directory with pet images (and MAT masks)
+            index_dir: Where to persist the index (default: data_dir)
+        """
+        self.data_dir = data_dir
+        self.index_dir = index_dir or data_dir
+        self.index_path = os.path.join(self.index_dir, INDEX_FILENAME)
+        self.masks_path = os.path.join(self.index_dir, MASKS_FILENAME)
+        self.filenames: List[str] = []
+        self.labels: List[int] = []
+        self.breed_to_idx: Dict[str, int] = {}
+        # Per image: (byte offset, mask shape) into the packed mask array, or None
+        self.mask_locations: List[Optional[Tuple[int, Tuple[int, ...]]]] = []
+        self.has_masks = False
+        self._packed_masks = None
+        self._masks_persisted = False
+
+    def load_or_build(self, use_segmentation: bool = False) -> 'PetDatasetIndex':
+        """Load the persisted index if it is current, otherwise build and persist it"""
+        filenames = os.listdir(self.data_dir)
+        signature = directory_signature(filenames)
+        if not self._load(signature, use_segmentation):
+            self._build(filenames, use_segmentation)
+            self._save(signature)
+        return self
+
+    def _load(self, signature: str, use_segmentation: bool) -> bool:
+        """Read the persisted index if it matches the directory state"""
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if (index.get('version') != INDEX_VERSION or index.get('directory') != signature
+                or (use_segmentation and not index.get('has_masks'))):
+            return False
+        if index.get('has_masks') and not os.path.exists(self.masks_path):
+            return False
+
+        self.breed_to_idx = index['breeds']
+        self.filenames = [entry[0] for entry in index['entries']]
+        self.labels = [entry[1] for entry in index['entries']]
+        self.mask_locations = [(entry[2], tuple(entry[3])) if entry[2] is not None else None
+                               for entry in index['entries']]
+        self.has_masks = index['has_masks']
+        self._masks_persisted = self.has_masks
+        logger.info(f"Loaded dataset index for {len(self.filenames)} images from {self.index_path}")
+        return True
+
+    @staticmethod
+    def _breed_for_filename(filename: str) -> str:
+        """Breed name used to assign labels"""
+        return extract_breed_from_filename(filename, {})
+
+    def _build(self, filenames: List[str], use_segmentation: bool):
+        """Scan the directory, assign labels and pack every MAT mask"""
+        self.filenames, self.labels, self.mask_locations = [], [], []
+        self.breed_to_idx = {}
+        packed_chunks, offset = [], 0
+        if use_segmentation:
+            try:
+                import scipy.io  # noqa: F401
+            except ImportError:
+                logger.warning("scipy not available for MAT file loading. Install with: pip install scipy")
+                use_segmentation = False
+        self.has_masks = use_segmentation
+
+        # Sorted so labels (assigned in order of first appearance) are stable across filesystems
+        for filename in sorted(filenames):
+            if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            breed_name = self._breed_for_filename(filename)
+            if breed_name not in self.breed_to_idx:
+                self.breed_to_idx[breed_name] = len(self.breed_to_idx)
+            self.filenames.append(filename)
+            self.labels.append(self.breed_to_idx[breed_name])
+
+            location = None
+            if use_segmentation:
+                mat_path = mat_path_for(os.path.join(self.data_dir, filename))
+                mask = read_mat_mask(mat_path) if os.path.exists(mat_path) else None
+                if mask is not None:
+                    packed = np.packbits(np.asarray(mask) != 0)
+                    location = (offset, tuple(int(d) for d in np.shape(mask)))
+                    packed_chunks.append(packed)
+                    offset += len(packed)
+            self.mask_locations.append(location)
+
+        if use_segmentation:
+            self._packed_masks = np.concatenate(packed_chunks) if packed_chunks else np.zeros(0, dtype=np.uint8)
+        logger.info(f"Indexed {len(self.filenames)} images from {len(self.breed_to_idx)} breeds")
+
+    def _save(self, signature: str):
+        """Persist the index; a read-only index directory only costs a rebuild next time"""
+        index = {
+            'version': INDEX_VERSION,
+            'directory': signature,
+            'has_masks': self.has_masks,
+            'breeds': self.breed_to_idx,
+            'entries': [
+                [filename, label, *(location if location else (None, None))]
+                for filename, label, location in zip(self.filenames, self.labels, self.mask_locations)
+            ]
+        }
+        try:
+            if self.has_masks:
+                temp_path = f"{self.masks_path}.tmp.npy"
+                np.save(temp_path, self._packed_masks)
+                os.replace(temp_path, self.masks_path)
+                self._masks_persisted = True
+            temp_path = f"{self.index_path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(index, f)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            logger.warning(f"Could not persist dataset index to {self.index_dir}: {e}")
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self._masks_persisted:
+            state['_packed_masks'] = None  # re-mapped in each DataLoader worker
+        return state
+
+    def mask(self, idx: int) -> Optional[np.ndarray]:
+        """Unpacked flat uint8 (0/1) mask of image ``idx``, or None if it has none"""
+        location = self.mask_locations[idx]
+        if location is None:
+            return None
+        if self._packed_masks is None:
+            self._packed_masks = np.load(self.masks_path, mmap_mode='r')
+        offset, shape = location
+        count = int(np.prod(shape))
+        return np.unpackbits(self._packed_masks[offset:offset + (count + 7) // 8], count=count)
@@ -0,0 +1,206 @@
+"""
+Preprocessed uint8 memmap shards of the Oxford-IIIT Pet dataset
+Images (and trimaps) are decoded and resized once by build_dataset_shards.py into contiguous .npy
+shards with a JSON index, so training datasets read samples as memory-mapped arrays with no decoding
+"""
+
+import os
+import json
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+INDEX_FILENAME = 'index.json'
+DEFAULT_SHARD_SIZE = 1024
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+
+class ShardWriter:
+    """
+    Writes fixed-size samples into numbered ``<field>-NNNNN.npy`` shards
+
+    Every field has one fixed shape and dtype. Each shard holds ``shard_size``
+    samples (the last may hold fewer) in one contiguous array per field, and the
+    index records the fields, shard files and per-sample metadata.
+    """
+
+    def __init__(self, output_dir: str, fields: Dict[str, tuple], shard_size: int = DEFAULT_SHARD_SIZE):
+        """
+        Args:
+            output_dir: Directory for the shards and index
+            fields: Field name -> per-sample shape (stored as uint8)
+            shard_size: Samples per shard
+        """
+        self.output_dir = output_dir
+        self.fields = {name: tuple(shape) for name, shape in fields.items()}
+        self.shard_size = shard_size
+        self.samples: List[dict] = []
+        self.shards: List[dict] = []
+        self._arrays = None
+        self._count = 0
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _open_shard(self):
+        """Start a new shard sized for a full shard of samples"""
+        number = len(self.shards)
+        files = {name: f"{name}-{number:05d}.npy" for name in self.fields}
+        self._arrays = {
+            name: np.lib.format.open_memmap(
+                os.path.join(self.output_dir, files[name]), mode='w+', dtype=np.uint8,
+                shape=(self.shard_size, *shape)
+            )
+            for name, shape in self.fields.items()
+        }
+        self.shards.append({'files': files, 'count': 0})
+        self._count = 0
+
+    def _close_shard(self):
+        """Flush the open shard, truncating the last one to the samples actually written"""
+        if self._arrays is None:
+            return
+        count, arrays = self._count, self._arrays
+        self._arrays = None
+        for name in list(arrays):
+            array = arrays.pop(name)
+            array.flush()
+            if count < self.shard_size:
+                # Unmap before rewriting the file with only the written samples
+                data = np.array(array[:count])
+                del array
+                np.save(os.path.join(self.output_dir, self.shards[-1]['files'][name]), data)
+        self.shards[-1]['count'] = count
+
+    def add(self, arrays: Dict[str, np.ndarray], **metadata):
+        """Append one sample; ``metadata`` (e.g. name, label) is stored in the index"""
+        if self._arrays is None or self._count == self.shard_size:
+            self._close_shard()
+            self._open_shard()
+        for name, array in arrays.items():
+            self._arrays[name][self._count] = array
+        self._count += 1
+        self.samples.append(metadata)
+
+    def close(self, **attributes):
+        """Finish the last shard and write the index; ``attributes`` are stored at its top level"""
+        self._close_shard()
+        index = {
+            **attributes,
+            'shard_size': self.shard_size,
+            'fields': {name: list(shape) for name, shape in self.fields.items()},
+            'shards': self.shards,
+            'samples': self.samples
+        }
+        with open(os.path.join(self.output_dir, INDEX_FILENAME), 'w') as f:
+            json.dump(index, f)
+
+
+class ShardedDataset(Dataset):
+    """
+    Random access to the samples of a shard directory as numpy views
+
+    Shards are memory-mapped lazily in each process, so DataLoader workers share
+    the page cache instead of pickling arrays, and a sample read is a slice of a
+    mapped file.
+    """
+
+    def __init__(self, shard_dir: str, indices: Optional[Sequence[int]] = None):
+        """
+        Args:
+            shard_dir: Directory written by build_dataset_shards.py
+            indices: Subset of sample indices to expose (default: all)
+        """
+        self.shard_dir = shard_dir
+        with open(os.path.join(shard_dir, INDEX_FILENAME)) as f:
+            self.index = json.load(f)
+        self.shard_size = self.index['shard_size']
+        self.samples = self.index['samples']
+        self.indices = list(indices) if indices is not None else list(range(len(self.samples)))
+        self._arrays = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_arrays'] = None  # memory maps are reopened in each worker
+        return state
+
+    def _shard_arrays(self) -> List[Dict[str, np.ndarray]]:
+        """Memory-mapped arrays of every shard, opened on first use"""
+        if self._arrays is None:
+            self._arrays = [
+                {name: np.load(os.path.join(self.shard_dir, filename), mmap_mode='r')
+                 for name, filename in shard['files'].items()}
+                for shard in self.index['shards']
+            ]
+        return self._arrays
+
+    def __len__(self):
+        return len(self.indices)
+
+    @property
+    def images(self) -> List[str]:
+        """Source image names of the exposed samples"""
+        return [self.samples[index]['name'] for index in self.indices]
+
+    def read(self, idx: int) -> Dict[str, np.ndarray]:
+        """Arrays of sample ``idx`` (views into the memory maps)"""
+        shard, offset = divmod(self.indices[idx], self.shard_size)
+        return {name: array[offset] for name, array in self._shard_arrays()[shard].items()}
+
+    def metadata(self, idx: int) -> dict:
+        """Index metadata (name, label, ...) of sample ``idx``"""
+        return self.samples[self.indices[idx]]
+
+    def split_indices(self, fraction: float = 0.8, seed: int = 0):
+        """
+        (train, val) sample indices: a seeded random ``fraction`` of the samples and the rest
+
+        Samples are stored sorted by file name, i.e. grouped by breed, so a plain cut
+        would leave whole breeds out of training. Each part is returned sorted to
+        keep shard reads sequential.
+        """
+        order = np.random.default_rng(seed).permutation(len(self.indices))
+        cut = int(fraction * len(self.indices))
+        return ([self.indices[i] for i in np.sort(order[:cut])],
+                [self.indices[i] for i in np.sort(order[cut:])])
+
+
+def normalize_image(image: np.ndarray, mean: Sequence[float] = IMAGENET_MEAN,
+                    std: Sequence[float] = IMAGENET_STD) -> torch.Tensor:
+    """HWC uint8 array -> normalized CHW float tensor, equal to ToTensor() + Normalize()"""
+    tensor = torch.from_numpy(np.array(image)).permute(2, 0, 1).float().div_(255)
+    mean = torch.tensor(mean).view(3, 1, 1)
+    std = torch.tensor(std).view(3, 1, 1)
+    return tensor.sub_(mean).div_(std)
+
+
+class ShardedClassificationDataset(ShardedDataset):
+    """(image tensor, class index) samples from classification shards"""
+
+    def __init__(self, shard_dir: str, indices: Optional[Sequence[int]] = None,
+                 transform: Optional[Callable[[torch.Tensor], torch.Tensor]] = None):
+        """
+        Args:
+            shard_dir: Directory written by build_dataset_shards.py --task classification
+            indices: Subset of sample indices to expose (default: all)
+            transform: Optional augmentation applied to the uint8 CHW tensor before normalization
+        """
+        super().__init__(shard_dir, indices)
+        self.transform = transform
+
+    def __getitem__(self, idx):
+        image = self.read(idx)['image']
+        if self.transform:
+            image = self.transform(torch.from_numpy(np.array(image)).permute(2, 0, 1)).permute(1, 2, 0).numpy()
+        return normalize_image(image), self.metadata(idx)['label']
+
+
+class ShardedSegmentationDataset(ShardedDataset):
+    """(image tensor, mask tensor) samples from segmentation shards"""
+
+    def __getitem__(self, idx):
+        sample = self.read(idx)
+        # Same values as ToTensor() on the resized 'L' trimap used by OxfordIIITDataset
+        mask = torch.from_numpy(np.array(sample['mask'])).unsqueeze(0).float().div_(255)
+        return normalize_image(sample['image']), mask
@@ -0,0 +1,201 @@
+"""
+Cached frozen-backbone features for head-only classifier training
+The frozen backbone runs once over a dataset and its pooled features are stored in a memory-mapped
+float16 array, so every training epoch only runs the small classifier head
+"""
+
+import os
+import json
+import hashlib
+import logging
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, Subset
+
+from utils.multi_head import backbone_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def get_head(model: nn.Module, model_type: str) -> nn.Module:
+    """The trainable head that PetClassifier._create_model attaches to a backbone"""
+    return model.fc if model_type == 'resnet' else model.classifier[-1]
+
+
+def _set_head(model: nn.Module, model_type: str, head: nn.Module):
+    """Put a module in the head's place"""
+    if model_type == 'resnet':
+        model.fc = head
+    else:
+        model.classifier[-1] = head
+
+
+@contextmanager
+def headless(model: nn.Module, model_type: str):
+    """Temporarily replace the head with Identity so the model outputs the features the head consumes"""
+    head = get_head(model, model_type)
+    _set_head(model, model_type, nn.Identity())
+    try:
+        yield model
+    finally:
+        _set_head(model, model_type, head)
+
+
+def dataset_signature(loader: DataLoader) -> str:
+    """Hash of a loader's dataset size, subset indices, transform and (for PetDataset) image paths"""
+    dataset = loader.dataset
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{type(dataset).__name__}:{len(dataset)}".encode())
+    # Unwrap random_split/Subset so different splits of one dataset get different caches
+    while isinstance(dataset, Subset):
+        digest.update(np.asarray(dataset.indices, dtype=np.int64).tobytes())
+        dataset = dataset.dataset
+    digest.update(repr(getattr(dataset, 'transform', None)).encode())
+    for path in getattr(dataset, 'images', []):
+        digest.update(str(path).encode())
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """
+    Pooled backbone features of a dataset, memory-mapped from ``<name>.features.npy``
+
+    Features have shape [views, samples, feature_dim] and labels [views, samples].
+    Each view is one pass over the loader, so with a randomly augmenting
+    transform every view holds a different augmentation of each image. The
+    cache is reused while the backbone weights, dataset and view count match
+    the metadata in ``<name>.json``.
+    """
+
+    def __init__(self, directory: str, name: str):
+        """
+        Args:
+            directory: Directory holding the cache files
+            name: Cache name, e.g. 'train' or 'val'
+        """
+        self.directory = directory
+        self.name = name
+        self.features_path = os.path.join(directory, f"{name}.features.npy")
+        self.labels_path = os.path.join(directory, f"{name}.labels.npy")
+        self.metadata_path = os.path.join(directory, f"{name}.json")
+        self.features = None
+        self.labels = None
+
+    @property
+    def num_views(self) -> int:
+        """Number of cached passes over the dataset"""
+        return self.features.shape[0]
+
+    @property
+    def num_samples(self) -> int:
+        """Number of samples per view"""
+        return self.features.shape[1]
+
+    def _metadata(self) -> Optional[dict]:
+        """Metadata of the cache on disk, or None if missing"""
+        try:
+            with open(self.metadata_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, expected: dict) -> bool:
+        """Memory-map the cached arrays if their metadata matches ``expected``"""
+        if self._metadata() != expected or not os.path.exists(self.features_path):
+            return False
+        self.features = np.load(self.features_path, mmap_mode='r')
+        self.labels = np.load(self.labels_path)
+        return True
+
+    def build(self, model: nn.Module, model_type: str, loader: DataLoader, views: int,
+              device: torch.device, metadata: dict):
+        """
+        Run the headless model over the loader ``views`` times and write the features
+
+        The model runs in eval mode, so BatchNorm uses its stored running statistics
+        rather than updating them as a full train-mode forward pass would.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        # Count what the loader yields, not the dataset size: drop_last or a subsampling
+        # sampler would otherwise leave zero-feature rows labelled 0 in the cache
+        num_samples = sum(len(batch) for batch in loader.batch_sampler)
+        features = None
+        labels = np.zeros((views, num_samples), dtype=np.int64)
+        temp_path = f"{self.features_path}.tmp"
+
+        model.eval()
+        with headless(model, model_type), torch.no_grad():
+            for view in range(views):
+                position = 0
+                for data, target in loader:
+                    output = model(data.to(device)).flatten(1).cpu().numpy()
+                    if features is None:
+                        features = np.lib.format.open_memmap(
+                            temp_path, mode='w+', dtype=np.float16, shape=(views, num_samples, output.shape[1])
+                        )
+                    features[view, position:position + len(output)] = output
+                    labels[view, position:position + len(output)] = target.numpy()
+                    position += len(output)
+                if position != num_samples:
+                    raise ValueError(f"Loader yielded {position} samples in view {view + 1}, expected {num_samples}")
+                logger.info(f"Cached {self.name} features: view {view + 1}/{views}, {position} samples")
+
+        features.flush()
+        del features
+        os.replace(temp_path, self.features_path)
+        np.save(self.labels_path, labels)
+        with open(self.metadata_path, 'w') as f:
+            json.dump(metadata, f, indent=2)
+        self.load(metadata)
+
+    @classmethod
+    def for_loader(cls, model: nn.Module, model_type: str, loader: DataLoader, directory: str, name: str,
+                   views: int = 1, device: torch.device = torch.device('cpu')) -> 'FeatureCache':
+        """
+        Load the cached features of a loader, extracting them first if missing or stale
+
+        Args:
+            model: Classifier whose head is trained on the features
+            model_type: "resnet", "alexnet" or "mobilenet"
+            loader: Loader yielding (image batch, label batch)
+            directory: Directory for the cache files
+            name: Cache name, e.g. 'train' or 'val'
+            views: Passes over the loader to cache (augmented views per image)
+            device: Device to run the backbone on
+        """
+        with headless(model, model_type):
+            backbone = backbone_fingerprint(model.state_dict())
+        metadata = {
+            'model_type': model_type,
+            'backbone': backbone,
+            'dataset': dataset_signature(loader),
+            'views': views
+        }
+
+        cache = cls(directory, name)
+        if cache.load(metadata):
+            logger.info(f"Using cached {name} features from {cache.features_path}")
+        else:
+            cache.build(model, model_type, loader, views, device, metadata)
+        return cache
+
+    def batches(self, batch_size: int, view: int = 0, shuffle: bool = False,
+                generator: Optional[np.random.Generator] = None) -> Iterator[Tuple[torch.Tensor, torch.Tensor]]:
+        """
+        Yield (float32 feature batch, label batch) for one view
+
+        Shuffled batches are read in sorted index order so the memory map is
+        accessed mostly sequentially.
+        """
+        order = (generator or np.random.default_rng()).permutation(self.num_samples) if shuffle \
+            else np.arange(self.num_samples)
+        features = self.features[view % self.num_views]
+        labels = self.labels[view % self.num_views]
+        for start in range(0, self.num_samples, batch_size):
+            indices = np.sort(order[start:start + batch_size])
+            yield (torch.from_numpy(features[indices].astype(np.float32)),
+                   torch.from_numpy(labels[indices]))
@@ -0,0 +1,136 @@
+"""
+Precomputed AI predictions for game images
+Stores each classifier's top-1 breed and confidence per image in one compact indexed .npz file
+"""
+
+import os
+import threading
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_TABLE_PATH = os.getenv(
+    'GAME_PREDICTIONS_PATH', os.path.join(PROJECT_ROOT, 'models', 'game_predictions.npz')
+)
+
+
+class GamePredictionTable:
+    """
+    Lookup table of (model id, image filename) -> (predicted breed, confidence)
+
+    File layout (numpy .npz):
+        filenames:   [N] image filenames, sorted
+        model_ids:   [M] model identifiers (checkpoint file names)
+        class_names: [C] breed names indexed by the prediction codes
+        predictions: [M, N] uint8 class index of the top-1 prediction
+        confidences: [M, N] float16 top-1 softmax probability
+    """
+
+    def __init__(self, filenames: List[str], model_ids: List[str], class_names: List[str],
+                 predictions: np.ndarray, confidences: np.ndarray):
+        self.filenames = list(filenames)
+        self.model_ids = list(model_ids)
+        self.class_names = list(class_names)
+        self.predictions = predictions
+        self.confidences = confidences
+        self._filename_index = {name: i for i, name in enumerate(self.filenames)}
+        self._model_index = {model_id: i for i, model_id in enumerate(self.model_ids)}
+
+    @classmethod
+    def load(cls, path: str) -> 'GamePredictionTable':
+        """Load a table written by ``save``"""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                filenames=data['filenames'].tolist(),
+                model_ids=data['model_ids'].tolist(),
+                class_names=data['class_names'].tolist(),
+                predictions=data['predictions'],
+                confidences=data['confidences']
+            )
+
+    def save(self, path: str):
+        """Write the table as a compressed .npz file"""
+        np.savez_compressed(
+            path,
+            filenames=np.array(self.filenames),
+            model_ids=np.array(self.model_ids),
+            class_names=np.array(self.class_names),
+            predictions=self.predictions.astype(np.uint8),
+            confidences=self.confidences.astype(np.float16)
+        )
+
+    def lookup(self, model_id: str, filename: str) -> Optional[Tuple[str, float]]:
+        """
+        Get the precomputed prediction for an image
+
+        Returns:
+            Tuple of (breed, confidence), or None if the model or image is not in the table
+        """
+        row = self._model_index.get(model_id)
+        col = self._filename_index.get(filename)
+        if row is None or col is None:
+            return None
+        return self.class_names[int(self.predictions[row, col])], float(self.confidences[row, col])
+
+    def __len__(self) -> int:
+        return len(self.filenames)
+
+
+_table: Optional[GamePredictionTable] = None
+_table_mtime: Optional[float] = None
+_table_lock = threading.Lock()
+_warned_missing = set()
+
+
+def get_game_prediction_table(path: str = DEFAULT_TABLE_PATH) -> Optional[GamePredictionTable]:
+    """Get the shared prediction table, reloading it when the file is rewritten"""
+    global _table, _table_mtime
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    with _table_lock:
+        if _table is None or mtime != _table_mtime:
+            try:
+                _table = GamePredictionTable.load(path)
+                _table_mtime = mtime
+                logger.info(f"Loaded {len(_table)} precomputed game predictions from {path}")
+            except Exception as e:
+                logger.warning(f"Could not load game prediction table {path}: {e}")
+                return None
+        return _table
+
+
+def lookup_game_prediction(model_id: str, filename: str,
+                           path: str = DEFAULT_TABLE_PATH) -> Optional[Tuple[str, float]]:
+    """
+    Get the precomputed prediction for a game image from the shared table
+
+    Misses are logged once per (model id, table path) rather than per question,
+    since a question pool refill would otherwise repeat the same warning for
+    every question it generates.
+
+    Returns:
+        Tuple of (breed, confidence), or None if the table, model or image is missing
+    """
+    table = get_game_prediction_table(path)
+    precomputed = table.lookup(model_id, filename) if table else None
+    if precomputed is None:
+        with _table_lock:
+            first_miss = (model_id, path) not in _warned_missing
+            _warned_missing.add((model_id, path))
+        if first_miss:
+            if table is None:
+                reason = f"no prediction table at {path}"
+            elif model_id not in table.model_ids:
+                reason = f"{model_id} is not in {path}"
+            else:
+                reason = f"{path} is missing images such as {filename}"
+            logger.warning(f"Game questions for {model_id} have no precomputed AI prediction: {reason} "
+                           f"(run precompute_game_predictions.py)")
+    return precomputed
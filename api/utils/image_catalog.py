@@ -0,0 +1,216 @@
+"""
+Cached catalog of game images
+Built once from breed_mapping.json and the images directory, refreshed incrementally when
+the directory changes, so question generation never rescans or reparses the whole image set
+"""
+
+import os
+import json
+import random
+import threading
+import logging
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from cloudinary_helper import cloudinary_helper
+except ImportError:
+    cloudinary_helper = None
+
+logger = logging.getLogger(__name__)
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(API_DIR)
+DEFAULT_IMAGES_DIR = os.path.join(PROJECT_ROOT, 'images')
+DEFAULT_BREED_MAPPING_PATH = os.path.join(API_DIR, 'breed_mapping.json')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+LOCAL_IMAGE_URL = 'http://localhost:5328/api/images/{filename}'
+
+# Breeds whose names span two underscore-separated filename parts
+MULTI_WORD_PREFIXES = {
+    'cats': ['british', 'egyptian', 'maine', 'russian'],
+    'dogs': ['american', 'german', 'yorkshire', 'english', 'great', 'staffordshire']
+}
+
+
+def extract_breed_from_filename(filename: str, filename_to_breed: dict) -> str:
+    """Extract and standardize breed name from filename."""
+    parts = filename.split('_')
+    if len(parts) < 2:
+        return filename_to_breed.get(parts[0].lower(), parts[0].replace('_', ' ').title())
+
+    first_part = parts[0].lower()
+
+    # Check if it's a multi-word breed
+    if first_part in MULTI_WORD_PREFIXES['cats'] + MULTI_WORD_PREFIXES['dogs']:
+        breed_filename = f"{parts[0]}_{parts[1]}"
+    else:
+        breed_filename = parts[0]
+
+    return filename_to_breed.get(breed_filename.lower(), breed_filename.replace('_', ' ').title())
+
+
+def load_breed_mapping(path: str = DEFAULT_BREED_MAPPING_PATH):
+    """
+    Load breed_mapping.json
+
+    Returns:
+        Tuple of (filename prefix -> breed name, {'cats': [...], 'dogs': [...]})
+    """
+    try:
+        with open(path, 'r') as f:
+            breed_data = json.load(f)
+        return breed_data['filename_to_breed'], breed_data['breed_types']
+    except FileNotFoundError:
+        logger.warning("breed_mapping.json not found. Using fallback mapping.")
+        return {}, {'cats': [], 'dogs': []}
+
+
+class ImageCatalog:
+    """
+    Breed -> image index over the game images directory
+
+    The breed mapping is read once. The directory is rescanned only when its
+    mtime changes, and then only added or removed filenames are (re)parsed.
+    Breed lists and the cat/dog partitions are kept as plain lists so a question
+    can be sampled in O(options).
+    """
+
+    def __init__(self, images_dir: str = DEFAULT_IMAGES_DIR,
+                 breed_mapping_path: str = DEFAULT_BREED_MAPPING_PATH):
+        self.images_dir = images_dir
+        self.filename_to_breed, breed_types = load_breed_mapping(breed_mapping_path)
+        self.cat_breed_set = set(breed_types.get('cats', []))
+        self.dog_breed_set = set(breed_types.get('dogs', []))
+
+        self._file_breeds: Dict[str, str] = {}
+        self._breed_images: Dict[str, List[str]] = {}
+        self._urls: Dict[str, str] = {}
+        self._dir_mtime: Optional[int] = None
+        self._lock = threading.Lock()
+
+        self.breeds: List[str] = []
+        self.cat_breeds: List[str] = []
+        self.dog_breeds: List[str] = []
+
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """
+        Pick up added or removed images if the directory changed since the last scan
+
+        Returns:
+            True if the catalog changed
+        """
+        try:
+            mtime = os.stat(self.images_dir).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        if mtime == self._dir_mtime:
+            return False
+
+        with self._lock:
+            if mtime == self._dir_mtime:
+                return False
+
+            current = set()
+            if mtime is not None:
+                current = {f for f in os.listdir(self.images_dir) if f.lower().endswith(IMAGE_EXTENSIONS)}
+
+            known = set(self._file_breeds)
+            added, removed = current - known, known - current
+            changed_breeds = set()
+
+            for filename in removed:
+                breed = self._file_breeds.pop(filename)
+                self._urls.pop(filename, None)
+                self._breed_images[breed].remove(filename)
+                if not self._breed_images[breed]:
+                    del self._breed_images[breed]
+                changed_breeds.add(breed)
+
+            for filename in added:
+                breed = extract_breed_from_filename(filename, self.filename_to_breed)
+                self._file_breeds[filename] = breed
+                self._breed_images.setdefault(breed, []).append(filename)
+                changed_breeds.add(breed)
+
+            if changed_breeds or self._dir_mtime is None:
+                self.breeds = sorted(self._breed_images)
+                self.cat_breeds = [b for b in self.breeds if b in self.cat_breed_set]
+                self.dog_breeds = [b for b in self.breeds if b in self.dog_breed_set]
+
+            self._dir_mtime = mtime
+            if added or removed:
+                logger.info(f"Image catalog: +{len(added)} -{len(removed)} images, "
+                            f"{len(self._file_breeds)} images across {len(self.breeds)} breeds")
+            return bool(added or removed)
+
+    def __len__(self) -> int:
+        return len(self._file_breeds)
+
+    def images_for_breed(self, breed: str) -> List[str]:
+        """Filenames of all images of a breed"""
+        return self._breed_images.get(breed, [])
+
+    def random_breed_image(self) -> Optional[Tuple[List[str], str, str]]:
+        """
+        Random breed and one of its images, picked from one consistent snapshot
+
+        Returns:
+            Tuple of (all breeds, breed, image filename), or None if the catalog is empty
+        """
+        with self._lock:
+            if not self.breeds:
+                return None
+            breed = random.choice(self.breeds)
+            return self.breeds, breed, random.choice(self._breed_images[breed])
+
+    def breed_type_set(self, breed: str) -> Optional[set]:
+        """All known breeds of the same animal type (cat or dog), or None if unknown"""
+        if breed in self.cat_breed_set:
+            return self.cat_breed_set
+        if breed in self.dog_breed_set:
+            return self.dog_breed_set
+        return None
+
+    def same_type_breeds(self, breed: str) -> List[str]:
+        """Available breeds of the same animal type (cat or dog), or all breeds if unknown"""
+        if breed in self.cat_breed_set:
+            return self.cat_breeds
+        if breed in self.dog_breed_set:
+            return self.dog_breeds
+        return self.breeds
+
+    @staticmethod
+    def sample_excluding(candidates: List[str], exclude: str, k: int) -> List[str]:
+        """Sample k distinct items from a list that contains ``exclude`` at most once, in O(k)"""
+        sample = random.sample(candidates, min(k + 1, len(candidates)))
+        sample = [item for item in sample if item != exclude]
+        return sample[:k]
+
+    def image_url(self, filename: str) -> str:
+        """Cloudinary URL for an image, falling back to local serving"""
+        url = self._urls.get(filename)
+        if url is None:
+            if cloudinary_helper is not None and cloudinary_helper.is_available():
+                url = cloudinary_helper.get_image_url(filename)
+            else:
+                url = LOCAL_IMAGE_URL.format(filename=filename)
+            self._urls[filename] = url
+        return url
+
+
+_catalog: Optional[ImageCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_image_catalog() -> ImageCatalog:
+    """Get the shared image catalog, refreshing it if the images directory changed"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = ImageCatalog()
+            return _catalog
+    _catalog.refresh()
+    return _catalog
@@ -0,0 +1,215 @@
+"""
+Exported inference backends for Pet Detective classifiers
+Serves the classifier graph as frozen TorchScript or through ONNX Runtime on CPU
+"""
+
+import io
+import os
+import warnings
+import logging
+from typing import Dict, Iterable, Union
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+BACKEND_EAGER = 'eager'
+BACKEND_TORCHSCRIPT = 'torchscript'
+BACKEND_ONNX = 'onnx'
+BACKENDS = (BACKEND_EAGER, BACKEND_TORCHSCRIPT, BACKEND_ONNX)
+
+EXPORT_EXTENSIONS = {BACKEND_TORCHSCRIPT: '.torchscript.pt', BACKEND_ONNX: '.onnx'}
+ONNX_OPSET = 17
+
+# Import ONNX Runtime support
+try:
+    import onnxruntime
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+
+def exported_model_path(model_path: str, backend: str) -> str:
+    """
+    Path of the exported graph stored next to a checkpoint
+
+    e.g. models/resnet_model.safetensors -> models/resnet_model.safetensors.onnx.
+    The full file name is kept so model.pth and model.safetensors never share an export.
+    """
+    return f"{model_path}{EXPORT_EXTENSIONS[backend]}"
+
+
+def export_torchscript(model: nn.Module, example_input: torch.Tensor, path: str = None) -> torch.jit.ScriptModule:
+    """
+    Trace a model and freeze it for inference
+
+    Freezing inlines the weights as constants, propagates them and folds BatchNorm
+    into the preceding convolutions. The result is saved as-is; the CPU-specific
+    ``optimize_for_inference`` pass is applied after loading since its output
+    cannot be serialized.
+
+    Args:
+        model: Eager model in eval mode
+        example_input: Batch used for tracing (the batch dimension stays dynamic)
+        path: Where to save the module, or None to keep it in memory only
+
+    Returns:
+        Frozen TorchScript module
+    """
+    with torch.no_grad():
+        traced = torch.jit.trace(model.eval(), example_input)
+        frozen = torch.jit.freeze(traced)
+    if path:
+        torch.jit.save(frozen, path)
+        logger.info(f"Saved TorchScript model to: {path}")
+    return frozen
+
+
+def load_torchscript(path: str) -> torch.jit.ScriptModule:
+    """Load a frozen TorchScript model and apply the CPU inference optimizations"""
+    model = torch.jit.load(path, map_location='cpu')
+    with torch.no_grad():
+        return torch.jit.optimize_for_inference(model.eval())
+
+
+def export_onnx(model: nn.Module, example_input: torch.Tensor, path: str = None) -> bytes:
+    """
+    Export a model as a self-contained ONNX graph with a dynamic batch dimension
+
+    Args:
+        model: Eager model in eval mode
+        example_input: Batch used for tracing
+        path: Where to save the graph, or None to keep it in memory only
+
+    Returns:
+        Serialized ONNX model
+    """
+    buffer = io.BytesIO()
+    with warnings.catch_warnings(), torch.no_grad():
+        warnings.simplefilter('ignore', (DeprecationWarning, FutureWarning))
+        torch.onnx.export(
+            model.eval(), (example_input,), buffer,
+            input_names=['input'], output_names=['logits'],
+            dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+            opset_version=ONNX_OPSET, do_constant_folding=True, dynamo=False
+        )
+    data = buffer.getvalue()
+    if path:
+        with open(path, 'wb') as f:
+            f.write(data)
+        logger.info(f"Saved ONNX model to: {path}")
+    return data
+
+
+class OnnxRuntimeModule:
+    """
+    ONNX Runtime CPU session with the calling convention of an eval-mode nn.Module
+
+    Takes and returns torch tensors so PetClassifier can use it in place of its model.
+    """
+
+    def __init__(self, model: Union[str, bytes], num_threads: int = None):
+        """
+        Args:
+            model: Path to an .onnx file or the serialized graph
+            num_threads: Intra-op threads (default: torch's thread count)
+        """
+        if not ONNXRUNTIME_AVAILABLE:
+            raise ImportError("ONNX Runtime not available. Install with: pip install onnxruntime")
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = num_threads or torch.get_num_threads()
+        self.session = onnxruntime.InferenceSession(model, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.size_bytes = os.path.getsize(model) if isinstance(model, str) else len(model)
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        inputs = np.ascontiguousarray(batch.detach().cpu().numpy(), dtype=np.float32)
+        return torch.from_numpy(self.session.run(None, {self.input_name: inputs})[0])
+
+    def eval(self) -> 'OnnxRuntimeModule':
+        return self
+
+    def to(self, device) -> 'OnnxRuntimeModule':
+        return self
+
+    def parameters(self) -> Iterable[torch.Tensor]:
+        return iter(())
+
+    def buffers(self) -> Iterable[torch.Tensor]:
+        return iter(())
+
+
+def load_backend_model(backend: str, eager_model: nn.Module, example_input: torch.Tensor,
+                       model_path: str = None):
+    """
+    Get a model served by an exported backend
+
+    Uses the artifact next to the checkpoint when it is at least as new as the
+    checkpoint, and otherwise exports the eager model in memory.
+
+    Args:
+        backend: "torchscript" or "onnx"
+        eager_model: Loaded eager model, used when no up-to-date artifact exists
+        example_input: Batch used for tracing
+        model_path: Checkpoint the eager model was loaded from
+
+    Returns:
+        Callable model taking and returning a batch tensor
+    """
+    path = exported_model_path(model_path, backend) if model_path else None
+    fresh = path and os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(model_path)
+    if path and not fresh:
+        logger.warning(f"No up-to-date {backend} export at {path}; exporting in memory. Run export_models.py.")
+
+    if backend == BACKEND_TORCHSCRIPT:
+        if fresh:
+            logger.info(f"Loading TorchScript model from: {path}")
+            return load_torchscript(path)
+        with torch.no_grad():
+            return torch.jit.optimize_for_inference(export_torchscript(eager_model, example_input))
+
+    if backend == BACKEND_ONNX:
+        if fresh:
+            logger.info(f"Loading ONNX model from: {path}")
+            return OnnxRuntimeModule(path)
+        return OnnxRuntimeModule(export_onnx(eager_model, example_input))
+
+    raise ValueError(f"Unsupported backend: {backend}. Supported backends: {', '.join(BACKENDS)}")
+
+
+def check_parity(reference, candidate, batches: Iterable[torch.Tensor], atol: float = 1e-4) -> Dict[str, float]:
+    """
+    Compare a backend's outputs with the eager model's on the same inputs
+
+    Args:
+        reference: Eager model
+        candidate: Exported model
+        batches: Input batches
+        atol: Largest accepted absolute difference between softmax probabilities
+
+    Returns:
+        Dictionary with max_logit_diff, max_probability_diff, top1_agreement and passed
+    """
+    max_logit_diff, max_probability_diff, agree, total = 0.0, 0.0, 0, 0
+    with torch.no_grad():
+        for batch in batches:
+            expected, actual = reference(batch), candidate(batch)
+            max_logit_diff = max(max_logit_diff, (expected - actual).abs().max().item())
+            max_probability_diff = max(
+                max_probability_diff,
+                (torch.softmax(expected, dim=1) - torch.softmax(actual, dim=1)).abs().max().item()
+            )
+            agree += (expected.argmax(dim=1) == actual.argmax(dim=1)).sum().item()
+            total += batch.shape[0]
+
+    top1_agreement = agree / total if total else 1.0
+    return {
+        'max_logit_diff': max_logit_diff,
+        'max_probability_diff': max_probability_diff,
+        'top1_agreement': top1_agreement,
+        'passed': max_probability_diff <= atol and top1_agreement == 1.0
+    }
@@ -0,0 +1,229 @@
+"""
+Compact encodings of segmentation masks and cutouts for API responses
+COCO-style RLE, simplified contour polygons and 1-bit PNG masks, plus JPEG/WebP/PNG cutouts,
+so a response does not have to carry two full-resolution RGB PNGs
+"""
+
+import io
+import os
+import base64
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Cheapest forms the frontend can render as <img> sources (see scripts/benchmark_mask_encoding.py)
+DEFAULT_MASK_FORMAT = os.environ.get('SEGMENTATION_MASK_FORMAT', 'png1')
+DEFAULT_CUTOUT_FORMAT = os.environ.get('SEGMENTATION_CUTOUT_FORMAT', 'jpeg')
+DEFAULT_CUTOUT_QUALITY = int(os.environ.get('SEGMENTATION_CUTOUT_QUALITY', 85))
+
+# Polygon simplification tolerance and smallest kept area, in model-resolution pixels
+DEFAULT_POLYGON_TOLERANCE = 1.0
+DEFAULT_POLYGON_MIN_AREA = 4.0
+
+MIME_TYPES = {'png': 'image/png', 'jpeg': 'image/jpeg', 'webp': 'image/webp'}
+
+
+def to_data_url(data: bytes, image_format: str) -> str:
+    """Wrap encoded image bytes in a base64 data URL"""
+    return f"data:{MIME_TYPES[image_format]};base64,{base64.b64encode(data).decode()}"
+
+
+def encode_png(image: Image.Image) -> str:
+    """Encode an image as a PNG data URL"""
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return to_data_url(buffer.getvalue(), 'png')
+
+
+def encode_png_1bit(mask_image: Image.Image) -> str:
+    """
+    Encode a 0/255 'L' mask as a 1-bit PNG data URL (black background, white pet)
+
+    Packs 8 pixels per byte before compression, so the PNG is compressed from an
+    eighth of the 8-bit mask's raw size. A 1-bit grayscale PNG renders the same
+    as a two-entry palette PNG and skips the palette conversion.
+    """
+    buffer = io.BytesIO()
+    mask_image.convert('1', dither=Image.Dither.NONE).save(buffer, format='PNG')
+    return to_data_url(buffer.getvalue(), 'png')
+
+
+def encode_cutout(image: Image.Image, image_format: str, quality: int = DEFAULT_CUTOUT_QUALITY) -> str:
+    """
+    Encode the segmented RGB image as a data URL
+
+    Args:
+        image: Cutout (pet over black)
+        image_format: 'jpeg', 'webp' or 'png'
+        quality: JPEG/WebP quality, 1-100
+    """
+    if image_format == 'png':
+        return encode_png(image)
+    buffer = io.BytesIO()
+    if image_format == 'webp':
+        # method 0 is libwebp's fastest encoder; quality still controls the size
+        image.save(buffer, format='WEBP', quality=quality, method=0)
+    else:
+        image.save(buffer, format='JPEG', quality=quality)
+    return to_data_url(buffer.getvalue(), image_format)
+
+
+def mask_to_rle(mask) -> Dict:
+    """
+    Uncompressed COCO RLE of a binary mask
+
+    Counts alternate background/foreground run lengths over the mask in
+    column-major order, starting with background (so the first count may be 0),
+    as ``pycocotools.mask.frPyObjects`` accepts.
+
+    Args:
+        mask: [H, W] array or 'L' image, nonzero = pet
+
+    Returns:
+        {'size': [H, W], 'counts': [...]}
+    """
+    if isinstance(mask, Image.Image):
+        # PIL transposes in C, much faster than a column-major numpy copy of a large mask
+        size = [mask.height, mask.width]
+        flat = np.asarray(mask.transpose(Image.Transpose.TRANSPOSE)).ravel() != 0
+    else:
+        size = list(np.shape(mask))
+        flat = np.asarray(mask).ravel(order='F') != 0
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    counts = np.diff(np.concatenate(([0], changes, [flat.size])))
+    if flat.size and flat[0]:
+        counts = np.concatenate(([0], counts))
+    return {'size': size, 'counts': counts.tolist()}
+
+
+def _boundary_edges(mask: np.ndarray) -> np.ndarray:
+    """
+    Directed pixel-boundary edges [x0, y0, x1, y1] between foreground and background
+
+    Every edge has the foreground on its right (in image coordinates, y down), so
+    outer boundaries run clockwise with positive area and holes negative.
+    """
+    padded = np.pad(np.asarray(mask) != 0, 1)
+    core = padded[1:-1, 1:-1]
+    sides = (
+        (padded[:-2, 1:-1], (0, 0), (1, 0)),  # top
+        (padded[1:-1, 2:], (1, 0), (1, 1)),   # right
+        (padded[2:, 1:-1], (1, 1), (0, 1)),   # bottom
+        (padded[1:-1, :-2], (0, 1), (0, 0)),  # left
+    )
+    edges = []
+    for neighbour, start, end in sides:
+        rows, cols = np.nonzero(core & ~neighbour)
+        edges.append(np.stack([cols + start[0], rows + start[1], cols + end[0], rows + end[1]], axis=1))
+    return np.concatenate(edges)
+
+
+def _trace_loops(edges: np.ndarray) -> List[List[Tuple[int, int]]]:
+    """
+    Link boundary edges into closed vertex loops
+
+    Where two foreground pixels touch only diagonally a vertex has two outgoing
+    edges; taking the left turn joins them, so loops follow 8-connected regions.
+    """
+    outgoing = defaultdict(list)
+    for x0, y0, x1, y1 in edges.tolist():
+        outgoing[(x0, y0)].append((x1, y1))
+
+    def take(vertex, heading):
+        """Remove and return the next vertex after ``vertex`` arriving with ``heading``"""
+        targets = outgoing[vertex]
+        index = 0
+        if len(targets) > 1 and heading is not None:
+            left = (vertex[0] + heading[1], vertex[1] - heading[0])
+            index = targets.index(left) if left in targets else 0
+        target = targets.pop(index)
+        if not targets:
+            del outgoing[vertex]
+        return target
+
+    loops = []
+    while outgoing:
+        start = next(iter(outgoing))
+        loop, vertex, heading = [start], start, None
+        while True:
+            target = take(vertex, heading)
+            heading = (target[0] - vertex[0], target[1] - vertex[1])
+            vertex = target
+            if vertex == start:
+                # Back at a shared corner: keep going if the left turn from here is still unvisited
+                left = (vertex[0] + heading[1], vertex[1] - heading[0])
+                if left not in outgoing.get(vertex, ()):
+                    break
+            loop.append(vertex)
+        loops.append(loop)
+    return loops
+
+
+def _simplify(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Douglas-Peucker simplification of an open polyline, keeping both end points"""
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        segment = points[last] - points[first]
+        offsets = points[first + 1:last] - points[first]
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            index = first + 1 + farthest
+            keep[index] = True
+            stack.extend(((first, index), (index, last)))
+    return points[keep]
+
+
+def mask_to_polygons(mask: np.ndarray, output_size: Optional[Tuple[int, int]] = None,
+                     tolerance: float = DEFAULT_POLYGON_TOLERANCE,
+                     min_area: float = DEFAULT_POLYGON_MIN_AREA) -> List[List[float]]:
+    """
+    Simplified outer contours of a binary mask as COCO-style polygons
+
+    Contours follow pixel boundaries and are simplified with Douglas-Peucker.
+    Holes and regions smaller than ``min_area`` are dropped. Run this on the
+    model-resolution mask and scale up: the full-size mask is its nearest
+    neighbour upsampling, so the contours are the same shape.
+
+    Args:
+        mask: [H, W] array, nonzero = pet
+        output_size: (width, height) to scale coordinates to (default: mask size)
+        tolerance: Maximum deviation of the simplified contour, in mask pixels
+        min_area: Smallest region area to keep, in mask pixels
+
+    Returns:
+        Polygons as flat [x1, y1, x2, y2, ...] lists, largest first
+    """
+    height, width = np.shape(mask)
+    scale = np.array([1.0, 1.0]) if output_size is None else \
+        np.array([output_size[0] / width, output_size[1] / height])
+
+    polygons = []
+    if not np.any(mask):
+        return polygons
+    for loop in _trace_loops(_boundary_edges(mask)):
+        points = np.array(loop, dtype=np.float64)
+        x, y = points[:, 0], points[:, 1]
+        area = 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+        if area < min_area:
+            continue
+        # Split the closed loop at the vertex farthest from its start and simplify both halves
+        split = int(np.argmax(np.hypot(x - x[0], y - y[0])))
+        closed = np.vstack([points, points[:1]])
+        simplified = np.vstack([_simplify(closed[:split + 1], tolerance)[:-1],
+                                _simplify(closed[split:], tolerance)[:-1]])
+        polygons.append((area, np.round(simplified * scale, 1).ravel().tolist()))
+
+    polygons.sort(key=lambda polygon: -polygon[0])
+    return [polygon for _, polygon in polygons]
@@ -0,0 +1,89 @@
+"""
+Zero-copy, memory-mapped loading of SafeTensors checkpoints
+Tensors are views over a file mapping, so processes loading the same file share one page-cache copy
+"""
+
+import json
+import mmap
+import struct
+from typing import Dict, Tuple
+
+import torch
+
+# SafeTensors dtype codes to torch dtypes
+SAFETENSORS_DTYPES = {
+    'F64': torch.float64,
+    'F32': torch.float32,
+    'F16': torch.float16,
+    'BF16': torch.bfloat16,
+    'I64': torch.int64,
+    'I32': torch.int32,
+    'I16': torch.int16,
+    'I8': torch.int8,
+    'U8': torch.uint8,
+    'BOOL': torch.bool,
+}
+
+HEADER_LENGTH_BYTES = 8
+
+
+def read_safetensors_header(path: str) -> Tuple[Dict, int]:
+    """
+    Read the JSON header of a SafeTensors file
+
+    Args:
+        path: Path to the .safetensors file
+
+    Returns:
+        Tuple of (header dict, byte offset where tensor data starts)
+    """
+    with open(path, 'rb') as f:
+        (header_size,) = struct.unpack('<Q', f.read(HEADER_LENGTH_BYTES))
+        header = json.loads(f.read(header_size))
+    return header, HEADER_LENGTH_BYTES + header_size
+
+
+def load_safetensors_mmap(path: str) -> Dict[str, torch.Tensor]:
+    """
+    Load a SafeTensors checkpoint as tensors backed by a memory mapping of the file
+
+    The file is mapped copy-on-write: nothing is ever written back to disk, and
+    pages stay shared in the page cache across processes until one of them writes
+    to a tensor. Inference never writes to weights, so N workers serving the same
+    checkpoint hold a single physical copy. Load into a module with
+    ``load_state_dict(..., assign=True)`` so the parameters become these views
+    instead of being copied into existing storage.
+
+    Args:
+        path: Path to the .safetensors file
+
+    Returns:
+        State dict whose tensors share memory with the mapping
+    """
+    header, data_start = read_safetensors_header(path)
+
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    state_dict = {}
+    for name, info in header.items():
+        if name == '__metadata__':
+            continue
+
+        dtype = SAFETENSORS_DTYPES.get(info['dtype'])
+        if dtype is None:
+            raise ValueError(f"Unsupported SafeTensors dtype {info['dtype']} for tensor {name}")
+
+        begin, end = info['data_offsets']
+        shape = info['shape']
+        numel = (end - begin) // torch.empty((), dtype=dtype).element_size()
+
+        if numel == 0:
+            state_dict[name] = torch.empty(shape, dtype=dtype)
+            continue
+
+        # torch.frombuffer keeps a reference to the mapping for the tensor's lifetime
+        tensor = torch.frombuffer(mapping, dtype=dtype, count=numel, offset=data_start + begin)
+        state_dict[name] = tensor.view(shape)
+
+    return state_dict
@@ -0,0 +1,171 @@
+"""
+Shared-backbone serving of several ResNet classifier heads
+Checkpoints whose backbone tensors hash identically are grouped so the backbone runs once per
+batch and every head runs on the same pooled features as one stacked matrix multiply
+"""
+
+import os
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from utils.mmap_weights import load_safetensors_mmap
+
+logger = logging.getLogger(__name__)
+
+HEAD_PREFIX = 'fc.'
+CHECKPOINT_MARKERS = ('.safetensors', '.pth')
+ARTIFACT_SUFFIXES = ('.json', '.pt', '.onnx')
+
+
+def find_head_checkpoints(models_dir: str, model_type: str = 'resnet') -> List[str]:
+    """
+    List checkpoints of a model type, including training snapshots such as
+    ``resnet_model_improved.safetensors.best`` and ``.epoch_5``
+
+    Quantized/exported artifacts and metadata files are skipped.
+    """
+    if not os.path.isdir(models_dir):
+        return []
+    return [
+        os.path.join(models_dir, filename) for filename in sorted(os.listdir(models_dir))
+        if model_type in filename.lower()
+        and any(marker in filename for marker in CHECKPOINT_MARKERS)
+        and not filename.endswith(ARTIFACT_SUFFIXES)
+    ]
+
+
+def resolve_checkpoint(path: str) -> str:
+    """
+    Fall back to a checkpoint's ``.best`` training snapshot when the checkpoint itself is absent
+
+    Returns ``path`` unchanged when it exists or has no snapshot, so callers keep
+    their own missing-file handling.
+    """
+    if not os.path.exists(path) and os.path.exists(f"{path}.best"):
+        return f"{path}.best"
+    return path
+
+
+def load_checkpoint(path: str, mmap_weights: bool = True) -> Dict[str, torch.Tensor]:
+    """Load a state dict, detecting SafeTensors from the name even with a snapshot suffix"""
+    if '.safetensors' in os.path.basename(path):
+        if mmap_weights:
+            return load_safetensors_mmap(path)
+        from safetensors.torch import load_file
+        return load_file(path)
+    return torch.load(path, map_location='cpu', mmap=mmap_weights)
+
+
+def split_state_dict(state_dict: Dict[str, torch.Tensor], head_prefix: str = HEAD_PREFIX):
+    """
+    Split a state dict into backbone and head entries
+
+    Returns:
+        Tuple of (backbone state dict, head state dict with ``head_prefix`` stripped)
+    """
+    backbone, head = OrderedDict(), OrderedDict()
+    for name, tensor in state_dict.items():
+        if name.startswith(head_prefix):
+            head[name[len(head_prefix):]] = tensor
+        else:
+            backbone[name] = tensor
+    return backbone, head
+
+
+def backbone_fingerprint(backbone: Dict[str, torch.Tensor]) -> str:
+    """
+    Hash of every backbone tensor's name, dtype, shape and bytes
+
+    BatchNorm running statistics are buffers in the state dict, so two checkpoints
+    only match if the backbones behave identically in eval mode.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for name in sorted(backbone):
+        tensor = backbone[name].detach().cpu().contiguous()
+        digest.update(f"{name}:{tensor.dtype}:{tuple(tensor.shape)}".encode())
+        digest.update(tensor.reshape(-1).view(torch.uint8).numpy().tobytes())
+    return digest.hexdigest()
+
+
+class StackedHeads(nn.Module):
+    """
+    Several ``Dropout -> Linear -> ReLU -> Dropout -> Linear`` heads evaluated together
+
+    The first layers of all heads are concatenated into one Linear, and the
+    second layers are applied with one batched matmul. Dropout is a no-op at
+    inference and is dropped.
+    """
+
+    def __init__(self, heads: List[Dict[str, torch.Tensor]]):
+        """
+        Args:
+            heads: Head state dicts (prefix stripped); each must hold exactly two Linear layers
+        """
+        super().__init__()
+        layers = [self._linear_layers(head) for head in heads]
+        self.num_heads = len(layers)
+        self.hidden = layers[0][0][0].shape[0]
+        if any(first[0].shape != layers[0][0][0].shape or second[0].shape != layers[0][1][0].shape
+               for first, second in layers):
+            raise ValueError('All heads must have the same layer shapes')
+
+        self.register_buffer('weight1', torch.cat([first[0] for first, _ in layers]))
+        self.register_buffer('bias1', torch.cat([first[1] for first, _ in layers]))
+        self.register_buffer('weight2', torch.stack([second[0].t() for _, second in layers]))
+        self.register_buffer('bias2', torch.stack([second[1] for _, second in layers]).unsqueeze(1))
+
+    @staticmethod
+    def _linear_layers(head: Dict[str, torch.Tensor]) -> List[Tuple[torch.Tensor, torch.Tensor]]:
+        """(weight, bias) of each Linear layer of a head, in module order"""
+        indices = sorted({int(name.split('.')[0]) for name in head if name.endswith('.weight')})
+        layers = [(head[f"{i}.weight"], head[f"{i}.bias"]) for i in indices]
+        if len(layers) != 2 or any(weight.dim() != 2 for weight, _ in layers):
+            raise ValueError('Expected a head with exactly two Linear layers')
+        return layers
+
+    def forward(self, features: torch.Tensor) -> torch.Tensor:
+        """
+        Args:
+            features: Pooled backbone features [N, in_features]
+
+        Returns:
+            Logits of every head [num_heads, N, num_classes]
+        """
+        hidden = F.relu(F.linear(features, self.weight1, self.bias1))
+        hidden = hidden.view(features.shape[0], self.num_heads, self.hidden).transpose(0, 1)
+        return torch.baddbmm(self.bias2, hidden, self.weight2)
+
+
+class MultiHeadResNet(nn.Module):
+    """One ResNet backbone (``fc`` replaced by Identity) feeding stacked classifier heads"""
+
+    def __init__(self, backbone: nn.Module, heads: StackedHeads):
+        super().__init__()
+        self.backbone = backbone
+        self.heads = heads
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        """Logits of every head [num_heads, N, num_classes]"""
+        return self.heads(self.backbone(x))
+
+
+def group_by_backbone(paths: List[str], mmap_weights: bool = True) -> 'OrderedDict[str, List[Tuple[str, Dict, Dict]]]':
+    """
+    Group checkpoints by backbone fingerprint
+
+    Returns:
+        Ordered dict of fingerprint to a list of (path, backbone state dict, head state dict)
+    """
+    groups = OrderedDict()
+    for path in paths:
+        backbone, head = split_state_dict(load_checkpoint(path, mmap_weights))
+        fingerprint = backbone_fingerprint(backbone)
+        groups.setdefault(fingerprint, []).append((path, backbone, head))
+        logger.info(f"{os.path.basename(path)}: backbone {fingerprint[:12]}")
+    return groups
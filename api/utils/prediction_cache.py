@@ -0,0 +1,225 @@
+"""
+Content-addressed prediction cache
+Maps (model identity, image content hash) to prediction results with an in-process LRU tier
+and an optional SQLite tier that survives restarts
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = int(os.getenv('PREDICTION_CACHE_SIZE', '4096'))
+DEFAULT_DB_PATH = os.getenv('PREDICTION_CACHE_DB') or None
+# Seconds to wait for another worker's write lock on the shared SQLite file before giving up
+DEFAULT_DB_TIMEOUT = float(os.getenv('PREDICTION_CACHE_DB_TIMEOUT', '0.5'))
+FILE_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_image_bytes(data: bytes) -> str:
+    """Fast 128-bit content hash of encoded image bytes"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class PredictionCache:
+    """
+    Two-tier cache of prediction results keyed by image content and model identity
+
+    The model identity combines the model type, checkpoint path and a hash of the
+    checkpoint file. The file hash is recomputed whenever the file's size or mtime
+    changes, and entries recorded under the previous identity are purged, so a
+    replaced checkpoint never serves stale predictions.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, db_path: Optional[str] = DEFAULT_DB_PATH,
+                 db_timeout: float = DEFAULT_DB_TIMEOUT):
+        """
+        Args:
+            max_entries: Capacity of the in-process LRU tier
+            db_path: Optional SQLite file for the on-disk tier
+            db_timeout: Busy timeout for the on-disk tier, which every worker process shares
+        """
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._memory: 'OrderedDict[Tuple[str, str], Any]' = OrderedDict()
+        self._file_hashes: Dict[str, Tuple[int, int, str]] = {}
+        self._path_identities: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        # Per-checkpoint locks so a file is hashed once without blocking get/put on _lock
+        self._hash_locks: Dict[str, threading.Lock] = {}
+        self._db = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.db_errors = 0
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, timeout=db_timeout, check_same_thread=False)
+            # WAL lets workers read while another one writes
+            self._db_execute('PRAGMA journal_mode=WAL')
+            self._db_execute(
+                'CREATE TABLE IF NOT EXISTS predictions ('
+                'model TEXT NOT NULL, image TEXT NOT NULL, result TEXT NOT NULL, '
+                'PRIMARY KEY (model, image))', commit=True
+            )
+
+    def _db_execute(self, sql: str, params: tuple = (), commit: bool = False) -> Optional[sqlite3.Cursor]:
+        """
+        Run a statement on the on-disk tier (lock held)
+
+        A busy or locked database (another worker holding the write lock past the
+        timeout) is not worth failing a request over: the statement is skipped and
+        None returned, so lookups count as misses and writes are dropped.
+        """
+        try:
+            cursor = self._db.execute(sql, params)
+            if commit:
+                self._db.commit()
+            return cursor
+        except sqlite3.OperationalError as e:
+            self.db_errors += 1
+            if self._db.in_transaction:
+                self._db.rollback()
+            logger.warning(f"Skipped prediction cache database access: {e}")
+            return None
+
+    def _file_hash(self, path: str) -> str:
+        """
+        Hash a checkpoint file, reusing the last hash while size and mtime are unchanged
+
+        Called without _lock held: reading a large checkpoint only blocks other
+        callers hashing the same file, never cache lookups.
+        """
+        with self._lock:
+            hash_lock = self._hash_locks.setdefault(path, threading.Lock())
+        with hash_lock:
+            stat = os.stat(path)
+            cached = self._file_hashes.get(path)
+            if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+                return cached[2]
+
+            digest = hashlib.blake2b(digest_size=16)
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(FILE_HASH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            file_hash = digest.hexdigest()
+            self._file_hashes[path] = (stat.st_size, stat.st_mtime_ns, file_hash)
+            return file_hash
+
+    def model_identity(self, classifier: Any) -> Optional[str]:
+        """
+        Get the cache identity of a classifier
+
+        Returns None for classifiers without a checkpoint (their head is randomly
+        initialized per process) and for classifiers whose checkpoint file changed
+        after they first used the cache, so neither is ever cached.
+        """
+        model_path = getattr(classifier, 'model_path', None)
+        if not model_path or not os.path.exists(model_path):
+            return None
+
+        model_path = os.path.abspath(model_path)
+        identity = f"{classifier.model_type}:{model_path}:{self._file_hash(model_path)}"
+        with self._lock:
+            previous = self._path_identities.get(model_path)
+            if previous != identity:
+                self._path_identities[model_path] = identity
+                if previous is not None:
+                    self._invalidate(previous)
+                elif self._db is not None:
+                    # First sighting in this process: drop rows left by an older checkpoint file
+                    prefix = f"{classifier.model_type}:{model_path}:"
+                    self._db_execute(
+                        'DELETE FROM predictions WHERE substr(model, 1, ?) = ? AND model != ?',
+                        (len(prefix), prefix, identity), commit=True
+                    )
+
+            # A classifier keeps serving the weights it loaded; once its file changes
+            # underneath it, its predictions no longer match any identity
+            loaded_identity = getattr(classifier, '_prediction_cache_identity', None)
+            if loaded_identity is None:
+                classifier._prediction_cache_identity = identity
+            elif loaded_identity != identity:
+                return None
+        return identity
+
+    def _invalidate(self, identity: str):
+        """Drop every entry recorded for a model identity (lock held)"""
+        for key in [key for key in self._memory if key[0] == identity]:
+            del self._memory[key]
+        if self._db is not None:
+            self._db_execute('DELETE FROM predictions WHERE model = ?', (identity,), commit=True)
+        self.invalidations += 1
+        logger.info(f"Invalidated cached predictions for {identity}")
+
+    def get(self, identity: Optional[str], image_hash: str) -> Optional[Any]:
+        """Look up a cached prediction, promoting disk hits into memory"""
+        if identity is None:
+            return None
+
+        key = (identity, image_hash)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+            if self._db is not None:
+                cursor = self._db_execute('SELECT result FROM predictions WHERE model = ? AND image = ?', key)
+                row = cursor.fetchone() if cursor is not None else None
+                if row is not None:
+                    result = json.loads(row[0])
+                    self._store_memory(key, result)
+                    self.disk_hits += 1
+                    return result
+
+            self.misses += 1
+            return None
+
+    def put(self, identity: Optional[str], image_hash: str, result: Any):
+        """Record a prediction in both tiers"""
+        if identity is None:
+            return
+
+        key = (identity, image_hash)
+        with self._lock:
+            self._store_memory(key, result)
+            if self._db is not None:
+                self._db_execute(
+                    'INSERT OR REPLACE INTO predictions (model, image, result) VALUES (?, ?, ?)',
+                    (identity, image_hash, json.dumps(result)), commit=True
+                )
+
+    def _store_memory(self, key: Tuple[str, str], result: Any):
+        """Insert into the LRU tier, evicting the oldest entry when full (lock held)"""
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            disk_entries = None
+            if self._db is not None:
+                cursor = self._db_execute('SELECT COUNT(*) FROM predictions')
+                disk_entries = cursor.fetchone()[0] if cursor is not None else None
+            return {
+                'memory_entries': len(self._memory),
+                'max_memory_entries': self.max_entries,
+                'disk_entries': disk_entries,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'db_errors': self.db_errors,
+                'hit_rate': round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
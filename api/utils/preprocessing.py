@@ -0,0 +1,140 @@
+"""
+Batched tensor preprocessing for Pet Detective classifiers
+Resizes uint8 image batches with one interpolate call and normalizes them with a fused multiply-add
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+
+def decode_rgb_image(image: Image.Image, draft_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """
+    Decode a lazily opened image as RGB, at reduced resolution for large JPEGs
+
+    For JPEGs, PIL's ``draft`` makes libjpeg apply DCT scaling while decoding. It
+    picks the smallest 1/2, 1/4 or 1/8 scale whose output is still at least
+    ``draft_size`` in both dimensions, so a 4000x3000 photo decodes as 500x375
+    for a 224x224 model input instead of 12 megapixels. Other formats, and images
+    already loaded, are decoded as usual.
+
+    Args:
+        image: Image from ``Image.open`` that has not been loaded yet
+        draft_size: Smallest (width, height) the decoded image may have, or None for full size
+
+    Returns:
+        RGB PIL image
+    """
+    if draft_size is not None:
+        image.draft('RGB', draft_size)
+    return image.convert('RGB')
+
+
+def resize_pyramid(image: Image.Image, sizes: Sequence[Tuple[int, int]]) -> Dict[Tuple[int, int], Image.Image]:
+    """
+    Resize an image to several model input sizes, touching the full-size image once
+
+    The largest size is resized from ``image``; each smaller size is resized from
+    the previous level, so a 12-megapixel photo is read once instead of once per
+    model.
+
+    Args:
+        image: RGB PIL image
+        sizes: Output (height, width) sizes, e.g. the UNet and classifier inputs
+
+    Returns:
+        Dict of (height, width) -> RGB PIL image
+    """
+    levels = {}
+    source = image
+    for size in sorted(set(map(tuple, sizes)), key=lambda size: size[0] * size[1], reverse=True):
+        target = (size[1], size[0])
+        source = source if source.size == target else source.resize(target, Image.BILINEAR)
+        levels[size] = source
+    return levels
+
+
+def image_to_array(image: Image.Image) -> np.ndarray:
+    """
+    Convert a PIL image to an HWC uint8 array, converting to RGB if needed
+
+    Args:
+        image: PIL image
+
+    Returns:
+        uint8 array of shape [H, W, 3]
+    """
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return np.asarray(image)
+
+
+class BatchPreprocessor:
+    """
+    Resize + ToTensor + Normalize for a whole batch of images
+
+    Images are kept as uint8 until the last step. Images of the same size are
+    stacked as one NHWC array and resized together with an antialiased bilinear
+    ``interpolate`` (matching PIL's Resize to within one intensity level); viewed
+    as channels_last NCHW, this hits interpolate's vectorized uint8 kernels.
+    ``(x / 255 - mean) / std`` is then applied as a single ``addcmul`` written
+    straight into a preallocated float buffer.
+
+    The buffer is reused per thread: the returned batch is only valid until the
+    same thread calls the preprocessor again, so clone it to keep it longer.
+    """
+
+    def __init__(self, size: Tuple[int, int], mean: Sequence[float], std: Sequence[float],
+                 channels_last: bool = False):
+        """
+        Args:
+            size: Output (height, width)
+            mean: Per-channel normalization mean (0-1 scale)
+            std: Per-channel normalization std (0-1 scale)
+            channels_last: Allocate the output buffer in channels_last layout
+        """
+        self.size = tuple(size)
+        std = torch.tensor(std, dtype=torch.float32).view(3, 1, 1)
+        self.scale = 1.0 / (255.0 * std)
+        self.shift = -torch.tensor(mean, dtype=torch.float32).view(3, 1, 1) / std
+        self.memory_format = torch.channels_last if channels_last else torch.contiguous_format
+        self._local = threading.local()
+
+    def _buffer(self, batch_size: int) -> torch.Tensor:
+        """This thread's output buffer, grown to at least ``batch_size``"""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None or buffer.shape[0] < batch_size:
+            buffer = torch.empty((batch_size, 3, *self.size), memory_format=self.memory_format)
+            self._local.buffer = buffer
+        return buffer[:batch_size]
+
+    def __call__(self, images: List[Image.Image]) -> torch.Tensor:
+        """
+        Preprocess images into a normalized float batch
+
+        Args:
+            images: PIL images of any size
+
+        Returns:
+            Float tensor of shape [N, 3, height, width] (a view of the reused buffer)
+        """
+        arrays = [image_to_array(image) for image in images]
+        output = self._buffer(len(arrays))
+
+        groups = defaultdict(list)
+        for index, array in enumerate(arrays):
+            groups[array.shape[:2]].append(index)
+
+        for shape, indices in groups.items():
+            batch = torch.from_numpy(np.stack([arrays[index] for index in indices])).permute(0, 3, 1, 2)
+            if shape != self.size:
+                batch = F.interpolate(batch, size=self.size, mode='bilinear', antialias=True, align_corners=False)
+            for row, index in enumerate(indices):
+                torch.addcmul(self.shift, batch[row], self.scale, out=output[index])
+
+        return output
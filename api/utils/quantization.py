@@ -0,0 +1,129 @@
+"""
+Int8 quantized inference variants for Pet Detective classifiers
+Dynamic quantization of the Linear heads and static post-training quantization of the conv backbones
+"""
+
+import io
+import copy
+import platform
+import warnings
+import logging
+from typing import Iterable, Optional
+
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+PRECISION_FP32 = 'fp32'
+PRECISION_INT8_DYNAMIC = 'int8_dynamic'
+PRECISION_INT8_STATIC = 'int8_static'
+PRECISIONS = (PRECISION_FP32, PRECISION_INT8_DYNAMIC, PRECISION_INT8_STATIC)
+
+# Module holding the classification head of each architecture
+HEAD_MODULES = {'resnet': 'fc', 'alexnet': 'classifier', 'mobilenet': 'classifier'}
+
+
+def quantized_engine() -> str:
+    """Quantized kernel backend for this machine: x86 (fbgemm/onednn) or qnnpack on ARM"""
+    engines = torch.backends.quantized.supported_engines
+    if platform.machine().lower() in ('arm64', 'aarch64') and 'qnnpack' in engines:
+        return 'qnnpack'
+    return 'x86' if 'x86' in engines else 'fbgemm'
+
+
+def quantized_model_path(model_path: str, precision: str) -> str:
+    """
+    Path of the quantized artifact stored next to a checkpoint
+
+    e.g. models/resnet_model.safetensors -> models/resnet_model.safetensors.int8_static.pt.
+    The full file name is kept so model.pth and model.safetensors never share an artifact.
+    """
+    return f"{model_path}.{precision}.pt"
+
+
+def quantize_dynamic_model(model: nn.Module) -> nn.Module:
+    """
+    Quantize the weights of every nn.Linear to int8; activations are quantized on the fly
+
+    Args:
+        model: fp32 model in eval mode (left unchanged)
+
+    Returns:
+        Quantized copy of the model
+    """
+    torch.backends.quantized.engine = quantized_engine()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', (DeprecationWarning, FutureWarning))
+        return torch.ao.quantization.quantize_dynamic(copy.deepcopy(model).eval(), {nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_static_model(model: nn.Module, model_type: str, calibration_batches: Iterable[torch.Tensor]) -> nn.Module:
+    """
+    Post-training static quantization of the conv backbone, dynamic quantization of the head
+
+    Conv/BN/ReLU blocks are fused and their activation ranges are observed over the
+    calibration batches. The Linear head keeps dynamic quantization since its input
+    range varies too much per image to calibrate well on a small sample.
+
+    Args:
+        model: fp32 model in eval mode (left unchanged)
+        model_type: Architecture name, used to locate the head
+        calibration_batches: Preprocessed image batches representative of real traffic
+
+    Returns:
+        Quantized copy of the model
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping, default_dynamic_qconfig
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    engine = quantized_engine()
+    torch.backends.quantized.engine = engine
+    qconfig_mapping = get_default_qconfig_mapping(engine).set_module_name(
+        HEAD_MODULES[model_type], default_dynamic_qconfig
+    )
+
+    batches = iter(calibration_batches)
+    first_batch = next(batches, None)
+    if first_batch is None:
+        raise ValueError("Static quantization needs at least one calibration batch")
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', (DeprecationWarning, FutureWarning))
+        prepared = prepare_fx(copy.deepcopy(model).eval(), qconfig_mapping, (first_batch[:1],))
+        with torch.no_grad():
+            prepared(first_batch)
+            for batch in batches:
+                prepared(batch)
+        return convert_fx(prepared)
+
+
+def save_quantized_model(model: nn.Module, path: str, example_input: torch.Tensor):
+    """Trace, freeze and save a quantized model as TorchScript so it loads without re-quantizing"""
+    with torch.no_grad():
+        traced = torch.jit.freeze(torch.jit.trace(model, example_input).eval())
+    torch.jit.save(traced, path)
+    logger.info(f"Saved quantized model to: {path}")
+
+
+def load_quantized_model(path: str) -> torch.jit.ScriptModule:
+    """Load a quantized TorchScript model written by ``save_quantized_model``"""
+    torch.backends.quantized.engine = quantized_engine()
+    model = torch.jit.load(path, map_location='cpu')
+    model.eval()
+    return model
+
+
+def model_size_bytes(model: nn.Module) -> Optional[int]:
+    """Serialized size of a model's weights, or None if it cannot be measured"""
+    if hasattr(model, 'size_bytes'):
+        return model.size_bytes
+    buffer = io.BytesIO()
+    try:
+        if isinstance(model, torch.jit.ScriptModule):
+            torch.jit.save(model, buffer)
+        else:
+            torch.save(model.state_dict(), buffer)
+    except Exception:
+        return None
+    return buffer.tell()
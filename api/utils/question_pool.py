@@ -0,0 +1,158 @@
+"""
+Pre-generated game question pool
+Keeps a ring buffer of ready-made questions per (model id, game mode) topped up by a background thread
+"""
+
+import os
+import time
+import threading
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = int(os.getenv('QUESTION_POOL_SIZE', '32'))
+DEFAULT_LOW_WATERMARK = int(os.getenv('QUESTION_POOL_LOW_WATERMARK', '8'))
+DEFAULT_IDLE_TIMEOUT = float(os.getenv('QUESTION_POOL_IDLE_TIMEOUT', '600'))
+
+QuestionGenerator = Callable[[], Dict[str, Any]]
+
+
+class _Pool:
+    """Ring buffer and counters for one (model id, game mode) key"""
+
+    def __init__(self, size: int, generator: QuestionGenerator):
+        self.questions: Deque[Dict[str, Any]] = deque(maxlen=size)
+        self.generator = generator
+        self.last_used = time.monotonic()
+        self.pops = 0
+        self.underruns = 0
+        self.generated = 0
+        self.errors = 0
+
+
+class QuestionPool:
+    """
+    Ring buffers of ready-made game questions with background refill
+
+    ``pop`` serves a pooled question when one is available and falls back to
+    generating synchronously on an underrun. Whenever a buffer drops below the
+    low watermark, the refill thread tops it up to ``pool_size``. Keys not used
+    for ``idle_timeout`` seconds are dropped. Generators are held for that long,
+    so they should not capture loaded models: pass one that needs only cheap
+    state, such as a model id, so the classifier pool's byte budget stays in
+    charge of what is loaded.
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, low_watermark: int = DEFAULT_LOW_WATERMARK,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        """
+        Args:
+            pool_size: Ring buffer capacity per key
+            low_watermark: Refill is triggered when a buffer holds fewer questions than this
+            idle_timeout: Seconds after the last pop before a key is dropped
+        """
+        self.pool_size = max(pool_size, 1)
+        self.low_watermark = min(max(low_watermark, 1), self.pool_size)
+        self.idle_timeout = idle_timeout
+        self._pools: Dict[Hashable, _Pool] = {}
+        self._lock = threading.Lock()
+        self._refill_needed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def pop(self, key: Hashable, generator: QuestionGenerator) -> Dict[str, Any]:
+        """
+        Get a ready-made question for a key
+
+        Args:
+            key: Pool key, e.g. (model_id, game_mode)
+            generator: Callable producing a fresh question for this key
+
+        Returns:
+            Question dictionary
+        """
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = _Pool(self.pool_size, generator)
+            pool.generator = generator
+            pool.last_used = time.monotonic()
+            pool.pops += 1
+            question = pool.questions.popleft() if pool.questions else None
+            if question is None:
+                pool.underruns += 1
+            if len(pool.questions) < self.low_watermark:
+                self._ensure_refill_thread()
+                self._refill_needed.set()
+
+        if question is None:
+            question = generator()
+        return question
+
+    def _ensure_refill_thread(self):
+        """Start the refill thread on first use (lock held)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._refill_loop, name='question-pool-refill', daemon=True)
+            self._thread.start()
+
+    def _refill_loop(self):
+        """Top up every buffer below the watermark whenever a refill is requested"""
+        while True:
+            self._refill_needed.wait()
+            self._refill_needed.clear()
+            self._expire_idle()
+
+            with self._lock:
+                pending = [(key, pool) for key, pool in self._pools.items()
+                           if len(pool.questions) < self.low_watermark]
+
+            for key, pool in pending:
+                self._refill(key, pool)
+
+    def _refill(self, key: Hashable, pool: _Pool):
+        """Generate questions for one key until its buffer is full"""
+        while len(pool.questions) < self.pool_size:
+            try:
+                question = pool.generator()
+            except Exception as e:
+                pool.errors += 1
+                logger.warning(f"Question pool refill failed for {key}: {e}")
+                return
+
+            # Error responses are returned to callers directly, never pooled
+            if not isinstance(question, dict) or 'error' in question:
+                pool.errors += 1
+                return
+
+            with self._lock:
+                pool.questions.append(question)
+                pool.generated += 1
+
+    def _expire_idle(self):
+        """Drop keys that have not been used for idle_timeout seconds"""
+        now = time.monotonic()
+        with self._lock:
+            for key in [key for key, pool in self._pools.items() if now - pool.last_used > self.idle_timeout]:
+                del self._pools[key]
+                logger.info(f"Dropped idle question pool {key}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get buffer levels and underrun counters per key"""
+        with self._lock:
+            per_key = {}
+            for key, pool in self._pools.items():
+                name = '/'.join(str(part) for part in key) if isinstance(key, tuple) else str(key)
+                per_key[name] = {
+                    'available': len(pool.questions),
+                    'pops': pool.pops,
+                    'underruns': pool.underruns,
+                    'underrun_rate': round(pool.underruns / pool.pops, 4) if pool.pops else 0.0,
+                    'generated': pool.generated,
+                    'errors': pool.errors
+                }
+            return {
+                'pool_size': self.pool_size,
+                'low_watermark': self.low_watermark,
+                'pools': per_key
+            }
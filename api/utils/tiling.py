@@ -0,0 +1,41 @@
+"""
+Overlapping tile layout and blending weights for sliding-window inference
+Tiles cover an image on a regular grid (the last row/column flush with the edge), and each
+tile's output is weighted by a window that fades out across the overlap before averaging
+"""
+
+from typing import List
+
+import torch
+
+
+def tile_positions(length: int, tile_size: int, overlap: int) -> List[int]:
+    """
+    Start offsets of tiles covering ``length`` pixels with at least ``overlap`` pixels shared
+
+    Args:
+        length: Image size along one axis (at least ``tile_size``)
+        tile_size: Tile size along that axis
+        overlap: Minimum overlap between neighbouring tiles
+
+    Returns:
+        Sorted start offsets; the last tile ends exactly at ``length``
+    """
+    if length <= tile_size:
+        return [0]
+    stride = tile_size - overlap
+    positions = list(range(0, length - tile_size, stride))
+    positions.append(length - tile_size)
+    return positions
+
+
+def blend_window(tile_size: int, overlap: int) -> torch.Tensor:
+    """
+    [tile_size, tile_size] weights ramping linearly up over ``overlap`` pixels from each edge
+
+    Weights stay strictly positive so image borders, covered by a single tile,
+    keep that tile's output after normalizing by the summed weights.
+    """
+    ramp = torch.arange(tile_size, dtype=torch.float32).add_(0.5).div_(max(overlap, 1)).clamp_(max=1.0)
+    ramp = torch.minimum(ramp, ramp.flip(0))
+    return torch.outer(ramp, ramp)
@@ -0,0 +1,154 @@
+"""
+In-memory upload handling for Pet Detective API
+Keeps uploaded images in bounded memory buffers instead of temporary files
+"""
+
+import io
+import tarfile
+from typing import IO, Iterator, NamedTuple, Optional
+
+from flask import Request
+from werkzeug.datastructures import FileStorage
+from werkzeug.sansio.multipart import Data, Epilogue, File, MultipartDecoder, NeedData
+
+from utils.error_handler import ValidationError
+from utils.validation import APIValidator
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class UploadItem(NamedTuple):
+    """One file extracted from a streamed batch upload"""
+    filename: str
+    data: Optional[bytes]
+    error: Optional[str] = None
+
+
+class BoundedBytesIO(io.BytesIO):
+    """BytesIO that refuses writes past a maximum size"""
+
+    def __init__(self, max_size: int):
+        super().__init__()
+        self.max_size = max_size
+
+    def write(self, data) -> int:
+        if self.tell() + len(data) > self.max_size:
+            raise ValidationError(f"File too large. Maximum size: {self.max_size // (1024 * 1024)}MB")
+        return super().write(data)
+
+
+class InMemoryRequest(Request):
+    """
+    Flask request that parses multipart uploads into bounded memory buffers
+
+    The default Werkzeug stream factory spools uploads over 500KB to a temporary
+    file. Image uploads are small enough to keep in memory, and the size limit is
+    enforced while the request body is being read rather than after it is stored.
+    """
+
+    max_upload_size = APIValidator.MAX_IMAGE_SIZE
+
+    def _get_file_stream(self, total_content_length: Optional[int], content_type: Optional[str],
+                         filename: Optional[str] = None, content_length: Optional[int] = None) -> IO[bytes]:
+        if content_length is not None and content_length > self.max_upload_size:
+            raise ValidationError(f"File too large. Maximum size: {self.max_upload_size // (1024 * 1024)}MB")
+        return BoundedBytesIO(self.max_upload_size)
+
+
+def read_upload_bytes(file: FileStorage, max_size: int = APIValidator.MAX_IMAGE_SIZE) -> bytes:
+    """
+    Read an uploaded file into memory, enforcing the size limit during the read
+
+    Args:
+        file: Uploaded file from request.files
+        max_size: Maximum number of bytes accepted
+
+    Returns:
+        File content
+    """
+    stream = file.stream
+    if isinstance(stream, io.BytesIO):
+        content = stream.getvalue()
+        if len(content) > max_size:
+            raise ValidationError(f"File too large. Maximum size: {max_size // (1024 * 1024)}MB")
+        return content
+
+    buffer = BoundedBytesIO(max_size)
+    while True:
+        chunk = stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer.write(chunk)
+    return buffer.getvalue()
+
+
+def iter_multipart_files(stream: IO[bytes], boundary: str,
+                         max_size: int = APIValidator.MAX_IMAGE_SIZE) -> Iterator[UploadItem]:
+    """
+    Incrementally parse a multipart/form-data body, yielding each file part as it completes
+
+    Only one file is held in memory at a time, however many parts the body contains.
+    Non-file fields are skipped; oversized files are reported as errors and skipped.
+
+    Args:
+        stream: Raw request body stream
+        boundary: Multipart boundary from the Content-Type header
+        max_size: Maximum number of bytes per file
+    """
+    decoder = MultipartDecoder(boundary.encode('latin-1'))
+    filename, buffer, oversized, at_eof = None, None, False, False
+
+    while True:
+        try:
+            event = decoder.next_event()
+        except ValueError as e:
+            raise ValidationError(f'Invalid multipart body: {e}')
+
+        if isinstance(event, NeedData):
+            if at_eof:
+                raise ValidationError('Truncated multipart body')
+            chunk = stream.read(READ_CHUNK_SIZE)
+            at_eof = not chunk
+            decoder.receive_data(chunk or None)
+            continue
+
+        if isinstance(event, File):
+            filename, buffer, oversized = event.filename or event.name, BoundedBytesIO(max_size), False
+        elif isinstance(event, Data):
+            if buffer is not None and not oversized:
+                try:
+                    buffer.write(event.data)
+                except ValidationError as e:
+                    oversized = True
+                    yield UploadItem(filename, None, e.message)
+            if not event.more_data:
+                if buffer is not None and not oversized:
+                    yield UploadItem(filename, buffer.getvalue())
+                filename, buffer = None, None
+        elif isinstance(event, Epilogue):
+            return
+        else:
+            # Preamble or a non-file field
+            filename, buffer = None, None
+
+
+def iter_tar_files(stream: IO[bytes], max_size: int = APIValidator.MAX_IMAGE_SIZE) -> Iterator[UploadItem]:
+    """
+    Read a (optionally compressed) tar stream sequentially, yielding each regular file
+
+    Args:
+        stream: Raw request body stream
+        max_size: Maximum number of bytes per file
+    """
+    try:
+        with tarfile.open(fileobj=stream, mode='r|*') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                if member.size > max_size:
+                    yield UploadItem(member.name, None,
+                                     f"File too large. Maximum size: {max_size // (1024 * 1024)}MB")
+                    continue
+                yield UploadItem(member.name, archive.extractfile(member).read())
+    except tarfile.TarError as e:
+        raise ValidationError(f'Invalid tar stream: {e}')
@@ -37,6 +37,10 @@ class APIValidator:
     # Allowed model types and modes
     ALLOWED_MODEL_TYPES = ['resnet', 'alexnet', 'mobilenet']
     ALLOWED_GAME_MODES = ['easy', 'medium', 'hard']
+    ALLOWED_PRECISIONS = ['fp32', 'int8_dynamic', 'int8_static']
+    ALLOWED_MASK_FORMATS = ['png1', 'png', 'rle', 'polygon']
+    ALLOWED_CUTOUT_FORMATS = ['jpeg', 'webp', 'png', 'none']
+    ALLOWED_SEGMENTATION_MODES = ['resize', 'tiled']
     ALLOWED_ANIMAL_TYPES = ['dog', 'cat', None]
     
     # Regex patterns
@@ -109,44 +113,50 @@ class APIValidator:
         file_content = file.read()
         file.seek(0)  # Reset file pointer
         
+        APIValidator.validate_image_bytes(file_content, filename)
+        
+        return filename, file_content
+    
+    @staticmethod
+    def detect_image_type(content: bytes) -> Optional[str]:
+        """Detect image MIME type from magic numbers at the start of a buffer"""
+        for mime_type, magic_numbers in APIValidator.ALLOWED_IMAGE_TYPES.items():
+            for magic_num in magic_numbers:
+                if content.startswith(magic_num):
+                    return mime_type
+        return None
+    
+    @staticmethod
+    def validate_image_bytes(content: bytes, filename: Optional[str] = None) -> str:
+        """Validate an in-memory image buffer and return its detected MIME type"""
         # Check file size
-        if len(file_content) == 0:
+        if len(content) == 0:
             raise ValidationError("Empty file")
         
-        if len(file_content) > APIValidator.MAX_IMAGE_SIZE:
+        if len(content) > APIValidator.MAX_IMAGE_SIZE:
             raise ValidationError(f"File too large (max {APIValidator.MAX_IMAGE_SIZE // 1024 // 1024}MB)")
         
         # Validate file type by magic numbers
-        is_valid_image = False
-        detected_type = None
-        
-        for mime_type, magic_numbers in APIValidator.ALLOWED_IMAGE_TYPES.items():
-            for magic_num in magic_numbers:
-                if file_content.startswith(magic_num):
-                    is_valid_image = True
-                    detected_type = mime_type
-                    break
-            if is_valid_image:
-                break
-        
-        if not is_valid_image:
+        detected_type = APIValidator.detect_image_type(content)
+        if detected_type is None:
             raise ValidationError("Invalid image file format")
         
         # Additional security check - ensure file extension matches content
-        file_ext = filename.lower().split('.')[-1] if '.' in filename else ''
-        expected_extensions = {
-            'image/jpeg': ['jpg', 'jpeg'],
-            'image/png': ['png'],
-            'image/webp': ['webp'],
-            'image/bmp': ['bmp'],
-            'image/gif': ['gif']
-        }
-        
-        if detected_type in expected_extensions:
-            if file_ext not in expected_extensions[detected_type]:
-                raise ValidationError(f"File extension doesn't match content type")
-        
-        return filename, file_content
+        if filename:
+            file_ext = filename.lower().split('.')[-1] if '.' in filename else ''
+            expected_extensions = {
+                'image/jpeg': ['jpg', 'jpeg'],
+                'image/png': ['png'],
+                'image/webp': ['webp'],
+                'image/bmp': ['bmp'],
+                'image/gif': ['gif']
+            }
+            
+            if detected_type in expected_extensions:
+                if file_ext not in expected_extensions[detected_type]:
+                    raise ValidationError(f"File extension doesn't match content type")
+        
+        return detected_type
     
     @staticmethod
     def validate_model_type(model_type: str) -> str:
@@ -160,6 +170,73 @@ class APIValidator:
         
         return model_type
     
+    @staticmethod
+    def validate_precision(precision: str) -> str:
+        """Validate inference precision"""
+        if not isinstance(precision, str):
+            raise ValidationError("Precision must be a string")
+        
+        precision = precision.lower().strip()
+        if precision not in APIValidator.ALLOWED_PRECISIONS:
+            raise ValidationError(f"Invalid precision. Allowed: {', '.join(APIValidator.ALLOWED_PRECISIONS)}")
+        
+        return precision
+    
+    @staticmethod
+    def validate_mask_format(mask_format: str) -> str:
+        """Validate segmentation mask encoding"""
+        if not isinstance(mask_format, str):
+            raise ValidationError("Mask format must be a string", "mask_format")
+        
+        mask_format = mask_format.lower().strip()
+        if mask_format not in APIValidator.ALLOWED_MASK_FORMATS:
+            raise ValidationError(
+                f"Invalid mask format. Allowed: {', '.join(APIValidator.ALLOWED_MASK_FORMATS)}", "mask_format"
+            )
+        
+        return mask_format
+    
+    @staticmethod
+    def validate_cutout_format(cutout_format: str) -> str:
+        """Validate segmentation cutout encoding"""
+        if not isinstance(cutout_format, str):
+            raise ValidationError("Cutout format must be a string", "cutout_format")
+        
+        cutout_format = cutout_format.lower().strip()
+        if cutout_format not in APIValidator.ALLOWED_CUTOUT_FORMATS:
+            raise ValidationError(
+                f"Invalid cutout format. Allowed: {', '.join(APIValidator.ALLOWED_CUTOUT_FORMATS)}", "cutout_format"
+            )
+        
+        return cutout_format
+    
+    @staticmethod
+    def validate_segmentation_mode(mode: str) -> str:
+        """Validate segmentation inference mode"""
+        if not isinstance(mode, str):
+            raise ValidationError("Segmentation mode must be a string", "mode")
+        
+        mode = mode.lower().strip()
+        if mode not in APIValidator.ALLOWED_SEGMENTATION_MODES:
+            raise ValidationError(
+                f"Invalid segmentation mode. Allowed: {', '.join(APIValidator.ALLOWED_SEGMENTATION_MODES)}", "mode"
+            )
+        
+        return mode
+    
+    @staticmethod
+    def validate_quality(quality: Any) -> int:
+        """Validate JPEG/WebP quality (1-100)"""
+        try:
+            quality = int(quality)
+        except (TypeError, ValueError):
+            raise ValidationError("Quality must be an integer", "quality")
+        
+        if not 1 <= quality <= 100:
+            raise ValidationError("Quality must be between 1 and 100", "quality")
+        
+        return quality
+    
     @staticmethod
     def validate_game_mode(game_mode: str) -> str:
         """Validate game mode"""
@@ -72,7 +72,9 @@ export default function ImageSegmentation() {
 
     const link = document.createElement('a')
     link.href = type === 'segmented' ? segmentationResult.segmentedImage : segmentationResult.maskImage
-    link.download = `pet_segmentation_${type}_${Date.now()}.png`
+    // Data URLs are "data:image/<format>;base64,..." (the cutout defaults to JPEG)
+    const extension = link.href.slice('data:image/'.length, link.href.indexOf(';')).replace('jpeg', 'jpg')
+    link.download = `pet_segmentation_${type}_${Date.now()}.${extension}`
     document.body.appendChild(link)
     link.click()
     document.body.removeChild(link)
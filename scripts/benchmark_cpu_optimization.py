@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark the CPU-optimized execution mode against the default NCHW models
+
+Runs the ResNet-50 classifier and the segmentation UNet with and without
+BatchNorm folding + channels_last layout at several batch sizes, and reports
+throughput (images/s), the speedup, and the largest output difference.
+"""
+
+import os
+import sys
+import copy
+import time
+import argparse
+
+import torch
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api')
+sys.path.insert(0, API_DIR)
+
+from pet_classifier import PetClassifier, IMAGE_SIZE  # noqa: E402
+from pet_segmentation import PetSegmentation, SEGMENTATION_SIZE  # noqa: E402
+from utils.cpu_optimization import optimize_for_cpu, to_channels_last  # noqa: E402
+
+
+def measure_throughput(model, batch: torch.Tensor, runs: int, warmup: int = 2) -> float:
+    """Images per second over ``runs`` forward passes"""
+    with torch.no_grad():
+        for _ in range(warmup):
+            model(batch)
+        start = time.perf_counter()
+        for _ in range(runs):
+            model(batch)
+        elapsed = time.perf_counter() - start
+    return batch.shape[0] * runs / elapsed
+
+
+def benchmark(name: str, default_model, optimized_model, image_size, batch_sizes, runs: int):
+    """Print a throughput comparison for one model"""
+    print(f"\n{name}")
+    print(f"{'batch':>6}{'default img/s':>15}{'optimized img/s':>17}{'speedup':>9}{'max |diff|':>12}")
+    for batch_size in batch_sizes:
+        batch = torch.randn(batch_size, 3, *image_size)
+        optimized_batch = to_channels_last(batch)
+
+        with torch.no_grad():
+            diff = (default_model(batch) - optimized_model(optimized_batch)).abs().max().item()
+        default_rate = measure_throughput(default_model, batch, runs)
+        optimized_rate = measure_throughput(optimized_model, optimized_batch, runs)
+        print(f"{batch_size:>6}{default_rate:>15.1f}{optimized_rate:>17.1f}"
+              f"{optimized_rate / default_rate:>8.2f}x{diff:>12.2e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--classifier-path', help='ResNet checkpoint (default: ImageNet backbone)')
+    parser.add_argument('--segmentation-path', help='UNet checkpoint (default: random weights)')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--runs', type=int, default=10, help='Timed forward passes per batch size')
+    parser.add_argument('--threads', type=int, help='torch intra-op threads')
+    parser.add_argument('--skip-segmentation', action='store_true')
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    print(f"torch {torch.__version__}, {torch.get_num_threads()} threads, "
+          f"oneDNN {'enabled' if torch.backends.mkldnn.is_available() else 'unavailable'}")
+
+    # Optimize a copy of the same model so outputs are comparable without a checkpoint
+    classifier = PetClassifier(model_type='resnet', model_path=args.classifier_path)
+    benchmark('ResNet-50 classifier', classifier.model, optimize_for_cpu(copy.deepcopy(classifier.model)),
+              IMAGE_SIZE, args.batch_sizes, args.runs)
+
+    if not args.skip_segmentation:
+        segmentation = PetSegmentation(args.segmentation_path)
+        benchmark('UNet segmentation', segmentation.model, optimize_for_cpu(copy.deepcopy(segmentation.model)),
+                  SEGMENTATION_SIZE, args.batch_sizes, args.runs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark JPEG draft-mode (DCT-scaled) decoding against full-resolution decoding
+
+For every JPEG in the dataset, decodes the file from memory once at full
+resolution and once with PIL draft mode for the classifier (224x224) and UNet
+(256x256) input sizes. Each path is then resized to the model input. Reports
+decode time, decoded megapixels, and the mean pixel difference of the resized
+results.
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+from PIL import Image
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api')
+sys.path.insert(0, API_DIR)
+
+from pet_classifier import IMAGE_SIZE  # noqa: E402
+from pet_segmentation import SEGMENTATION_SIZE  # noqa: E402
+from utils.preprocessing import decode_rgb_image  # noqa: E402
+
+DEFAULT_IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'oxford-iiit-pet', 'images')
+
+
+def timed_decode(data: bytes, draft_size=None):
+    """Decode JPEG bytes as RGB, returning (image, seconds)"""
+    start = time.perf_counter()
+    image = decode_rgb_image(Image.open(io.BytesIO(data)), draft_size)
+    return image, time.perf_counter() - start
+
+
+def benchmark(files, target_size):
+    """Compare full and draft decoding of every file for one target size"""
+    full_seconds, draft_seconds, full_pixels, draft_pixels, differences = 0.0, 0.0, 0, 0, []
+    for data in files:
+        full, seconds = timed_decode(data)
+        full_seconds += seconds
+        full_pixels += full.width * full.height
+
+        draft, seconds = timed_decode(data, target_size)
+        draft_seconds += seconds
+        draft_pixels += draft.width * draft.height
+
+        full_resized = np.asarray(full.resize(target_size, Image.BILINEAR), dtype=np.int16)
+        draft_resized = np.asarray(draft.resize(target_size, Image.BILINEAR), dtype=np.int16)
+        differences.append(np.abs(full_resized - draft_resized).mean())
+
+    count = len(files)
+    return {
+        'full_ms': full_seconds * 1000 / count,
+        'draft_ms': draft_seconds * 1000 / count,
+        'full_mp': full_pixels / count / 1e6,
+        'draft_mp': draft_pixels / count / 1e6,
+        'speedup': full_seconds / draft_seconds,
+        'mean_abs_diff': float(np.mean(differences))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--images-dir', default=DEFAULT_IMAGES_DIR)
+    parser.add_argument('--limit', type=int, help='Only use the first N JPEGs')
+    args = parser.parse_args()
+
+    names = sorted(f for f in os.listdir(args.images_dir) if f.lower().endswith(('.jpg', '.jpeg')))[:args.limit]
+    if not names:
+        raise SystemExit(f"No JPEGs found in {args.images_dir}")
+
+    # Read everything up front so disk I/O is not part of the timings
+    files = []
+    for name in names:
+        with open(os.path.join(args.images_dir, name), 'rb') as f:
+            files.append(f.read())
+    print(f"{len(files)} JPEGs, {sum(map(len, files)) / len(files) / 1024:.0f} KB average")
+
+    print(f"\n{'target':<22}{'full ms':>9}{'draft ms':>10}{'speedup':>9}{'full MP':>9}{'draft MP':>10}{'|diff|':>8}")
+    for label, size in (('classifier', IMAGE_SIZE), ('segmentation', SEGMENTATION_SIZE)):
+        result = benchmark(files, size)
+        print(f"{label + ' ' + 'x'.join(map(str, size)):<22}"
+              f"{result['full_ms']:>9.2f}{result['draft_ms']:>10.2f}{result['speedup']:>8.2f}x"
+              f"{result['full_mp']:>9.2f}{result['draft_mp']:>10.3f}{result['mean_abs_diff']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark the segmentation response encodings: encode time and payload size
+
+Composes a segmentation result for one image (a synthetic 4000x3000 photo by
+default) and encodes its mask as 8-bit PNG, 1-bit PNG, COCO RLE and polygons,
+and its cutout as PNG, JPEG and WebP at a few qualities. Without --model-path
+the mask is an ellipse at model resolution, so the contours look like a real
+pet mask rather than an untrained UNet's output. Sizes are of the JSON value
+as sent in the response.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+from PIL import Image
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api')
+sys.path.insert(0, API_DIR)
+
+from pet_segmentation import SEGMENTATION_SIZE, PetSegmentation  # noqa: E402
+from utils.mask_encoding import (  # noqa: E402
+    encode_png, encode_png_1bit, encode_cutout, mask_to_rle, mask_to_polygons
+)
+
+
+def synthetic_photo(width, height):
+    """Smooth random-colour image that compresses like a photo"""
+    rng = np.random.default_rng(0)
+    small = rng.integers(0, 256, (height // 100, width // 100, 3), dtype=np.uint8)
+    return Image.fromarray(small).resize((width, height), Image.BILINEAR)
+
+
+def ellipse_mask(size):
+    """Boolean ellipse covering about 40% of a (height, width) mask"""
+    rows, cols = np.ogrid[:size[0], :size[1]]
+    return ((rows - size[0] * 0.55) / (size[0] * 0.4)) ** 2 + ((cols - size[1] * 0.5) / (size[1] * 0.32)) ** 2 <= 1
+
+
+def timed(encode, repeats):
+    """(median seconds, JSON payload bytes) of an encoder"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        payload = encode()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)), len(json.dumps(payload))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('image', nargs='?', help='Image to encode (default: synthetic 4000x3000 photo)')
+    parser.add_argument('--model-path', help='UNet checkpoint to predict the mask with (default: ellipse mask)')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.image:
+        with Image.open(args.image) as image:
+            image = image.convert('RGB')
+    else:
+        image = synthetic_photo(4000, 3000)
+
+    segmentation = PetSegmentation(args.model_path)
+    if args.model_path:
+        mask = segmentation.predict_masks([segmentation.model_input(image)])[0]
+    else:
+        mask = ellipse_mask(SEGMENTATION_SIZE)
+    result = segmentation.compose_result(image, mask, time.time())
+    mask_image, cutout = result['mask'], result['segmented']
+    print(f"Image: {image.size[0]}x{image.size[1]}, mask coverage {float(mask.mean()):.1%}\n")
+
+    encoders = [
+        ('mask png (8-bit, previous)', lambda: encode_png(mask_image)),
+        ('mask png1 (1-bit)', lambda: encode_png_1bit(mask_image)),
+        ('mask rle (COCO)', lambda: mask_to_rle(mask_image)),
+        ('mask polygon', lambda: mask_to_polygons(mask, mask_image.size)),
+        ('cutout png (previous)', lambda: encode_cutout(cutout, 'png')),
+    ]
+    for quality in (60, 75, 85, 95):
+        encoders.append((f"cutout jpeg q{quality}", lambda quality=quality: encode_cutout(cutout, 'jpeg', quality)))
+        encoders.append((f"cutout webp q{quality}", lambda quality=quality: encode_cutout(cutout, 'webp', quality)))
+
+    print(f"{'encoding':<28} {'encode ms':>10} {'payload KB':>11}")
+    for name, encode in encoders:
+        seconds, size = timed(encode, args.repeats)
+        print(f"{name:<28} {seconds * 1000:>10.1f} {size / 1024:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Measure the peak memory of one PetSegmentation request on a large image
+
+Writes a synthetic 12-megapixel (4000x3000) JPEG unless an image is given, then
+in a fresh process loads the UNet, warms it up, resets the resident-set
+high-water mark and runs segment_image (optionally tiled, and optionally with
+the response encoding) once. Reports the peak RSS above the warmed-up baseline.
+Linux only: reads /proc/self/status and resets VmHWM through /proc/self/clear_refs.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing as mp
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api')
+sys.path.insert(0, API_DIR)
+
+
+def read_status_kb(field):
+    """Read a kB counter such as VmRSS or VmHWM from /proc/self/status"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def reset_peak_rss():
+    """Reset VmHWM to the current RSS (Linux 4.0+)"""
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+
+
+def write_test_image(path, width, height):
+    """Write a smooth random-colour JPEG so it compresses like a photo"""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    small = rng.integers(0, 256, (height // 100, width // 100, 3), dtype=np.uint8)
+    Image.fromarray(small).resize((width, height), Image.BILINEAR).save(path, quality=90)
+
+
+def worker(image_path, model_path, encode, tiled, results):
+    """Segment one image after warm-up and report (baseline kB, peak kB, seconds)"""
+    import numpy as np
+    from PIL import Image
+    from pet_segmentation import PetSegmentation
+
+    segmentation = PetSegmentation(model_path)
+    warmup = Image.fromarray(np.zeros((480, 640, 3), dtype=np.uint8))
+    segmentation.segment_image(warmup, tiled)
+
+    baseline = read_status_kb('VmRSS')
+    reset_peak_rss()
+    start = time.perf_counter()
+    if encode:
+        segmentation.segment_and_encode(image_path, tiled)
+    else:
+        segmentation.segment_image(image_path, tiled)
+    elapsed = time.perf_counter() - start
+    results.put((baseline, read_status_kb('VmHWM'), elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('image', nargs='?', help='Image to segment (default: synthetic 4000x3000 JPEG)')
+    parser.add_argument('--model-path', help='UNet checkpoint (default: untrained weights)')
+    parser.add_argument('--encode', action='store_true', help='Include the default response encoding')
+    parser.add_argument('--tiled', action='store_true', help='Use tiled inference (SEGMENTATION_TILE_* settings)')
+    parser.add_argument('--runs', type=int, default=3, help='Fresh processes to measure')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        image_path = args.image
+        if image_path is None:
+            image_path = os.path.join(temp_dir, 'test_12mp.jpg')
+            write_test_image(image_path, 4000, 3000)
+
+        from PIL import Image
+        with Image.open(image_path) as image:
+            print(f"Image: {image.size[0]}x{image.size[1]} ({image.size[0] * image.size[1] / 1e6:.1f} MP)")
+
+        ctx = mp.get_context('spawn')
+        print(f"{'run':>4} {'baseline MB':>12} {'peak MB':>10} {'peak - baseline MB':>19} {'seconds':>8}")
+        for run in range(args.runs):
+            results = ctx.Queue()
+            process = ctx.Process(target=worker, args=(image_path, args.model_path, args.encode, args.tiled, results))
+            process.start()
+            baseline, peak, elapsed = results.get()
+            process.join()
+            print(f"{run + 1:>4} {baseline / 1024:>12.1f} {peak / 1024:>10.1f} "
+                  f"{(peak - baseline) / 1024:>19.1f} {elapsed:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Measure per-worker memory of PetClassifier with default vs memory-mapped weight loading
+
+Starts N independent worker processes (like gunicorn workers without --preload),
+each loading the same checkpoint and running one prediction, and reports RSS,
+PSS and unique set size (USS = private clean + private dirty pages) per worker,
+plus how much of the checkpoint file mapping is private to or shared by workers.
+Linux only: reads /proc/self/smaps_rollup and /proc/self/smaps.
+"""
+
+import os
+import sys
+import argparse
+import multiprocessing as mp
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api')
+sys.path.insert(0, API_DIR)
+
+
+def read_memory_kb():
+    """Read memory counters for the current process from smaps_rollup"""
+    counters = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                counters[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': counters.get('Rss', 0),
+        'pss': counters.get('Pss', 0),
+        'uss': counters.get('Private_Clean', 0) + counters.get('Private_Dirty', 0),
+        'shared': counters.get('Shared_Clean', 0) + counters.get('Shared_Dirty', 0),
+    }
+
+
+def read_mapping_kb(path):
+    """Read resident, private and shared kB of the mappings of one file"""
+    totals = {'rss': 0, 'private': 0, 'shared': 0}
+    in_mapping = False
+    with open('/proc/self/smaps') as f:
+        for line in f:
+            fields = line.split()
+            if '-' in fields[0] and not fields[0].endswith(':'):
+                in_mapping = line.rstrip().endswith(path)
+            elif in_mapping and len(fields) == 3:
+                if fields[0] == 'Rss:':
+                    totals['rss'] += int(fields[1])
+                elif fields[0].startswith('Private_'):
+                    totals['private'] += int(fields[1])
+                elif fields[0].startswith('Shared_'):
+                    totals['shared'] += int(fields[1])
+    return totals
+
+
+def worker(model_type, model_path, mmap_weights, ready, release, results):
+    """Load a classifier, run one prediction and report memory while all workers are alive"""
+    import numpy as np
+    from PIL import Image
+    from pet_classifier import PetClassifier
+
+    classifier = PetClassifier(model_type=model_type, model_path=model_path, mmap_weights=mmap_weights)
+    image = Image.fromarray(np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8))
+    classifier.predict_image(image)
+
+    ready.wait()
+    memory = read_memory_kb()
+    memory['checkpoint'] = read_mapping_kb(model_path)
+    results.put((os.getpid(), memory))
+    release.wait()
+
+
+def measure(model_type, model_path, workers, mmap_weights):
+    """Run one measurement round and return per-worker counters"""
+    ctx = mp.get_context('spawn')
+    ready = ctx.Barrier(workers)
+    release = ctx.Barrier(workers + 1)
+    results = ctx.Queue()
+
+    processes = [
+        ctx.Process(target=worker, args=(model_type, model_path, mmap_weights, ready, release, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    samples = [results.get() for _ in range(workers)]
+    release.wait()
+    for process in processes:
+        process.join()
+    return samples
+
+
+def print_report(label, samples):
+    """Print per-worker counters and totals in MB"""
+    print(f"\n{label}")
+    print(f"{'pid':>8} {'RSS MB':>10} {'PSS MB':>10} {'USS MB':>10} {'shared MB':>10} "
+          f"{'ckpt private MB':>16} {'ckpt shared MB':>15}")
+    totals = {'rss': 0, 'pss': 0, 'uss': 0, 'shared': 0, 'ckpt_private': 0, 'ckpt_shared': 0}
+    for pid, memory in sorted(samples):
+        row = dict(memory, ckpt_private=memory['checkpoint']['private'], ckpt_shared=memory['checkpoint']['shared'])
+        print(f"{pid:>8} {row['rss'] / 1024:>10.1f} {row['pss'] / 1024:>10.1f} {row['uss'] / 1024:>10.1f} "
+              f"{row['shared'] / 1024:>10.1f} {row['ckpt_private'] / 1024:>16.1f} {row['ckpt_shared'] / 1024:>15.1f}")
+        for key in totals:
+            totals[key] += row[key]
+    print(f"{'total':>8} {totals['rss'] / 1024:>10.1f} {totals['pss'] / 1024:>10.1f} {totals['uss'] / 1024:>10.1f} "
+          f"{totals['shared'] / 1024:>10.1f} {totals['ckpt_private'] / 1024:>16.1f} {totals['ckpt_shared'] / 1024:>15.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('model_path', help='Path to a .safetensors checkpoint')
+    parser.add_argument('--model-type', default='resnet', choices=['resnet', 'alexnet', 'mobilenet'])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--mode', default='both', choices=['copy', 'mmap', 'both'])
+    args = parser.parse_args()
+
+    model_path = os.path.abspath(args.model_path)
+    size_mb = os.path.getsize(model_path) / (1024 * 1024)
+    print(f"Checkpoint: {model_path} ({size_mb:.1f} MB), {args.workers} workers")
+
+    if args.mode in ('copy', 'both'):
+        print_report('Default loader (safetensors load_file)', measure(args.model_type, model_path, args.workers, False))
+    if args.mode in ('mmap', 'both'):
+        print_report('Memory-mapped weights', measure(args.model_type, model_path, args.workers, True))
+
+
+if __name__ == '__main__':
+    main()